@@ -1,39 +1,107 @@
 from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QLabel, QTextEdit
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
 from datetime import timedelta
-import matplotlib
-matplotlib.rcParams['font.sans-serif'] = ['SimHei']  # 中文字体
-matplotlib.rcParams['axes.unicode_minus'] = False    # 正确显示负号
+import numpy as np
+import pandas as pd
+
+
+def _load_matplotlib():
+    """matplotlib 较重，首次打开统计窗口时才导入"""
+    import matplotlib
+    from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+    from matplotlib.figure import Figure
+    matplotlib.rcParams['font.sans-serif'] = ['SimHei']  # 中文字体
+    matplotlib.rcParams['axes.unicode_minus'] = False    # 正确显示负号
+    return FigureCanvas, Figure
+
+
+WEEKDAY_LABELS = ['星期一', '星期二', '星期三', '星期四', '星期五', '星期六', '星期日']
+HIST_BINS = 40
+
+
+class StatisticsEngine:
+    """
+    一次扫描日志得到的统计缓存：
+    - 每个流程的持续时间（秒，已排序），分位数与对数刻度直方图
+    - 按星期 / 小时统计的流程数（由时间戳 dt.dayofweek / dt.hour 编码计算）
+    - 活动频次
+
+    阈值变化时只在已排序的持续时间数组上 searchsorted，不再扫描日志。
+    """
+
+    def __init__(self, df, summary=None):
+        case_col, act_col, time_col = "case:concept:name", "concept:name", "time:timestamp"
+        times = df[time_col]
+        if not pd.api.types.is_datetime64_any_dtype(times):
+            times = pd.to_datetime(times, errors="coerce")
+        valid = times.notna().to_numpy()
+        cases = df[case_col].to_numpy()[valid]
+        times = times[valid]
+
+        # ① 流程持续时间：有概况缓存时直接用其中的起止时间，否则做一次 min/max 归约
+        if summary is not None:
+            spans = summary.cases.dropna(subset=["start", "end"])
+            self.durations = (spans["end"] - spans["start"]).dt.total_seconds()
+        else:
+            grouped = times.groupby(cases, sort=False)
+            self.durations = (grouped.max() - grouped.min()).dt.total_seconds()
+        self.sorted_secs = np.sort(self.durations.to_numpy())
+        if len(self.sorted_secs):
+            self.quantiles = dict(zip(
+                (50, 90, 95, 99),
+                np.quantile(self.sorted_secs, [0.5, 0.9, 0.95, 0.99])
+            ))
+            # 对数刻度直方图（+1 秒避免 log(0)）
+            self.hist_edges = np.logspace(0, np.log10(self.sorted_secs[-1] + 1) + 1e-9, HIST_BINS + 1)
+            self.hist_counts, _ = np.histogram(self.sorted_secs + 1, bins=self.hist_edges)
+        else:
+            self.quantiles = {}
+            self.hist_edges = np.array([1.0, 10.0])
+            self.hist_counts = np.zeros(1, dtype=np.int64)
+
+        # ② 星期 / 小时分布：(case, 编码) 去重后计数，即“该时段有事件的流程数”
+        case_codes = pd.factorize(cases)[0].astype(np.int64)
+        self.weekday_cases = self._distinct_case_counts(case_codes, times.dt.dayofweek.to_numpy(), 7)
+        self.hour_cases = self._distinct_case_counts(case_codes, times.dt.hour.to_numpy(), 24)
+
+        # ③ 活动频次
+        if summary is not None:
+            self.activity_counts = summary.activity_counts.sort_values(ascending=False)
+        else:
+            self.activity_counts = df[act_col].value_counts()
+
+    @staticmethod
+    def _distinct_case_counts(case_codes, slot_codes, n_slots):
+        keys = np.unique(case_codes * n_slots + slot_codes.astype(np.int64))
+        return np.bincount(keys % n_slots, minlength=n_slots)
+
+    def count_at_most(self, seconds):
+        """持续时间 ≤ seconds 的流程数"""
+        return int(np.searchsorted(self.sorted_secs, seconds, side="right"))
+
 
 class StatisticWindow(QMainWindow):
-    def __init__(self, df, threshold_min1=None, threshold_min2=None, parent=None):
+    def __init__(self, df, threshold_min1=None, threshold_min2=None, parent=None, engine=None):
         super().__init__(parent)
+        FigureCanvas, Figure = _load_matplotlib()
         self.setWindowTitle("统计指标结果")
-        self.resize(800, 600)
+        self.resize(1000, 650)
         self.threshold_min1 = threshold_min1
         self.threshold_min2 = threshold_min2
+        self.engine = engine if engine is not None else StatisticsEngine(df)
 
         widget = QWidget()
         layout = QVBoxLayout(widget)
 
         # 时间阈值范围标题
-        if threshold_min1 and threshold_min2:
-            desc = f"分析范围：{threshold_min1}分钟 ~ {threshold_min2}分钟"
-        elif threshold_min1:
-            desc = f"分析范围：≤ {threshold_min1}分钟"
-        elif threshold_min2:
-            desc = f"分析范围：≤ {threshold_min2}分钟"
-        else:
-            desc = "分析范围：全部"
+        self.range_label = QLabel()
+        layout.addWidget(self.range_label)
 
-        range_label = QLabel(desc)
-        layout.addWidget(range_label)
-
-        # 图表
-        fig = Figure(figsize=(5, 3))
+        # 图表：星期分布 / 小时分布 / 持续时间直方图
+        fig = Figure(figsize=(9, 3))
         self.canvas = FigureCanvas(fig)
-        self.ax = fig.add_subplot(111)
+        self.ax = fig.add_subplot(131)
+        self.ax_hour = fig.add_subplot(132)
+        self.ax_hist = fig.add_subplot(133)
         layout.addWidget(self.canvas)
 
         # 统计文本
@@ -44,34 +112,59 @@ class StatisticWindow(QMainWindow):
         self.setCentralWidget(widget)
 
         # 生成内容
-        self.plot_weekday_distribution(df)
-        self.generate_statistics(df)
-
-    def plot_weekday_distribution(self, df):
-        weekday_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        weekday_map = {
-            'Monday': '星期一', 'Tuesday': '星期二', 'Wednesday': '星期三',
-            'Thursday': '星期四', 'Friday': '星期五',
-            'Saturday': '星期六', 'Sunday': '星期日'
-        }
-        df_counts = df.groupby('weekday')["case:concept:name"].nunique()
-        df_counts = df_counts.reindex(weekday_order).fillna(0)
-
-        zh_labels = [weekday_map.get(day, day) for day in df_counts.index]
+        self.plot_weekday_distribution()
+        self.plot_hour_distribution()
+        self.set_thresholds(threshold_min1, threshold_min2)
+
+    def set_thresholds(self, threshold_min1=None, threshold_min2=None):
+        """
+        阈值变化时只根据缓存重新分箱，不再扫描日志
+        """
+        self.threshold_min1 = threshold_min1
+        self.threshold_min2 = threshold_min2
+        if threshold_min1 and threshold_min2:
+            desc = f"分析范围：{threshold_min1}分钟 ~ {threshold_min2}分钟"
+        elif threshold_min1:
+            desc = f"分析范围：≤ {threshold_min1}分钟"
+        elif threshold_min2:
+            desc = f"分析范围：≤ {threshold_min2}分钟"
+        else:
+            desc = "分析范围：全部"
+        self.range_label.setText(desc)
+        self.plot_duration_histogram()
+        self.generate_statistics()
+
+    def plot_weekday_distribution(self):
         self.ax.clear()
-        self.ax.bar(zh_labels, df_counts.values, color='skyblue')
+        self.ax.bar(WEEKDAY_LABELS, self.engine.weekday_cases, color='skyblue')
         self.ax.set_title("每周转化分布")
         self.ax.set_ylabel("流程数")
-        self.canvas.draw()
-
-    def generate_statistics(self, df):
-        from pandas import to_datetime
-        from collections import Counter
-
-        df["time:timestamp"] = to_datetime(df["time:timestamp"], errors="coerce")
-        df = df.dropna(subset=["time:timestamp"])
-
-        durations = df.groupby("case:concept:name")["time:timestamp"].agg(lambda x: (x.max() - x.min()).total_seconds())
+        self.ax.tick_params(axis='x', labelrotation=45)
+        self.canvas.draw_idle()
+
+    def plot_hour_distribution(self):
+        self.ax_hour.clear()
+        self.ax_hour.bar(range(24), self.engine.hour_cases, color='lightgreen')
+        self.ax_hour.set_title("每日时段分布")
+        self.ax_hour.set_xlabel("小时")
+        self.canvas.draw_idle()
+
+    def plot_duration_histogram(self):
+        engine = self.engine
+        self.ax_hist.clear()
+        edges = engine.hist_edges
+        self.ax_hist.bar(edges[:-1], engine.hist_counts, width=np.diff(edges), align="edge", color='wheat')
+        self.ax_hist.set_xscale("log")
+        self.ax_hist.set_title("流程持续时间分布")
+        self.ax_hist.set_xlabel("秒")
+        for minutes in (self.threshold_min1, self.threshold_min2):
+            if minutes:
+                self.ax_hist.axvline(minutes * 60 + 1, color='red', linestyle='--')
+        self.canvas.draw_idle()
+
+    def generate_statistics(self):
+        engine = self.engine
+        durations = engine.durations
         total = len(durations)
 
         if total == 0:
@@ -84,9 +177,9 @@ class StatisticWindow(QMainWindow):
         if self.threshold_min1 and self.threshold_min2:
             min1_sec = self.threshold_min1 * 60
             min2_sec = self.threshold_min2 * 60
-            count_low = (durations <= min1_sec).sum()
-            count_mid = ((durations > min1_sec) & (durations <= min2_sec)).sum()
-            count_high = (durations > min2_sec).sum()
+            count_low = engine.count_at_most(min1_sec)
+            count_mid = max(0, engine.count_at_most(min2_sec) - count_low)
+            count_high = total - engine.count_at_most(max(min1_sec, min2_sec))
 
             desc += "📊 流程时长划分：\n"
             desc += f"  - ≤{self.threshold_min1}分钟: {count_low} ({count_low / total:.1%})\n"
@@ -94,8 +187,8 @@ class StatisticWindow(QMainWindow):
             desc += f"  - >{self.threshold_min2}分钟: {count_high} ({count_high / total:.1%})\n\n"
         elif self.threshold_min1:
             cutoff = self.threshold_min1 * 60
-            count_low = (durations <= cutoff).sum()
-            count_high = (durations > cutoff).sum()
+            count_low = engine.count_at_most(cutoff)
+            count_high = total - count_low
 
             desc += "📊 流程时长划分：\n"
             desc += f"  - ≤{self.threshold_min1}分钟: {count_low} ({count_low / total:.1%})\n"
@@ -103,14 +196,19 @@ class StatisticWindow(QMainWindow):
         else:
             desc += "📊 无有效时间划分，仅展示其他信息。\n\n"
 
+        # --- 📐 持续时间分位数 ---
+        if engine.quantiles:
+            desc += "📐 流程持续时间分位数：\n"
+            desc += "  " + "，".join(
+                f"P{q}: {timedelta(seconds=int(v))}" for q, v in engine.quantiles.items()
+            ) + "\n\n"
+
         # --- 🔝 最常出现的活动 ---
-        activities = df["concept:name"].dropna().tolist()
-        act_counter = Counter(activities)
-        top_activities = act_counter.most_common(5)
+        top_activities = engine.activity_counts.head(5)
 
-        if top_activities:
+        if not top_activities.empty:
             desc += "🔝 最常出现的活动（前5名）：\n"
-            for act, count in top_activities:
+            for act, count in top_activities.items():
                 desc += f"  📍 {act} ({count}次)\n"
             desc += "\n"
         else:
@@ -119,10 +217,8 @@ class StatisticWindow(QMainWindow):
         # --- ⏱️ 最长流程 ---
         max_dur = durations.max()
         max_case = durations.idxmax()
-        from datetime import timedelta
         max_desc = str(timedelta(seconds=int(max_dur)))
 
         desc += f"⏱️ 最长流程:\n  📍 {max_case}\n  📍 持续时间: {max_desc}"
 
         self.text_box.setText(desc)
-
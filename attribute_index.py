@@ -0,0 +1,163 @@
+# attribute_index.py
+"""
+事件级属性索引：为“删除记录条件”等反复按同一列筛选的场景，按需为列建立索引。
+
+- 数值 / 时间列：排序后的值数组 + 行位置排列，等值 / 范围 / isin 用 searchsorted 解析
+- 低基数的文本 / 分类 / 布尔列：倒排位图（每个取值一份 packbits 位图），等值 / isin 为位图或运算
+- 其他列（高基数文本等）不建索引，由调用方回退为整列扫描
+
+索引与某一日志版本的 DataFrame 行顺序绑定；日志变化后应丢弃整个 AttributeIndex。
+"""
+import numpy as np
+import pandas as pd
+
+INDEX_MIN_ROWS = 10_000     # 行数较少时整列扫描更快，不建索引
+BITMAP_MAX_CARDINALITY = 4096
+
+
+def _datetime_keys(series):
+    if getattr(series.dtype, "tz", None) is not None:
+        series = series.dt.tz_convert(None)
+    return series.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+class SortedColumnIndex:
+    """数值 / 时间列：非空值升序排列，perm[i] 为第 i 小值所在的行位置"""
+
+    def __init__(self, series):
+        self.n_rows = len(series)
+        self.is_datetime = pd.api.types.is_datetime64_any_dtype(series.dtype)
+        notna = series.notna().to_numpy()
+        keys = _datetime_keys(series) if self.is_datetime else series.to_numpy(dtype=np.float64)
+        rows = np.flatnonzero(notna)
+        order = np.argsort(keys[rows], kind="stable")
+        self.perm = rows[order]
+        self.values = keys[rows][order]
+
+    def _key(self, value):
+        if self.is_datetime:
+            ts = pd.Timestamp(value)
+            return (ts.tz_convert(None) if ts.tzinfo is not None else ts).value
+        return float(value)
+
+    def _mask_from(self, lo, hi):
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.perm[lo:hi]] = True
+        return mask
+
+    def range_mask(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        lo = 0 if low is None else np.searchsorted(
+            self.values, self._key(low), side="left" if low_inclusive else "right")
+        hi = len(self.values) if high is None else np.searchsorted(
+            self.values, self._key(high), side="right" if high_inclusive else "left")
+        return self._mask_from(lo, max(lo, hi))
+
+    def isin_mask(self, values):
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for v in values:
+            key = self._key(v)
+            lo = np.searchsorted(self.values, key, side="left")
+            hi = np.searchsorted(self.values, key, side="right")
+            mask[self.perm[lo:hi]] = True
+        return mask
+
+    def mask(self, op, value):
+        if op == "==":
+            return self.range_mask(value, value)
+        if op == "!=":
+            return ~self.range_mask(value, value)
+        if op == ">":
+            return self.range_mask(low=value, low_inclusive=False)
+        if op == ">=":
+            return self.range_mask(low=value)
+        if op == "<":
+            return self.range_mask(high=value, high_inclusive=False)
+        if op == "<=":
+            return self.range_mask(high=value)
+        if op == "between":
+            return self.range_mask(value[0], value[1])
+        if op == "in":
+            return self.isin_mask(value)
+        if op == "not in":
+            return ~self.isin_mask(value)
+        return None
+
+
+class BitmapColumnIndex:
+    """低基数列：取值 → 位图（np.packbits），位图按需生成并缓存"""
+
+    def __init__(self, series, codes, uniques):
+        self.n_rows = len(series)
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        self._order = order
+        self._bounds = np.searchsorted(sorted_codes, np.arange(len(uniques) + 1) - 0.5)
+        self._bitmaps = {}
+        # 与扫描路径一致：文本列上的字面量按字符串匹配
+        self._lookup = {}
+        for code, value in enumerate(uniques):
+            self._lookup.setdefault(value if isinstance(value, str) else str(value), []).append(code)
+
+    def _bitmap(self, code):
+        bm = self._bitmaps.get(code)
+        if bm is None:
+            rows = np.zeros(self.n_rows, dtype=bool)
+            rows[self._order[self._bounds[code]:self._bounds[code + 1]]] = True
+            bm = self._bitmaps[code] = np.packbits(rows)
+        return bm
+
+    def isin_mask(self, values):
+        acc = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        for v in values:
+            for code in self._lookup.get(v if isinstance(v, str) else str(v), ()):
+                np.bitwise_or(acc, self._bitmap(code), out=acc)
+        return np.unpackbits(acc, count=self.n_rows).astype(bool)
+
+    def mask(self, op, value):
+        if op == "==":
+            return self.isin_mask([value])
+        if op == "!=":
+            return ~self.isin_mask([value])
+        if op == "in":
+            return self.isin_mask(value)
+        if op == "not in":
+            return ~self.isin_mask(value)
+        return None  # 文本范围比较等：回退为扫描
+
+
+class AttributeIndex:
+    """
+    某一日志版本的按列索引集合：第一次对某列查询时才建立该列索引
+    """
+
+    def __init__(self, n_rows):
+        self.n_rows = n_rows
+        self._columns = {}  # col -> 索引对象，或 None 表示该列不适合建索引
+
+    def column(self, df, col):
+        if len(df) != self.n_rows or len(df) < INDEX_MIN_ROWS or col not in df.columns:
+            return None
+        if col not in self._columns:
+            self._columns[col] = self._build(df[col])
+        return self._columns[col]
+
+    @staticmethod
+    def _build(series):
+        dtype = series.dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            pass
+        elif pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_datetime64_any_dtype(dtype):
+            return SortedColumnIndex(series)
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        if len(uniques) > BITMAP_MAX_CARDINALITY:
+            return None
+        return BitmapColumnIndex(series, codes, list(uniques))
+
+    def mask(self, df, col, op, value):
+        """
+        通过索引求掩码；该列或该操作符不支持索引时返回 None（调用方回退为扫描）
+        """
+        idx = self.column(df, col)
+        if idx is None:
+            return None
+        return idx.mask(op, value)
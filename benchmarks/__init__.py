@@ -0,0 +1,7 @@
+# benchmarks/__init__.py
+"""
+cpa_utils / cpa_pm_preprocessing 的性能基准。
+
+    python -m benchmarks.run_benchmarks --sizes 10k,100k --output bench.json
+    python -m benchmarks.compare base.json bench.json
+"""
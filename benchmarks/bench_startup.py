@@ -0,0 +1,80 @@
+# benchmarks/bench_startup.py
+"""
+冷启动基准：在全新解释器中导入 csv2xes_improved 并构造主窗口，测量耗时，
+同时检查重量级依赖没有被提前导入。
+
+    python -m benchmarks.bench_startup --runs 5 --budget-ms 1500 --output startup.json
+
+超出预算或提前导入了重量级模块时返回码为 1，可作为回归守卫。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 启动阶段不允许出现的模块（应当懒加载）
+FORBIDDEN_AT_STARTUP = (
+    "pandas", "numpy", "chardet", "pm4py", "networkx", "pydot", "matplotlib",
+)
+
+_PROBE = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtWidgets import QApplication
+import csv2xes_improved
+t_import = time.perf_counter()
+app = QApplication(sys.argv)
+win = csv2xes_improved.CSV2XESConverter()
+win.show()
+app.processEvents()
+t_window = time.perf_counter()
+heavy = sorted({m.split(".")[0] for m in sys.modules} & set(json.loads(sys.argv[1])))
+print(json.dumps({"import_ms": (t_import - t0) * 1000, "window_ms": (t_window - t0) * 1000, "heavy": heavy}))
+"""
+
+
+def probe_once():
+    env = dict(os.environ, CPA_PM_NO_WARMUP="1")
+    out = subprocess.check_output(
+        [sys.executable, "-c", _PROBE, json.dumps(FORBIDDEN_AT_STARTUP)],
+        cwd=ROOT, env=env, text=True, stderr=subprocess.DEVNULL,
+    )
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="冷启动耗时基准")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="主窗口可见耗时（中位数）上限")
+    parser.add_argument("--output", default="")
+    args = parser.parse_args(argv)
+
+    runs = [probe_once() for _ in range(args.runs)]
+    window_ms = statistics.median(r["window_ms"] for r in runs)
+    import_ms = statistics.median(r["import_ms"] for r in runs)
+    heavy = sorted({m for r in runs for m in r["heavy"]})
+
+    report = {"runs": runs, "median_import_ms": import_ms, "median_window_ms": window_ms,
+              "budget_ms": args.budget_ms, "heavy_modules_loaded": heavy}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+
+    print(f"导入 {import_ms:.0f} ms，主窗口可见 {window_ms:.0f} ms（预算 {args.budget_ms:.0f} ms）")
+    failed = False
+    if heavy:
+        print(f"⚠️ 启动时提前导入了: {', '.join(heavy)}")
+        failed = True
+    if window_ms > args.budget_ms:
+        print("⚠️ 超出启动耗时预算")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
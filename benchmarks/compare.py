@@ -0,0 +1,59 @@
+# benchmarks/compare.py
+"""
+比较两次基准结果：
+
+    python -m benchmarks.compare base.json new.json --threshold 1.10
+
+新结果耗时超过 base × threshold 时视为回退，返回码为 1，便于接入 CI。
+"""
+import argparse
+import json
+import sys
+
+
+def _index(report):
+    return {
+        (r["function"], r.get("events")): r
+        for r in report["results"] if r.get("status") == "ok"
+    }
+
+
+def compare(base, new, threshold=1.10):
+    """返回 (行列表, 回退数)，每行为 (函数, 事件数, 旧耗时, 新耗时, 比值, 旧峰值, 新峰值)"""
+    old_idx, new_idx = _index(base), _index(new)
+    rows, regressions = [], 0
+    for key in sorted(set(old_idx) & set(new_idx), key=lambda k: (k[0], k[1] or 0)):
+        old, cur = old_idx[key], new_idx[key]
+        ratio = cur["seconds"] / old["seconds"] if old["seconds"] > 0 else float("inf")
+        if ratio > threshold:
+            regressions += 1
+        rows.append((key[0], key[1], old["seconds"], cur["seconds"], ratio,
+                     old.get("peak_mb"), cur.get("peak_mb")))
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较两份基准 JSON")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.10, help="耗时比值超过该值视为回退")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as fh:
+        base = json.load(fh)
+    with open(args.new, encoding="utf-8") as fh:
+        new = json.load(fh)
+
+    rows, regressions = compare(base, new, args.threshold)
+    fmt_mb = lambda v: "-" if v is None else f"{v:.1f}"
+    print(f"{'函数':<60} {'事件数':>12} {'旧(s)':>10} {'新(s)':>10} {'比值':>7} {'旧MB':>9} {'新MB':>9}")
+    for func, events, old_s, new_s, ratio, old_mb, new_mb in rows:
+        flag = "  ⚠️" if ratio > args.threshold else ""
+        print(f"{func:<60} {events:>12,} {old_s:>10.4f} {new_s:>10.4f} {ratio:>6.2f}x "
+              f"{fmt_mb(old_mb):>9} {fmt_mb(new_mb):>9}{flag}")
+    print(f"\n共 {len(rows)} 项，回退 {regressions} 项（阈值 {args.threshold:.2f}x）")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
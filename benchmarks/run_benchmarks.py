@@ -0,0 +1,301 @@
+# benchmarks/run_benchmarks.py
+"""
+对 cpa_utils.py 与 cpa_pm_preprocessing.py 中的每个公开函数计时并记录峰值内存，结果写入 JSON。
+
+    python -m benchmarks.run_benchmarks --sizes 10k,100k,1M,10M --profile sample --output bench.json
+
+- 计时：不开启 tracemalloc，重复 --repeat 次取最小值
+- 峰值内存：单独跑一次，tracemalloc 统计的 Python / NumPy 峰值分配（MB）
+- 某函数在较小规模已超过 --max-seconds 时，更大规模自动跳过，避免 Python 循环实现跑上几个小时
+- 以 EventLog 为输入的函数只在 --max-log-events 以内运行（EventLog 本身就很占内存）
+"""
+import argparse
+import gc
+import inspect
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import cpa_pm_preprocessing
+import cpa_utils
+from benchmarks.synthetic_log import PROFILES, generate_event_log, parse_size
+
+CASE = "case:concept:name"
+ACT = "concept:name"
+TIME = "time:timestamp"
+
+DEFAULT_SIZES = "10k,100k,1M,10M"
+
+
+def _top_activities(df, k):
+    return df[ACT].value_counts().index[:k].tolist()
+
+
+def _most_common_start(df):
+    return df.groupby(CASE, sort=False)[ACT].first().mode().iat[0]
+
+
+def _most_common_end(df):
+    return df.groupby(CASE, sort=False)[ACT].last().mode().iat[0]
+
+
+def _sorted(df):
+    return df.sort_values([CASE, TIME], kind="stable")
+
+
+def _case_chunks(df, n=8):
+    """按 case 连续排列后切成 n 块，模拟分块读取的输入流"""
+    df = df.sort_values([CASE, TIME], kind="stable")
+    step = max(1, -(-len(df) // n))
+    return (df.iloc[i:i + step] for i in range(0, len(df), step))
+
+
+def _case_batches(df):
+    return cpa_pm_preprocessing.iter_case_batches(_case_chunks(df), CASE, batch_rows=max(1, len(df) // 8))
+
+
+def _drain(batches):
+    """消费流式结果，返回输出行数"""
+    return sum(len(b) for b in batches)
+
+
+# 每个公开函数的调用方式：(输入类型 "df" | "log", 根据数据集构造参数并调用的函数)
+# 新增公开函数时在这里登记，否则运行时会以 "no-case" 记录并给出警告
+BENCH_CASES = {
+    "cpa_utils": {
+        "filter_events_by_global_frequency": ("df", lambda f, df: f(df, event_col=ACT, min_freq=100)),
+        "keep_first_occurrence_only": ("log", lambda f, log: f(log)),
+        "is_case_time_ordered": ("df", lambda f, df: f(
+            pd.factorize(df[CASE])[0], pd.to_datetime(df[TIME]).to_numpy())),
+        "is_sorted_by_case_time": ("df", lambda f, df: f(_sorted(df).copy())),
+        "sort_case_time": ("df", lambda f, df: f(df)),
+        "insert_sorted": ("df", lambda f, df: f(_sorted(df), df.sample(min(len(df), 1000), random_state=0))),
+        "unique_join": ("df", lambda f, df: f(df[CASE].to_numpy(), df["org:resource"])),
+        "pack_case_key": ("df", lambda f, df: f(df, [CASE, "org:resource"])),
+        "stratified_case_sample": ("df", lambda f, df: f(df, 0.05)),
+        "dedup_occurrences": ("df", lambda f, df: f(df, keep="first", agg_fields=["org:resource"])),
+        "merge_activities_in_dataframe": ("df", lambda f, df: f(df, _top_activities(df, 2), "merged")),
+        "enrich_with_event_order": ("df", lambda f, df: f(df, CASE, TIME)),
+        "enrich_with_duration": ("df", lambda f, df: f(df, CASE, TIME)),
+        "compute_transition_performance": ("df", lambda f, df: f(df)),
+        "compute_windowed_dfg": ("df", lambda f, df: f(df, freq="W")),
+        "merge_duplicate_activities_user_config": ("df", lambda f, df: f(
+            df, CASE, ACT, TIME, _top_activities(df, 1)[0], {"org:resource": "join"})),
+        "filter_traces_by_start_event": ("log", lambda f, log: f(log, log[0][0][ACT])),
+        "filter_traces_by_end_event": ("log", lambda f, log: f(log, log[0][-1][ACT])),
+        "apply_merge_operations": ("log", lambda f, log: f(log, [{
+            "activities": _LOG_TOP_ACTS, "new_name": "merged", "strategy": "first", "fields": ["org:resource"]}])),
+        "apply_activity_merge_rules": ("log", lambda f, log: f(log, [{
+            "source_activities": _LOG_TOP_ACTS, "target_activity": "merged", "strategy": "first",
+            "agg_columns": ["org:resource"]}])),
+        "merge_activities_in_event_log": ("log", lambda f, log: f(log, _LOG_TOP_ACTS, "merged", "first")),
+        "aggregate_activity_occurrences": ("df", lambda f, df: f(
+            df, _top_activities(df, 1)[0], keep="first", agg_fields=["org:resource"])),
+        "filter_incomplete_traces": ("df", lambda f, df: f(
+            df, start_event=_most_common_start(df), end_event=_most_common_end(df))),
+        "filter_traces_by_duration": ("df", lambda f, df: f(df, 60, 0)),
+        "remove_consecutive_self_loops": ("df", lambda f, df: f(df)),
+        "filter_traces_containing_start_end": ("df", lambda f, df: f(
+            df, start_event=_top_activities(df, 2)[0], end_event=_top_activities(df, 2)[1])),
+        "extract_activities_from_log": ("log", lambda f, log: f(log)),
+    },
+    "cpa_pm_preprocessing": {
+        "delete_traces_with_short_length": ("df", lambda f, df: f(df, CASE, 3)),
+        "delete_truncated_traces_start": ("df", lambda f, df: f(df, CASE, ACT, _most_common_start(df))),
+        "delete_truncated_traces_end": ("df", lambda f, df: f(df, CASE, ACT, _most_common_end(df))),
+        "merge_rows": ("df", lambda f, df: f(df, CASE, ACT, TIME, agg_cols=["org:resource"])),
+        "keep_first_occurrence": ("df", lambda f, df: f(df, CASE, ACT)),
+        "keep_last_occurrence": ("df", lambda f, df: f(df, CASE, ACT)),
+        "iter_case_batches": ("df", lambda f, df: _drain(f(_case_chunks(df), CASE, batch_rows=max(1, len(df) // 8)))),
+        "pipeline": ("df", lambda f, df: _drain(f(
+            _case_batches(df),
+            lambda b: cpa_pm_preprocessing.stream_short_length(b, CASE, 3),
+            lambda b: cpa_pm_preprocessing.stream_keep_occurrence(b, CASE, ACT)))),
+        "write_csv_stream": ("df", lambda f, df: f(_case_batches(df), os.devnull)),
+        "collect_batches": ("df", lambda f, df: f(_case_batches(df))),
+        "stream_short_length": ("df", lambda f, df: _drain(f(_case_batches(df), CASE, 3))),
+        "stream_truncated_start": ("df", lambda f, df: _drain(f(_case_batches(df), CASE, ACT, _most_common_start(df)))),
+        "stream_truncated_end": ("df", lambda f, df: _drain(f(_case_batches(df), CASE, ACT, _most_common_end(df)))),
+        "stream_merge_rows": ("df", lambda f, df: _drain(f(_case_batches(df), CASE, ACT, TIME, agg_cols=["org:resource"]))),
+        "stream_keep_occurrence": ("df", lambda f, df: _drain(f(_case_batches(df), CASE, ACT))),
+        "sessionize": ("df", lambda f, df: f(df, CASE, 1800)),
+        "stream_sessionize": ("df", lambda f, df: _drain(f(_case_batches(df), CASE, 1800))),
+        "extract_activities_from_log": ("log", lambda f, log: f(log)),
+    },
+}
+
+# EventLog 类基准共用的合并目标（在构造 EventLog 时根据数据集设定）
+_LOG_TOP_ACTS = []
+
+MODULES = {"cpa_utils": cpa_utils, "cpa_pm_preprocessing": cpa_pm_preprocessing}
+
+
+def public_functions(module):
+    """模块中定义的（非导入的）公开函数名"""
+    return sorted(
+        name for name, obj in inspect.getmembers(module, inspect.isfunction)
+        if not name.startswith("_") and obj.__module__ == module.__name__
+    )
+
+
+def _rows_out(result):
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+def _time_call(call, func, data, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        t0 = time.perf_counter()
+        result = call(func, data)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def _peak_memory(call, func, data):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        call(func, data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def _to_event_log(df):
+    from pm4py.objects.conversion.log import converter as log_converter
+    return log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run(sizes, profile="sample", seed=0, repeat=1, memory=True, max_seconds=60.0,
+        max_log_events=1_000_000, only=None, log=print):
+    """
+    依次在各规模上运行全部基准，返回可直接 json.dump 的结果字典
+    """
+    global _LOG_TOP_ACTS
+    results = []
+    over_budget = set()
+
+    registered = []
+    for mod_name, module in MODULES.items():
+        cases = BENCH_CASES.get(mod_name, {})
+        for name in public_functions(module):
+            key = f"{mod_name}.{name}"
+            if only and not any(pat in key for pat in only):
+                continue
+            if name not in cases:
+                log(f"⚠️ {key} 没有登记基准用例，已跳过")
+                results.append({"function": key, "status": "no-case"})
+                continue
+            registered.append((key, getattr(module, name), cases[name]))
+
+    for n_events in sizes:
+        t0 = time.perf_counter()
+        df = generate_event_log(n_events, profile=profile, seed=seed)
+        log(f"== {n_events:,} events（{df[CASE].nunique():,} cases，生成 {time.perf_counter() - t0:.1f}s）")
+        event_log = None
+
+        for key, func, (kind, call) in registered:
+            record = {"function": key, "events": n_events, "profile": profile}
+            if key in over_budget:
+                record["status"] = "skipped-budget"
+                results.append(record)
+                continue
+            if kind == "log" and n_events > max_log_events:
+                record["status"] = "skipped-log-size"
+                results.append(record)
+                continue
+
+            if kind == "log":
+                if event_log is None:
+                    _LOG_TOP_ACTS = _top_activities(df, 2)
+                    event_log = _to_event_log(df)
+                data = event_log
+            else:
+                data = df
+
+            try:
+                seconds, result = _time_call(call, func, data, repeat)
+                record.update(status="ok", seconds=round(seconds, 6), rows_out=_rows_out(result))
+                del result
+                if memory:
+                    record["peak_mb"] = round(_peak_memory(call, func, data), 3)
+            except Exception as e:
+                record.update(status="error", error=f"{type(e).__name__}: {e}")
+            if record.get("seconds", 0) > max_seconds:
+                over_budget.add(key)
+
+            results.append(record)
+            log(f"  {key:<60} {record['status']:<6} "
+                f"{record.get('seconds', float('nan')):>10.4f}s  {record.get('peak_mb', float('nan')):>10.1f}MB")
+
+        del df, event_log
+        gc.collect()
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "profile": profile,
+            "seed": seed,
+            "repeat": repeat,
+            "sizes": list(sizes),
+        },
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="cpa_utils / cpa_pm_preprocessing 基准")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="事件规模，逗号分隔，如 10k,100k,1M,10M")
+    parser.add_argument("--profile", default="sample", choices=sorted(PROFILES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="每个规模重复计时次数（取最小值）")
+    parser.add_argument("--no-memory", action="store_true", help="不统计峰值内存")
+    parser.add_argument("--max-seconds", type=float, default=60.0,
+                        help="单次耗时超过该值后，更大规模不再运行该函数")
+    parser.add_argument("--max-log-events", default="1M", help="EventLog 输入函数的最大事件规模")
+    parser.add_argument("--only", default="", help="仅运行名称包含这些子串的函数，逗号分隔")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    only = [s.strip() for s in args.only.split(",") if s.strip()]
+    report = run(
+        sizes, profile=args.profile, seed=args.seed, repeat=args.repeat, memory=not args.no_memory,
+        max_seconds=args.max_seconds, max_log_events=parse_size(args.max_log_events), only=only,
+    )
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
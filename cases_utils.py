@@ -16,3 +16,237 @@ def get_case_event_details(df: pd.DataFrame, case_id: str, case_col: str, time_c
     df_case = df[df[case_col] == case_id].copy()
     df_case.sort_values(by=time_col, inplace=True)
     return df_case.reset_index(drop=True)
+
+
+class CaseIndex:
+    """
+    case / 变体索引：日志按 (case, time) 排序一次后，
+    每个 case 对应一段连续行 [start, end)，打开一个 case 只需一次切片；
+    变体按 case 数降序编号，每个变体的 case 列表同样是一段连续区间。
+    """
+
+    def __init__(self, df: pd.DataFrame, case_col: str, act_col: str, time_col: str):
+        import numpy as np
+        from log_summary import sequence_keys
+
+        self.case_col, self.act_col, self.time_col = case_col, act_col, time_col
+
+        case_codes, case_ids = pd.factorize(df[case_col], sort=False)
+        times = pd.to_datetime(df[time_col], errors="coerce").to_numpy()
+        order = np.lexsort((times, case_codes))  # 整数编码上的 lexsort，稳定
+        self.df = df.take(order).reset_index(drop=True)
+        sorted_codes = case_codes[order]
+
+        n = len(self.df)
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if n else np.empty(0, dtype=np.int64)
+        self.case_starts = starts
+        self.case_ends = np.r_[starts[1:], n].astype(np.int64)
+        self.case_ids = case_ids[sorted_codes[starts]] if n else case_ids[:0]
+        self._case_pos = pd.Index(self.case_ids)  # case id → 位置（哈希查找）
+
+        # 变体：按序列哈希分组，按 (case 数降序, trace 长度降序) 编号
+        act_codes, self.act_names = pd.factorize(self.df[act_col])
+        self.act_codes = act_codes
+        keys = sequence_keys(act_codes, starts) if n else np.empty(0, dtype=np.uint64)
+        variant_of_case, _ = pd.factorize(keys, sort=False)
+        lengths = self.case_ends - self.case_starts
+        n_variants = int(variant_of_case.max()) + 1 if len(variant_of_case) else 0
+        counts = np.bincount(variant_of_case, minlength=n_variants)
+        var_len = np.zeros(n_variants, dtype=np.int64)
+        var_len[variant_of_case] = lengths
+        rank = np.lexsort((-var_len, -counts))  # 新编号 → 旧编号
+        remap = np.empty(n_variants, dtype=np.int64)
+        remap[rank] = np.arange(n_variants)
+        self.case_variant = remap[variant_of_case]
+        self.variant_case_counts = counts[rank]
+        self.variant_lengths = var_len[rank]
+
+        # 每个变体的 case 位置列表：按变体编号稳定排序后切片
+        self._cases_by_variant = np.argsort(self.case_variant, kind="stable")
+        self._variant_bounds = np.r_[0, np.cumsum(self.variant_case_counts)]
+        self.total_events = n
+
+    @property
+    def num_variants(self) -> int:
+        return len(self.variant_case_counts)
+
+    def variant_event_count(self, variant: int) -> int:
+        return int(self.variant_case_counts[variant] * self.variant_lengths[variant])
+
+    def variant_cases(self, variant: int):
+        """变体包含的 case 位置数组（numpy 视图，不复制）"""
+        return self._cases_by_variant[self._variant_bounds[variant]:self._variant_bounds[variant + 1]]
+
+    def variant_activities(self, variant: int) -> List[str]:
+        """变体的活动序列（取其第一个 case 的活动列）"""
+        pos = self.variant_cases(variant)[0]
+        return self.df[self.act_col].iloc[self.case_starts[pos]:self.case_ends[pos]].astype(str).tolist()
+
+    def case_length(self, pos: int) -> int:
+        return int(self.case_ends[pos] - self.case_starts[pos])
+
+    def case_position(self, case_id) -> int:
+        return self._case_pos.get_loc(case_id)
+
+    def case_events(self, case_id) -> pd.DataFrame:
+        """O(1) 切片取出单个 case 的全部事件（已按时间排序）"""
+        pos = self.case_position(case_id)
+        return self.df.iloc[self.case_starts[pos]:self.case_ends[pos]]
+
+
+class VariantTrie:
+    """
+    变体前缀树：以活动编码为边，节点记录经过该前缀的 case 数。
+
+    按深度逐层向量化构建：第 d 层的节点即 (父节点, 第 d 个活动) 的去重结果，
+    节点 id 按层连续分配，且同层按 (父节点, 活动) 排序，因此：
+    - 查找子节点 = 在该层的有序键数组上 searchsorted
+    - 某节点下的全部变体 = 该层“变体 → 节点”有序数组中的一段连续区间
+    共享前缀只存一份，总节点数不超过全部变体长度之和。
+    """
+
+    def __init__(self, case_index: CaseIndex):
+        import numpy as np
+
+        self.case_index = case_index
+        # 活动编码整体 +1，使缺失活动（编码 -1）也是合法的边
+        n_codes = len(case_index.act_names) + 1
+        n_variants = case_index.num_variants
+        counts = case_index.variant_case_counts
+        lengths = case_index.variant_lengths
+        # 每个变体取其第一个 case 的起始行
+        first_rows = case_index.case_starts[case_index._cases_by_variant[case_index._variant_bounds[:-1]]]
+        self._code_of = {name: code + 1 for code, name in enumerate(case_index.act_names)}
+        self._n_codes = n_codes
+
+        self.level_base = []       # 每层第一个节点的 id
+        self.level_keys = []       # 每层节点的有序键 (parent + 1) * n_codes + code
+        self.level_var_nodes = []  # 每层：经过该层的变体所在节点（升序）
+        self.level_variants = []   # 与 level_var_nodes 对齐的变体编号
+        node_counts = []
+
+        parent = np.full(n_variants, -1, dtype=np.int64)  # 根节点记为 -1
+        next_id = 0
+        depth = 0
+        active = np.arange(n_variants)
+        while len(active):
+            codes = case_index.act_codes[first_rows[active] + depth] + 1
+            keys = (parent[active] + 1) * n_codes + codes
+            uniq, inv = np.unique(keys, return_inverse=True)
+            nodes = next_id + inv
+            order = np.argsort(nodes, kind="stable")
+
+            self.level_base.append(next_id)
+            self.level_keys.append(uniq)
+            self.level_var_nodes.append(nodes[order])
+            self.level_variants.append(active[order])
+            node_counts.append(np.bincount(inv, weights=counts[active], minlength=len(uniq)))
+
+            parent[active] = nodes
+            next_id += len(uniq)
+            depth += 1
+            active = active[lengths[active] > depth]
+
+        self.node_case_count = (np.concatenate(node_counts).astype(np.int64)
+                                if node_counts else np.empty(0, dtype=np.int64))
+        self.total_cases = int(counts.sum())
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_case_count)
+
+    def find(self, prefix: List[str]):
+        """前缀对应的 (深度, 节点)；不存在时返回 None"""
+        import numpy as np
+
+        node = -1
+        for depth, act in enumerate(prefix):
+            code = self._code_of.get(act)
+            if code is None or depth >= len(self.level_keys):
+                return None
+            key = (node + 1) * self._n_codes + code
+            keys = self.level_keys[depth]
+            i = int(np.searchsorted(keys, key))
+            if i >= len(keys) or keys[i] != key:
+                return None
+            node = self.level_base[depth] + i
+        return (len(prefix) - 1, node) if prefix else None
+
+    def prefix_case_count(self, prefix: List[str]) -> int:
+        found = self.find(prefix)
+        if not prefix:
+            return self.total_cases
+        return 0 if found is None else int(self.node_case_count[found[1]])
+
+    def prefix_variants(self, prefix: List[str]):
+        """以 prefix 开头的全部变体编号"""
+        import numpy as np
+
+        if not prefix:
+            return np.arange(self.case_index.num_variants)
+        found = self.find(prefix)
+        if found is None:
+            return np.empty(0, dtype=np.int64)
+        depth, node = found
+        nodes = self.level_var_nodes[depth]
+        lo, hi = np.searchsorted(nodes, [node, node + 1])
+        return self.level_variants[depth][lo:hi]
+
+    def exact_variants(self, sequences: List[List[str]]):
+        """与给定活动序列完全一致的变体编号"""
+        import numpy as np
+
+        found = []
+        lengths = self.case_index.variant_lengths
+        for seq in sequences:
+            for v in self.prefix_variants(list(seq)):
+                if lengths[v] == len(seq):
+                    found.append(int(v))
+        return np.array(sorted(set(found)), dtype=np.int64)
+
+    def top_k(self, k: int):
+        """case 数最多的前 k 个变体（CaseIndex 已按 case 数降序编号）"""
+        import numpy as np
+        return np.arange(min(max(k, 0), self.case_index.num_variants))
+
+    def coverage(self, fraction: float):
+        """覆盖至少 fraction 比例 case 的最少变体集合"""
+        import numpy as np
+
+        cum = np.cumsum(self.case_index.variant_case_counts)
+        if not len(cum):
+            return np.empty(0, dtype=np.int64)
+        m = int(np.searchsorted(cum, fraction * cum[-1] - 1e-9)) + 1
+        return np.arange(min(m, len(cum)))
+
+    def case_ids(self, variants):
+        """变体集合 → case id 数组"""
+        import numpy as np
+
+        ci = self.case_index
+        if len(variants) == 0:
+            return ci.case_ids[:0]
+        positions = np.concatenate([ci.variant_cases(int(v)) for v in variants])
+        return ci.case_ids[positions]
+
+    def variants_for_op(self, op: Dict):
+        """变体类筛选操作（filter_variant_top / filter_variant_prefix / filter_variant_set）→ 变体编号"""
+        if op["type"] == "filter_variant_top":
+            if op.get("coverage") is not None:
+                return self.coverage(op["coverage"])
+            return self.top_k(op["k"])
+        if op["type"] == "filter_variant_prefix":
+            return self.prefix_variants(op["prefix"])
+        return self.exact_variants(op["variants"])
+
+
+def filter_by_variants(df: pd.DataFrame, op: Dict, trie: "VariantTrie" = None,
+                       case_col: str = "case:concept:name", act_col: str = "concept:name",
+                       time_col: str = "time:timestamp") -> pd.DataFrame:
+    """
+    按变体类操作保留 case；trie 为 None 时基于 df 现建（重放操作链时）
+    """
+    if trie is None:
+        trie = VariantTrie(CaseIndex(df, case_col, act_col, time_col))
+    keep = trie.case_ids(trie.variants_for_op(op))
+    return df[df[case_col].isin(keep)]
@@ -1,15 +1,116 @@
 # cases_window.py
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem,
-    QSplitter, QTableWidget, QTableWidgetItem
+    QWidget, QVBoxLayout, QListView, QLabel, QPushButton,
+    QSplitter, QTableWidget, QTableWidgetItem, QAbstractItemView
 )
-from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtCore import Qt, QSize, QAbstractListModel, QModelIndex, pyqtSignal
 import pandas as pd
 from typing import Dict
-from cases_utils import extract_variants, get_case_event_details
+from cases_utils import CaseIndex
+
+FETCH_BATCH = 200  # 列表每次懒加载的行数
+
+
+class VariantListModel(QAbstractListModel):
+    """
+    变体列表：只在滚动到底时按批增加行数，显示文本在 data() 中按需生成
+    """
+
+    def __init__(self, case_index: CaseIndex, parent=None):
+        super().__init__(parent)
+        self.case_index = case_index
+        self._loaded = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < self.case_index.num_variants
+
+    def fetchMore(self, parent=QModelIndex()):
+        n = min(FETCH_BATCH, self.case_index.num_variants - self._loaded)
+        if n <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + n - 1)
+        self._loaded += n
+        self.endInsertRows()
+
+    def data(self, idx, role=Qt.DisplayRole):
+        if not idx.isValid():
+            return None
+        v = idx.row()
+        if role == Qt.DisplayRole:
+            case_count = int(self.case_index.variant_case_counts[v])
+            event_count = self.case_index.variant_event_count(v)
+            total = self.case_index.total_events
+            percent = 100 * event_count / total if total > 0 else 0
+            return f"Variant {v + 1}\n{case_count} cases ({percent:.1f}%)\n{event_count} events"
+        if role == Qt.ToolTipRole:
+            return " → ".join(self.case_index.variant_activities(v))
+        if role == Qt.UserRole:
+            return v
+        if role == Qt.SizeHintRole:
+            return QSize(200, 60)  # 三行显示
+        return None
+
+
+class CaseListModel(QAbstractListModel):
+    """
+    某个变体下的 case 列表：底层是 CaseIndex 中的一段位置数组，同样按批懒加载
+    """
+
+    def __init__(self, case_index: CaseIndex, parent=None, case_labels=None):
+        super().__init__(parent)
+        self.case_index = case_index
+        self.case_labels = case_labels  # 组合 case 键 → 可读标签（单列 case 时为 None）
+        self._positions = case_index.variant_cases(0)[:0]
+        self._loaded = 0
+
+    def set_variant(self, variant):
+        self.beginResetModel()
+        self._positions = self.case_index.variant_cases(variant)
+        self._loaded = 0
+        self.endResetModel()
+
+    def total(self):
+        return len(self._positions)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._positions)
+
+    def fetchMore(self, parent=QModelIndex()):
+        n = min(FETCH_BATCH, len(self._positions) - self._loaded)
+        if n <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + n - 1)
+        self._loaded += n
+        self.endInsertRows()
+
+    def data(self, idx, role=Qt.DisplayRole):
+        if not idx.isValid():
+            return None
+        pos = int(self._positions[idx.row()])
+        if role == Qt.DisplayRole:
+            case_id = self.case_index.case_ids[pos]
+            if self.case_labels is not None:
+                case_id = self.case_labels[case_id]
+            return f"{case_id}\n{self.case_index.case_length(pos)} events"
+        if role == Qt.UserRole:
+            return self.case_index.case_ids[pos]
+        if role == Qt.SizeHintRole:
+            return QSize(200, 44)
+        return None
+
 
 class CasesWindow(QWidget):
-    def __init__(self, df: pd.DataFrame, col_mapping: Dict[str, str]):
+    # 选中若干变体后请求在主日志中只保留它们：参数为各变体的活动序列列表
+    keep_variants_requested = pyqtSignal(list)
+
+    def __init__(self, df: pd.DataFrame, col_mapping: Dict[str, str], case_index: CaseIndex = None,
+                 case_labels=None):
         super().__init__()
         self.setWindowTitle("查看 Cases")
         self.resize(1100, 700)
@@ -21,89 +122,87 @@ class CasesWindow(QWidget):
         self.case_col_raw = self.col_mapping.get(self.case_col, self.case_col)
         self.act_col_raw = self.col_mapping.get(self.act_col, self.act_col)
         self.time_col_raw = self.col_mapping.get(self.time_col, self.time_col)
-        self.variants_map, self.case_events_map = extract_variants(df, self.case_col, self.act_col, self.time_col)
+        # 一次排序建立 case → 行区间、变体 → case 区间的索引，之后的选择都是切片
+        self.case_index = case_index or CaseIndex(df, self.case_col, self.act_col, self.time_col)
+        self.case_labels = case_labels
         self.init_ui()
         self.showMaximized()
 
     def init_ui(self):
         layout = QVBoxLayout(self)
         splitter = QSplitter(Qt.Horizontal)
-        self.lst_variants = QListWidget()
-        self.lst_cases = QListWidget()
+
+        self.variant_model = VariantListModel(self.case_index, self)
+        self.case_model = CaseListModel(self.case_index, self, case_labels=self.case_labels)
+
+        variant_panel = QWidget()
+        variant_layout = QVBoxLayout(variant_panel)
+        variant_layout.setContentsMargins(0, 0, 0, 0)
+        self.lbl_variants = QLabel(f"Variants ({self.case_index.num_variants})")
+        self.lst_variants = QListView()
+        self.lst_variants.setUniformItemSizes(True)
+        self.lst_variants.setModel(self.variant_model)
+        self.lst_variants.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        variant_layout.addWidget(self.lbl_variants)
+        variant_layout.addWidget(self.lst_variants)
+        btn_keep_variants = QPushButton("仅保留所选变体")
+        btn_keep_variants.clicked.connect(self.request_keep_selected_variants)
+        variant_layout.addWidget(btn_keep_variants)
+
+        case_panel = QWidget()
+        case_layout = QVBoxLayout(case_panel)
+        case_layout.setContentsMargins(0, 0, 0, 0)
+        self.lbl_cases = QLabel("Cases (0)")
+        self.lst_cases = QListView()
+        self.lst_cases.setUniformItemSizes(True)
+        self.lst_cases.setModel(self.case_model)
+        case_layout.addWidget(self.lbl_cases)
+        case_layout.addWidget(self.lst_cases)
+
         self.tbl_events = QTableWidget()
         self.tbl_events.setColumnCount(0)
         self.tbl_events.setRowCount(0)
-        self.lst_variants.currentItemChanged.connect(self.on_variant_selected)
-        self.lst_cases.currentItemChanged.connect(self.on_case_selected)
-        splitter.addWidget(self.lst_variants)
-        splitter.addWidget(self.lst_cases)
+        self.lst_variants.selectionModel().currentChanged.connect(self.on_variant_selected)
+        self.lst_cases.selectionModel().currentChanged.connect(self.on_case_selected)
+        splitter.addWidget(variant_panel)
+        splitter.addWidget(case_panel)
         splitter.addWidget(self.tbl_events)
         splitter.setSizes([200, 200, 700])
         layout.addWidget(splitter)
         self.load_variants()
 
     def load_variants(self):
-        self.lst_variants.clear()
-
-        # 添加表头
-        header = QListWidgetItem(f"Variants ({len(self.variants_map)})")
-        header.setFlags(Qt.NoItemFlags)
-        self.lst_variants.addItem(header)
-
-        # 计算事件总数
-        total_events = sum(len(events) for events in self.case_events_map.values())
-
-        # 构建并排序
-        variant_stats = []
-        for variant, case_ids in self.variants_map.items():
-            event_count = sum(len(self.case_events_map[case_id]) for case_id in case_ids)
-            variant_stats.append((variant, case_ids, event_count))
-
-        # 排序：先按 case 数降序，再按事件数占比降序
-        variant_stats.sort(key=lambda x: (-len(x[1]), -x[2]))
-
-        for i, (variant, case_ids, event_count) in enumerate(variant_stats, start=1):
-            case_count = len(case_ids)
-            percent = 100 * event_count / total_events if total_events > 0 else 0
-            text = f"Variant {i}\n{case_count} cases ({percent:.1f}%)\n{event_count} events"
-            item = QListWidgetItem(text)
-            item.setData(Qt.UserRole, variant)
-            item.setSizeHint(QSize(200, 60))  # 三行显示
-            self.lst_variants.addItem(item)
-
         # 默认选中第一个变体
-        if self.lst_variants.count() > 1:
-            self.lst_variants.setCurrentRow(1)
+        if self.variant_model.canFetchMore():
+            self.variant_model.fetchMore()
+        if self.variant_model.rowCount() > 0:
+            self.lst_variants.setCurrentIndex(self.variant_model.index(0))
 
     def on_variant_selected(self, current, _prev):
-        if not current or not current.data(Qt.UserRole):
+        if not current.isValid():
             return
         variant = current.data(Qt.UserRole)
-        case_ids = self.variants_map.get(variant, [])
-        self.lst_cases.clear()
+        self.case_model.set_variant(variant)
         self.tbl_events.clear()
 
-        # 添加 case 列表标题
-        header = QListWidgetItem(f"Cases ({len(case_ids)})")
-        header.setFlags(Qt.NoItemFlags)
-        self.lst_cases.addItem(header)
-
-        for case_id in case_ids:
-            num_events = len(self.case_events_map.get(case_id, []))
-            item = QListWidgetItem(f"{case_id}\n{num_events} events")
-            item.setData(Qt.UserRole, case_id)
-            item.setSizeHint(QSize(200, 44))
-            self.lst_cases.addItem(item)
+        self.lbl_cases.setText(f"Cases ({self.case_model.total()})")
 
         # 默认选中第一个 case
-        if self.lst_cases.count() > 1:
-            self.lst_cases.setCurrentRow(1)
+        if self.case_model.canFetchMore():
+            self.case_model.fetchMore()
+        if self.case_model.rowCount() > 0:
+            self.lst_cases.setCurrentIndex(self.case_model.index(0))
+
+    def request_keep_selected_variants(self):
+        rows = sorted({idx.row() for idx in self.lst_variants.selectionModel().selectedIndexes()})
+        if rows:
+            self.keep_variants_requested.emit([self.case_index.variant_activities(v) for v in rows])
 
     def on_case_selected(self, current, _prev):
-        if not current or not current.data(Qt.UserRole):
+        if not current.isValid():
             return
         case_id = current.data(Qt.UserRole)
-        df_case = get_case_event_details(self.df_raw, case_id, self.case_col, self.time_col)
+        df_case = self.case_index.case_events(case_id)
         self.show_event_table(df_case)
 
     def show_event_table(self, df: pd.DataFrame):
@@ -112,28 +211,31 @@ class CasesWindow(QWidget):
                 self.case_col_raw, self.act_col_raw, self.time_col_raw, "lifecycle:transition"
             ]
         ]
-        df = df.sort_values(by=self.time_col_raw)
 
-        # 拆分 Date 和 Time
-        df["__date__"] = pd.to_datetime(df[self.time_col_raw]).dt.date.astype(str)
-        df["__time__"] = pd.to_datetime(df[self.time_col_raw]).dt.time.astype(str)
+        # 拆分 Date 和 Time（整列转换一次，不再逐格 iloc）
+        times = pd.to_datetime(df[self.time_col_raw])
+        columns = {
+            "__date__": times.dt.date.tolist(),
+            "__time__": times.dt.time.tolist(),
+        }
 
         # 构建最终列顺序
         final_cols = ["__date__", "__time__"] + [col for col in display_cols if col not in [self.time_col_raw]]
         headers = ["Date", "Time"] + [
             "Activity" if col == self.act_col_raw else self.col_mapping.get(col, col) for col in final_cols[2:]
         ]
+        for col in final_cols[2:]:
+            columns[col] = df[col].tolist()
 
         self.tbl_events.setRowCount(len(df))
         self.tbl_events.setColumnCount(len(final_cols))
         self.tbl_events.setHorizontalHeaderLabels(headers)
 
-        for r in range(len(df)):
-            for c, col in enumerate(final_cols):
-                val = str(df.iloc[r][col])
-                item = QTableWidgetItem(val)
+        for c, col in enumerate(final_cols):
+            values = columns[col]
+            for r in range(len(df)):
+                item = QTableWidgetItem(str(values[r]))
                 item.setFlags(item.flags() ^ Qt.ItemIsEditable)
                 self.tbl_events.setItem(r, c, item)
 
         self.tbl_events.resizeColumnsToContents()
-
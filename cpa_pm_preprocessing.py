@@ -1,32 +1,222 @@
 # cpa_pm_preprocessing.py
+"""
+预处理函数。每个函数都有对应的流式阶段（stream_*）：
+
+    batches = iter_case_batches("log.csv", "case:concept:name")
+    batches = pipeline(batches,
+                       partial(stream_short_length, case_col=..., min_len=3),
+                       partial(stream_keep_occurrence, case_col=..., event_col=..., keep="first"))
+    write_csv_stream(batches, "out.csv")
+
+流式阶段逐批消费、逐批产出“case 完整”的 DataFrame（同一 case 的所有行在同一批内），
+内存只与批大小有关；输入须按 case 连续排列（如按 case、时间排序过的 CSV）。
+原有的整表函数是把整张表当作一个批次的薄封装。
+"""
 import pandas as pd
 
+STREAM_BATCH_ROWS = 200_000
+ENTITY_COL = "case:entity"  # 会话切分时，被会话编号替换掉的原 case 值保存在此（PM4Py 视为 trace 属性）
+
+
+def iter_case_batches(source, case_col, batch_rows=STREAM_BATCH_ROWS, **read_csv_kwargs):
+    """
+    把按 case 连续排列的数据切成 case 完整的批次。
+
+    Args:
+        source: CSV 路径（按 batch_rows 分块读取），或 DataFrame 块的可迭代对象
+        batch_rows: 每批的目标行数；单个 case 超过该行数时整段作为一批
+    Yields:
+        DataFrame，每个 case 的全部行都在同一批内
+    """
+    if isinstance(source, (str, bytes)) or hasattr(source, "__fspath__"):
+        chunks = pd.read_csv(source, chunksize=batch_rows, **read_csv_kwargs)
+    else:
+        chunks = source
+
+    pending = []
+    pending_rows = 0
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        pending.append(chunk)
+        pending_rows += len(chunk)
+        if pending_rows < batch_rows:
+            continue
+        buf = pd.concat(pending) if len(pending) > 1 else pending[0]
+        # 最后一个 case 可能延续到下一块，留到下一批
+        cases = buf[case_col].to_numpy()
+        cut = len(buf)
+        while cut > 0 and cases[cut - 1] == cases[-1]:
+            cut -= 1
+        if cut == 0:
+            pending, pending_rows = [buf], len(buf)
+            continue
+        yield buf.iloc[:cut]
+        rest = buf.iloc[cut:]
+        pending, pending_rows = [rest], len(rest)
+    if pending_rows:
+        yield pd.concat(pending) if len(pending) > 1 else pending[0]
+
+
+def pipeline(batches, *stages):
+    """依次套接流式阶段；每个阶段是 batches -> batches 的可调用对象（如 functools.partial）"""
+    for stage in stages:
+        batches = stage(batches)
+    return batches
+
+
+def write_csv_stream(batches, path, **to_csv_kwargs):
+    """逐批写出 CSV（表头只写一次），返回写出的行数"""
+    written = 0
+    for batch in batches:
+        batch.to_csv(path, mode="w" if written == 0 else "a", header=written == 0, index=False, **to_csv_kwargs)
+        written += len(batch)
+    if written == 0:
+        open(path, "w").close()
+    return written
+
+
+def collect_batches(batches):
+    """把流式结果拼回一张表"""
+    parts = [b for b in batches if not b.empty]
+    if not parts:
+        return None
+    return pd.concat(parts) if len(parts) > 1 else parts[0]
+
+
+def _collect(batches, like):
+    out = collect_batches(batches)
+    return like.iloc[:0].copy() if out is None else out.copy()
+
+
+# ────────────────────────────────────────────────────
+# 流式阶段
+# ────────────────────────────────────────────────────
+
+def stream_short_length(batches, case_col, min_len):
+    """删除 trace 长度 < min_len 的 case"""
+    for batch in batches:
+        lengths = batch.groupby(case_col, sort=False)[case_col].transform("size")
+        yield batch[(lengths >= min_len).to_numpy()]
+
+
+def _boundary_events(batch, case_col, event_col, time_col, which):
+    from cpa_utils import sort_case_time
+    ordered = sort_case_time(batch, case_col, time_col)  # 已有序时不再排序
+    grouped = ordered.groupby(case_col, sort=False)[event_col]
+    return grouped.first() if which == "first" else grouped.last()
+
+
+def stream_truncated_start(batches, case_col, event_col, required_start_event, time_col="time:timestamp"):
+    """删除未以 required_start_event 开始的 case"""
+    for batch in batches:
+        first_events = _boundary_events(batch, case_col, event_col, time_col, "first")
+        keep_cases = first_events.index[first_events == required_start_event]
+        yield batch[batch[case_col].isin(keep_cases)]
+
+
+def stream_truncated_end(batches, case_col, event_col, required_end_event, time_col="time:timestamp"):
+    """删除未以 required_end_event 结尾的 case"""
+    for batch in batches:
+        last_events = _boundary_events(batch, case_col, event_col, time_col, "last")
+        keep_cases = last_events.index[last_events == required_end_event]
+        yield batch[batch[case_col].isin(keep_cases)]
+
+
+def stream_merge_rows(batches, case_col, activity_col, time_col, agg_cols=None, time_strategy="min"):
+    """同 case 同 activity 的多行合并为一行（见 merge_rows）"""
+    from cpa_utils import dedup_occurrences, sort_case_time
+
+    for batch in batches:
+        batch = batch[batch[case_col].notna() & batch[activity_col].notna()]
+        times = batch.groupby([case_col, activity_col], sort=False)[time_col].agg(
+            "min" if time_strategy == "min" else "max")
+        # 保留每组时间最早的一行，再写回组内的最早 / 最晚时间
+        merged = dedup_occurrences(batch, keep="first", agg_fields=agg_cols or None,
+                                   case_col=case_col, act_col=activity_col, time_col=time_col)
+        keys = pd.MultiIndex.from_frame(merged[[case_col, activity_col]])
+        merged[time_col] = times.reindex(keys).to_numpy()
+        yield sort_case_time(merged, case_col, time_col)
+
+
+def stream_keep_occurrence(batches, case_col, event_col, keep="first", time_col="time:timestamp"):
+    """每个 trace 内同一活动只保留一次出现（keep 同 cpa_utils.dedup_occurrences）"""
+    from cpa_utils import dedup_occurrences
+
+    for batch in batches:
+        yield dedup_occurrences(batch, keep=keep, case_col=case_col, act_col=event_col, time_col=time_col)
+
+
+def stream_sessionize(batches, entity_col, gap_seconds, time_col="time:timestamp", start_activities=None,
+                      activity_col="concept:name", session_col="case:concept:name", entity_keep_col=ENTITY_COL):
+    """
+    按不活跃间隔把每个实体（用户等）的事件切分为会话，会话编号写入 session_col。
+    批次须“实体完整”（iter_case_batches(..., case_col=entity_col)）。
+
+    同一实体内相邻事件间隔 > gap_seconds、或事件活动属于 start_activities 时开始新会话；
+    时间缺失的事件排在实体末尾，自成一个会话。
+    会话编号为跨批次连续递增的 int64；entity_col 与 session_col 相同时，原实体值另存到 entity_keep_col。
+    """
+    import numpy as np
+    from cpa_utils import _mark_sorted, _order_keys, _pair_order
+
+    gap_ns = int(gap_seconds * 1_000_000_000)
+    if start_activities is not None and isinstance(start_activities, str):
+        start_activities = [start_activities]
+    offset = 0
+    for batch in batches:
+        if batch.empty:
+            yield batch
+            continue
+        times = batch[time_col]
+        if not pd.api.types.is_datetime64_any_dtype(times):
+            times = pd.to_datetime(times, errors="coerce")
+        # 一次排序：实体内按时间先后
+        entity_keys = _order_keys(batch[entity_col])
+        time_keys = _order_keys(times)
+        order = _pair_order(entity_keys, time_keys)
+        entity_keys, time_keys = entity_keys[order], time_keys[order]
+
+        # 一次 diff 判定会话起点，cumsum 得到编号
+        new = np.empty(len(order), dtype=bool)
+        new[0] = True
+        new[1:] = (entity_keys[1:] != entity_keys[:-1]) | (np.diff(time_keys) > gap_ns)
+        if start_activities:
+            new |= batch[activity_col].isin(start_activities).to_numpy()[order]
+        session = np.cumsum(new, dtype=np.int64) + (offset - 1)
+        offset = int(session[-1]) + 1
+
+        out = batch.take(order)
+        if entity_col == session_col and entity_keep_col:
+            out[entity_keep_col] = out[entity_col]
+        out[session_col] = session
+        _mark_sorted(out, session_col, time_col)
+        yield out
+
+
+# ────────────────────────────────────────────────────
+# 整表函数（整张表作为一个批次）
+# ────────────────────────────────────────────────────
 
 def delete_traces_with_short_length(df, case_col, min_len):
     """
     删除 trace 长度 < min_len 的行。
     """
-    trace_lengths = df[case_col].value_counts()
-    keep_cases = trace_lengths[trace_lengths >= min_len].index
-    return df[df[case_col].isin(keep_cases)].copy()
+    return _collect(stream_short_length([df], case_col, min_len), df)
 
 
 def delete_truncated_traces_start(df, case_col, event_col, required_start_event):
     """
     删除未以 required_start_event 开始的 trace。
     """
-    first_events = df.sort_values("time:timestamp").groupby(case_col)[event_col].first()
-    keep_cases = first_events[first_events == required_start_event].index
-    return df[df[case_col].isin(keep_cases)].copy()
+    return _collect(stream_truncated_start([df], case_col, event_col, required_start_event), df)
 
 
 def delete_truncated_traces_end(df, case_col, event_col, required_end_event):
     """
     删除未以 required_end_event 结尾的 trace。
     """
-    last_events = df.sort_values("time:timestamp").groupby(case_col)[event_col].last()
-    keep_cases = last_events[last_events == required_end_event].index
-    return df[df[case_col].isin(keep_cases)].copy()
+    return _collect(stream_truncated_end([df], case_col, event_col, required_end_event), df)
 
 
 def merge_rows(df, case_col, activity_col, time_col, agg_cols=None, time_strategy='min'):
@@ -34,38 +224,30 @@ def merge_rows(df, case_col, activity_col, time_col, agg_cols=None, time_strateg
     合并重复活动行（同 case 同 activity 多行）为一行，按时间排序。
     agg_cols 可指定额外属性字段，如何聚合。
     """
-    if agg_cols is None:
-        agg_cols = []
-
-    df = df.sort_values([case_col, time_col])
-    grouped = df.groupby([case_col, activity_col])
-
-    records = []
-    for (case, act), group in grouped:
-        row = group.iloc[0].copy()
-        row[time_col] = group[time_col].min() if time_strategy == 'min' else group[time_col].max()
-        for col in agg_cols:
-            row[col] = '|'.join(group[col].dropna().astype(str).unique())
-        records.append(row)
-
-    merged_df = pd.DataFrame(records)
-    return merged_df.sort_values([case_col, time_col])
+    return _collect(stream_merge_rows([df], case_col, activity_col, time_col, agg_cols, time_strategy), df)
 
 
 def keep_first_occurrence(df, case_col, event_col):
     """
     保留每个 trace 中事件的第一次出现（例如每种活动只保留一次）。
     """
-    df = df.sort_values("time:timestamp")
-    return df.drop_duplicates(subset=[case_col, event_col], keep="first").copy()
+    return _collect(stream_keep_occurrence([df], case_col, event_col, keep="first"), df)
 
 
 def keep_last_occurrence(df, case_col, event_col):
     """
     保留每个 trace 中事件的最后一次出现。
     """
-    df = df.sort_values("time:timestamp")
-    return df.drop_duplicates(subset=[case_col, event_col], keep="last").copy()
+    return _collect(stream_keep_occurrence([df], case_col, event_col, keep="last"), df)
+
+
+def sessionize(df, entity_col, gap_seconds, time_col="time:timestamp", start_activities=None,
+               activity_col="concept:name", session_col="case:concept:name", entity_keep_col=ENTITY_COL):
+    """
+    按不活跃间隔（以及可选的会话起始活动）把实体的事件切分为会话，结果按 (会话, 时间) 排序。
+    """
+    return _collect(stream_sessionize([df], entity_col, gap_seconds, time_col, start_activities,
+                                      activity_col, session_col, entity_keep_col), df)
 from pm4py.objects.conversion.log import converter as log_converter
 
 def extract_activities_from_log(event_log):
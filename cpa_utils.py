@@ -1,5 +1,7 @@
 # cpa_utils.py
 
+import weakref
+
 import pandas as pd
 
 def filter_events_by_global_frequency(df, event_col="concept:name", min_freq=1):
@@ -17,21 +19,329 @@ def keep_first_occurrence_only(event_log):
         event_log: PM4Py 的 EventLog
     Returns:
         新的 EventLog
+
+    已改为 DataFrame 上的 dedup_occurrences，不再逐事件遍历 PM4Py 对象
     """
-    from pm4py.objects.log.obj import EventLog, Trace
+    from pm4py.objects.conversion.log import converter as log_converter
+
+    df = log_converter.apply(event_log, variant=log_converter.Variants.TO_DATA_FRAME)
+    df = dedup_occurrences(df, keep="first")
+    return log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
+
+
+def is_case_time_ordered(case_codes, times):
+    """
+    行是否已按 (case, time) 排列：同一 case 的行连续，且 case 内时间不减。
+    case_codes 须为按出现顺序编号的整数编码（pd.factorize(sort=False)）。
+    """
+    import numpy as np
+
+    if len(case_codes) < 2:
+        return True
+    step = np.diff(case_codes)
+    if (step < 0).any():
+        return False  # 某个 case 再次出现：行未按 case 聚在一起
+    same = step == 0
+    t = times.view(np.int64)
+    return bool((t[1:][same] >= t[:-1][same]).all())
+
+
+# 已确认按 (case, time) 排序的 DataFrame：id(df) → (弱引用, case 列, time 列, 行数)。
+# 只在弱引用仍指向同一个对象时才信任：对象被回收后地址可能被新对象复用，单凭 id() 不可靠；
+# 过滤 / 复制得到的新对象不在表中，需重新校验
+_SORTED = {}
+
+
+def _mark_sorted(df, case_col, time_col):
+    key = id(df)
+    ref = weakref.ref(df, lambda _, key=key: _SORTED.pop(key, None))
+    _SORTED[key] = (ref, case_col, time_col, len(df))
 
-    new_log = EventLog()
-    for trace in event_log:
-        seen = set()
-        new_trace = Trace()
-        for event in trace:
-            act = event.get("concept:name", "undefined")
-            if act not in seen:
-                new_trace.append(event)
-                seen.add(act)
-        if new_trace:
-            new_log.append(new_trace)
-    return new_log
+
+def _is_marked_sorted(df, case_col, time_col):
+    entry = _SORTED.get(id(df))
+    return entry is not None and entry[0]() is df and entry[1:] == (case_col, time_col, len(df))
+
+
+def _order_keys(values):
+    """排序用的 int64 键，与 sort_values 的顺序一致（缺失值排在最后）"""
+    import numpy as np
+
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        if getattr(values.dtype, "tz", None) is not None:
+            values = values.dt.tz_convert(None)
+        keys = values.to_numpy(dtype="datetime64[ns]").view(np.int64).copy()
+        keys[values.isna().to_numpy()] = np.iinfo(np.int64).max
+        return keys
+    codes, uniques = pd.factorize(values, sort=True)
+    return np.where(codes < 0, len(uniques), codes).astype(np.int64)
+
+
+def _pair_order(major, minor):
+    """
+    与 np.lexsort((minor, major)) 相同的稳定排列（major 为非负编码，minor 为 _order_keys 的键）。
+    minor 去掉公共精度（秒 / 毫秒 / 微秒）后与 major 能拼进一个 int64 时只做一次 argsort，
+    否则回退为 lexsort。
+    """
+    import numpy as np
+
+    if len(major) == 0 or major.min() < 0:
+        return np.lexsort((minor, major))
+    missing = minor == np.iinfo(np.int64).max  # NaT / 缺失值，排在最后
+    rel = minor.copy()
+    present = ~missing
+    if not present.any():
+        return np.argsort(major, kind="stable")
+    rel[present] -= rel[present].min()
+    for unit in (1_000_000_000, 1_000_000, 1_000):
+        if not (rel[present] % unit).any():
+            rel[present] //= unit
+            break
+    rel[missing] = rel[present].max() + 1
+    bits = int(rel.max()).bit_length()
+    if int(major.max()).bit_length() + bits > 62:
+        return np.lexsort((minor, major))
+    return np.argsort((major << bits) | rel, kind="stable")
+
+
+def is_sorted_by_case_time(df, case_col="case:concept:name", time_col="time:timestamp"):
+    """
+    df 是否已按 (case, time) 排序（与 sort_values([case, time]) 的结果顺序一致）。
+    带有效标记时 O(1)；否则 O(n) 校验，通过后给 df 打上标记。
+    """
+    import numpy as np
+
+    if _is_marked_sorted(df, case_col, time_col):
+        return True
+    if len(df) > 1:
+        # 按出现顺序编码：有序时编码逐段 +1，且各 case 值本身递增（只需检查去重后的值）
+        codes, uniques = pd.factorize(df[case_col], sort=False)
+        step = np.diff(codes)
+        if codes[0] != 0 or ((step != 0) & (step != 1)).any():
+            return False
+        try:
+            if not pd.Index(uniques).is_monotonic_increasing:
+                return False
+        except TypeError:
+            return False
+        same = step == 0
+        keys = _order_keys(df[time_col])
+        if not (keys[1:][same] >= keys[:-1][same]).all():
+            return False
+    _mark_sorted(df, case_col, time_col)
+    return True
+
+
+def sort_case_time(df, case_col="case:concept:name", time_col="time:timestamp"):
+    """
+    按 (case, time) 稳定排序；已有序时原样返回，不复制。
+    需要排序时在整数编码上 lexsort，结果与 sort_values([case, time]) 相同。
+    """
+    import numpy as np
+
+    if is_sorted_by_case_time(df, case_col, time_col):
+        return df
+    order = _pair_order(_order_keys(df[case_col]), _order_keys(df[time_col]))
+    out = df.take(order)
+    _mark_sorted(out, case_col, time_col)
+    return out
+
+
+def insert_sorted(df, new_rows, case_col="case:concept:name", time_col="time:timestamp", ignore_index=False):
+    """
+    把少量新行并入已按 (case, time) 排序的 df，结果等同于
+    pd.concat([df, new_rows], ignore_index=ignore_index).sort_values([case, time])（稳定排序）。
+    df 无序、或 case / 时间无法直接比较时回退为一次整体排序。
+    """
+    import numpy as np
+
+    combined = pd.concat([df, new_rows], ignore_index=ignore_index)
+    n, m = len(df), len(new_rows)
+    if m == 0 or not pd.api.types.is_datetime64_any_dtype(combined[time_col].dtype) \
+            or not is_sorted_by_case_time(df, case_col, time_col):
+        return sort_case_time(combined, case_col, time_col)
+
+    new_part = combined.iloc[n:]
+    try:
+        if new_part[case_col].isna().any():
+            raise TypeError
+        new_order = _pair_order(_order_keys(new_part[case_col]), _order_keys(new_part[time_col]))
+        new_cases = new_part[case_col].to_numpy()[new_order]
+        old_cases = combined[case_col].to_numpy()[:n]
+        lo = np.searchsorted(old_cases, new_cases, side="left")
+        hi = np.searchsorted(old_cases, new_cases, side="right")
+    except TypeError:
+        return sort_case_time(combined, case_col, time_col)
+
+    # 同一 case 段内按时间定位（side="right"：与已有行时间相同时排在其后）
+    old_keys = _order_keys(combined[time_col].iloc[:n])
+    new_keys = _order_keys(new_part[time_col])[new_order]
+    pos = lo.copy()
+    starts = np.flatnonzero(np.r_[True, new_cases[1:] != new_cases[:-1]])
+    for a, b in zip(starts, np.r_[starts[1:], m]):
+        seg_lo, seg_hi = lo[a], hi[a]
+        pos[a:b] = seg_lo + np.searchsorted(old_keys[seg_lo:seg_hi], new_keys[a:b], side="right")
+
+    order = np.insert(np.arange(n), pos, n + new_order)
+    out = combined.take(order)
+    _mark_sorted(out, case_col, time_col)
+    return out
+
+
+def unique_join(groups, values, sep="|"):
+    """
+    分组“去重拼接”内核，逐组等价于 sep.join(vals.dropna().astype(str).unique())。
+
+    值先编码为整数（同一字符串形式的取值共用一个编码），(组, 编码) 对向量化去重并保持组内
+    首次出现顺序；组内编码序列按哈希归并，相同序列的拼接字符串只生成一次。
+    Args:
+        groups: 每行所属的分组标签或整数编码
+        values: 与 groups 等长的取值
+    Returns:
+        pd.Series：index 为含非空值的分组（按首次出现顺序），值为拼接结果；全空的分组不出现
+    """
+    import numpy as np
+    from log_summary import sequence_keys
+
+    values = pd.Series(values).reset_index(drop=True)
+    notna = values.notna().to_numpy()
+    group_codes, group_labels = pd.factorize(np.asarray(groups)[notna], sort=False)
+    raw_codes, raw_uniques = pd.factorize(values[notna], sort=False)
+    str_codes, str_uniques = pd.factorize(pd.Index(raw_uniques).astype(str), sort=False)
+    codes = str_codes[raw_codes]
+    if not len(codes):
+        return pd.Series(dtype=object)
+
+    # (组, 编码) 去重，保留首次出现位置，再按组稳定排列
+    pairs = group_codes.astype(np.int64) * len(str_uniques) + codes
+    first = np.sort(np.unique(pairs, return_index=True)[1])
+    pair_groups, pair_codes = group_codes[first], codes[first]
+    order = np.argsort(pair_groups, kind="stable")
+    pair_groups, pair_codes = pair_groups[order], pair_codes[order]
+    starts = np.flatnonzero(np.r_[True, pair_groups[1:] != pair_groups[:-1]])
+    ends = np.r_[starts[1:], len(pair_codes)]
+
+    # 相同编码序列只拼接一次
+    set_ids, _ = pd.factorize(sequence_keys(pair_codes, starts), sort=False)
+    reps = np.unique(set_ids, return_index=True)[1]
+    names = np.asarray(str_uniques, dtype=object)
+    joined = np.array([sep.join(names[pair_codes[starts[g]:ends[g]]]) for g in reps], dtype=object)
+    return pd.Series(joined[set_ids], index=group_labels[pair_groups[starts]])
+
+
+def pack_case_key(df, cols, sep="|", na_label="unknown"):
+    """
+    多列组合的 case 标识打包为单个 int64 键，代替逐行拼接字符串。
+
+    各列分别编码后按位权合并（乘积将溢出 int64 时先压缩为稠密编码），最后重新编号为
+    0..k-1（按首次出现顺序）；可读标签只为 k 个不同的组合生成一次，供显示与导出时查表。
+    Returns:
+        keys:   与 df 等长的 int64 数组
+        labels: 长度为 k 的 object 数组，labels[key] 形如 "v1|v2"（缺失值写作 na_label）
+    """
+    import numpy as np
+
+    keys = np.zeros(len(df), dtype=np.int64)
+    card = 1
+    for col in cols:
+        codes, uniques = pd.factorize(df[col], use_na_sentinel=False)
+        n = max(len(uniques), 1)
+        if card > np.iinfo(np.int64).max // n:
+            keys, uniq = pd.factorize(keys)
+            card = max(len(uniq), 1)
+        keys = keys.astype(np.int64) * n + codes
+        card *= n
+    keys = pd.factorize(keys, sort=False)[0].astype(np.int64)
+
+    # 每个键第一次出现的行：倒序赋值，较早的行最后写入
+    k = int(keys.max()) + 1 if len(keys) else 0
+    first = np.empty(k, dtype=np.int64)
+    first[keys[::-1]] = np.arange(len(keys) - 1, -1, -1)
+    parts = []
+    for col in cols:
+        vals = pd.Series(df[col].to_numpy()[first], dtype=object)
+        parts.append(vals.where(vals.notna(), na_label).astype(str))
+    labels = parts[0].str.cat(parts[1:], sep=sep) if len(parts) > 1 else parts[0]
+    return keys, labels.to_numpy(dtype=object)
+
+
+def dedup_occurrences(df, keep="first", activities=None, agg_fields=None, new_col=None, agg_sep="|",
+                      case_col="case:concept:name", act_col="concept:name", time_col="time:timestamp"):
+    """
+    每个 trace 内，同一活动只保留一次出现（第一次 / 最后一次 / 第 n 次）。
+    全部在 (case, activity) 整数编码上完成；输入已按 (case, time) 排列时不再排序。
+
+    Args:
+        keep: "first" / "last" / 整数 n（n ≥ 1 为第 n 次，n ≤ -1 为倒数第 |n| 次；
+              出现次数不足时保留最接近的一次）
+        activities: 只对这些活动去重（None 表示全部活动）；其他行原样保留
+        agg_fields: 每组（保留行与被删除的重复行）的这些字段去重后用 agg_sep 拼接，写回保留行
+        new_col: 聚合结果写入的新列名（仅 agg_fields 只有一个字段时有意义；None 表示覆盖原列）
+    Returns:
+        case 按首次出现顺序、case 内按时间排列的新 DataFrame（保留原行索引）
+    """
+    import numpy as np
+
+    if keep == "first":
+        nth = 1
+    elif keep == "last":
+        nth = -1
+    else:
+        nth = int(keep)
+        if nth == 0:
+            raise ValueError("keep 为整数时不能为 0")
+
+    times = df[time_col]
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times, errors="coerce")
+    if getattr(times.dtype, "tz", None) is not None:
+        times = times.dt.tz_convert(None)
+    ns = times.to_numpy(dtype="datetime64[ns]")
+
+    case_codes = pd.factorize(df[case_col], sort=False)[0]
+    if is_case_time_ordered(case_codes, ns):
+        work = df
+    else:
+        order = np.lexsort((ns, case_codes))  # 稳定：同一时间保持原行顺序
+        work = df.take(order)
+        case_codes = case_codes[order]
+
+    # 缺失活动（编码 -1）自成一类，与其他活动一样参与去重：编码整体 +1，NaN 取 0
+    act_codes, act_names = pd.factorize(work[act_col], sort=False)
+    act_codes = act_codes + 1
+    key = case_codes.astype(np.int64) * (len(act_names) + 1) + act_codes
+    eligible = np.ones(len(work), dtype=bool)
+    if activities is not None:
+        wanted = pd.Index(list(activities))
+        codes = act_names.get_indexer(wanted.dropna()) + 1  # 不存在的活动为 0，先去掉
+        codes = codes[codes > 0]
+        if wanted.hasnans:
+            codes = np.append(codes, 0)
+        eligible = np.isin(act_codes, codes)
+
+    # 组内序号与组大小：出现次数不足 |n| 次时取最接近的一次
+    key_s = pd.Series(key)
+    grouped = key_s.groupby(key, sort=False)
+    rank = grouped.cumcount().to_numpy()
+    size = grouped.transform("size").to_numpy()
+    target = np.minimum(nth - 1, size - 1) if nth > 0 else np.maximum(size + nth, 0)
+    keep_mask = ~eligible | (rank == target)
+
+    result = work[keep_mask].copy()
+
+    if agg_fields:
+        # 每个参与去重的 (case, activity) 组：全部出现的字段值去重拼接，写回保留行
+        kept_keys = key[keep_mask]
+        pos = np.flatnonzero(eligible[keep_mask])
+        for field in agg_fields:
+            joined = unique_join(key[eligible], work[field].iloc[eligible], sep=agg_sep)
+            out_col = new_col or field
+            col = (result[out_col].astype(object).to_numpy(copy=True)
+                   if out_col in result.columns else np.full(len(result), np.nan, dtype=object))
+            col[pos] = joined.reindex(kept_keys[pos]).fillna("").to_numpy()
+            result[out_col] = col
+    return result
 
 import pandas as pd
 
@@ -49,11 +359,9 @@ def merge_activities_in_dataframe(df, activities, new_name):
         row["time:timestamp"] = group["time:timestamp"].min()
         merged_rows.append(row)
 
-    df = df[~df["is_target"]]
-    df = pd.concat([df, pd.DataFrame(merged_rows)], ignore_index=True)
-    df = df.drop(columns=["is_target"])
-    df = df.sort_values(by=["case:concept:name", "time:timestamp"])
-    return df
+    df = df[~df["is_target"]].drop(columns=["is_target"])
+    new_rows = pd.DataFrame(merged_rows).drop(columns=["is_target"], errors="ignore")
+    return insert_sorted(df, new_rows, ignore_index=True)
 
 
 
@@ -61,7 +369,7 @@ def enrich_with_event_order(df: pd.DataFrame, case_col: str, timestamp_col: str)
     """
     对每个 case 内的事件按时间排序后，添加事件序号（event_index）
     """
-    df = df.sort_values(by=[case_col, timestamp_col])
+    df = sort_case_time(df, case_col, timestamp_col).copy()
     df["event_index"] = df.groupby(case_col).cumcount() + 1
     return df
 
@@ -70,13 +378,153 @@ def enrich_with_duration(df: pd.DataFrame, case_col: str, timestamp_col: str) ->
     """
     添加 duration 字段，表示当前事件与前一事件之间的时间差（单位：秒）
     """
-    df = df.sort_values(by=[case_col, timestamp_col])
+    df = sort_case_time(df, case_col, timestamp_col).copy()
     df["prev_time"] = df.groupby(case_col)[timestamp_col].shift(1)
     df["duration"] = (df[timestamp_col] - df["prev_time"]).dt.total_seconds()
     df = df.drop(columns=["prev_time"])
     return df
 
 
+def compute_transition_performance(df, case_col="case:concept:name", act_col="concept:name", time_col="time:timestamp"):
+    """
+    批量计算直接跟随边 (a → b) 与活动的等待时间统计（单位：秒）。
+    等待时间即 enrich_with_duration 中的 duration：当前事件与同 case 前一事件的时间差。
+    全部基于整数活动编码的分组归约完成，不逐事件循环。
+
+    Returns:
+        edge_stats:     以 (source, target) 为索引，列为 count / mean / median / p95
+        activity_stats: 以活动名为索引，列同上（进入该活动前的等待时间）
+    """
+    cols = ["count", "mean", "median", "p95"]
+    work = df[[case_col, act_col, time_col]].copy()
+    if not pd.api.types.is_datetime64_any_dtype(work[time_col]):
+        work[time_col] = pd.to_datetime(work[time_col], errors="coerce")
+    work = enrich_with_duration(work, case_col, time_col)
+
+    acts = work[act_col].astype("category")
+    codes = acts.cat.codes.to_numpy()
+    src = pd.Series(codes).shift(1, fill_value=-1).to_numpy()
+
+    # 同一 case 的第一个事件没有前驱，不构成边；缺失活动（编码 -1）也不参与
+    has_prev = work.groupby(case_col, sort=False).cumcount().to_numpy() > 0
+    has_prev &= (src >= 0) & (codes >= 0)
+    trans = pd.DataFrame({
+        "source": src[has_prev],
+        "target": codes[has_prev],
+        "wait": work["duration"].to_numpy()[has_prev],
+    })
+
+    categories = acts.cat.categories
+    if trans.empty:
+        edge_index = pd.MultiIndex.from_arrays([[], []], names=["source", "target"])
+        return (pd.DataFrame(columns=cols, index=edge_index),
+                pd.DataFrame(columns=cols, index=pd.Index([], name=act_col)))
+
+    def reduce(grouped):
+        return pd.DataFrame({
+            "count": grouped.size(),
+            "mean": grouped.mean(),
+            "median": grouped.median(),
+            "p95": grouped.quantile(0.95),
+        })
+
+    edge_stats = reduce(trans.groupby(["source", "target"], sort=False)["wait"])
+    edge_stats.index = pd.MultiIndex.from_arrays([
+        categories[edge_stats.index.get_level_values(0)],
+        categories[edge_stats.index.get_level_values(1)],
+    ], names=["source", "target"])
+
+    activity_stats = reduce(trans.groupby("target", sort=False)["wait"])
+    activity_stats.index = pd.Index(categories[activity_stats.index], name=act_col)
+    return edge_stats, activity_stats
+
+
+def compute_windowed_dfg(df, freq="M", case_col="case:concept:name", act_col="concept:name", time_col="time:timestamp"):
+    """
+    按时间窗口（日 "D" / 周 "W" / 月 "M"）切分日志，一次排序后同时得到每个窗口的 DFG 与活动频次。
+    边 (a → b) 归入 b 发生时刻所在的窗口；跨窗口的 case 只在各自窗口中贡献对应的边。
+
+    Returns:
+        windows:         pd.PeriodIndex，按时间排序的全部窗口
+        edge_counts:     以 (window, source, target) 为索引的频次 Series（window 为窗口序号）
+        activity_counts: 以 (window, activity) 为索引的频次 Series
+    """
+    import numpy as np
+
+    times = df[time_col]
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times, errors="coerce")
+    if getattr(times.dtype, "tz", None) is not None:
+        times = times.dt.tz_convert(None)
+    valid = (times.notna() & df[act_col].notna()).to_numpy()
+
+    case_codes = pd.factorize(df[case_col].to_numpy()[valid])[0]
+    act_codes, act_names = pd.factorize(df[act_col].to_numpy()[valid])
+    periods = times[valid].dt.to_period(freq)
+    win_codes, windows = pd.factorize(periods, sort=True)
+    ns = times[valid].to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+    # 一次排序：case 内按时间先后
+    order = np.lexsort((ns, case_codes))
+    case_codes, act_codes, win_codes = case_codes[order], act_codes[order], win_codes[order]
+
+    same_case = case_codes[1:] == case_codes[:-1]
+    edge_counts = pd.Series(1, index=pd.MultiIndex.from_arrays([
+        win_codes[1:][same_case], act_codes[:-1][same_case], act_codes[1:][same_case]
+    ], names=["window", "source", "target"])).groupby(level=[0, 1, 2]).size()
+    edge_counts.index = edge_counts.index.set_levels(
+        [edge_counts.index.levels[1].map(lambda c: act_names[c]),
+         edge_counts.index.levels[2].map(lambda c: act_names[c])], level=[1, 2])
+
+    activity_counts = pd.Series(1, index=pd.MultiIndex.from_arrays(
+        [win_codes, act_codes], names=["window", act_col])).groupby(level=[0, 1]).size()
+    activity_counts.index = activity_counts.index.set_levels(
+        activity_counts.index.levels[1].map(lambda c: act_names[c]), level=1)
+    return pd.PeriodIndex(windows), edge_counts, activity_counts
+
+
+def stratified_case_sample(df, fraction, seed=0, case_col="case:concept:name", act_col="concept:name",
+                           time_col="time:timestamp"):
+    """
+    按 (变体, 开始月份) 分层的可复现 case 抽样，返回被抽中 case 的全部事件（保持原行顺序）。
+
+    case 先按层、层内按随机键排列，再做等距（系统）抽样：每层抽到 ⌊n·fraction⌋ 或 ⌈n·fraction⌉ 个，
+    不足一个的稀有层按概率 n·fraction 入选，总数约为 case 数 × fraction。
+    同一数据、同一 seed 的结果相同（case 按 id 排序后抽取，与 case 出现顺序无关）。
+    """
+    import numpy as np
+    from log_summary import sequence_keys
+
+    if fraction <= 0:
+        raise ValueError("fraction 必须大于 0")
+    if fraction >= 1 or df.empty:
+        return df
+
+    times = df[time_col]
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times, errors="coerce")
+    if getattr(times.dtype, "tz", None) is not None:
+        times = times.dt.tz_convert(None)
+    case_codes = _order_keys(df[case_col])
+    order = _pair_order(case_codes, _order_keys(times))
+    sorted_codes = case_codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+
+    variants = sequence_keys(pd.factorize(df[act_col].to_numpy()[order])[0], starts)
+    months = times.to_numpy(dtype="datetime64[ns]")[order][starts].astype("datetime64[M]").view(np.int64)
+
+    rng = np.random.default_rng(seed)
+    layout = np.lexsort((rng.random(len(starts)), months, variants))
+    steps = np.floor(np.arange(len(starts) + 1) * fraction + rng.random())
+    picked = layout[np.diff(steps) > 0]
+    if not len(picked):
+        picked = layout[:1]
+
+    keep = np.zeros(int(sorted_codes[-1]) + 1, dtype=bool)
+    keep[sorted_codes[starts[picked]]] = True
+    return df[keep[case_codes]]
+
+
 from pm4py.objects.conversion.log import converter as log_converter
 import pandas as pd
 
@@ -86,40 +534,40 @@ def merge_duplicate_activities_user_config(df, case_col, activity_col, time_col,
     agg_config 是一个 dict: {col_name: 'min'|'max'|'avg'|'join'}
     """
     import numpy as np
-    from collections import defaultdict
 
-    def aggregate_column(group, method):
+    df = sort_case_time(df[df[case_col].notna()], case_col, time_col)
+
+    # 只处理目标活动出现 2 次以上的 case：每个 case 一组，保留第一行
+    sub_mask = (df[activity_col] == target_activity).to_numpy()
+    case_codes = pd.factorize(df[case_col], sort=False)[0]
+    counts = np.bincount(case_codes[sub_mask], minlength=case_codes.max() + 1 if len(case_codes) else 0)
+    merge_mask = sub_mask & (counts[case_codes] > 1)
+    if not merge_mask.any():
+        return df
+
+    sub = df[merge_mask]
+    groups = case_codes[merge_mask]
+    group_ids, first = np.unique(groups, return_index=True)  # 编码按出现顺序分配，first 即升序
+    grouped = sub.groupby(groups)
+    rows = sub.iloc[first].copy()
+    rows[time_col] = grouped[time_col].min().to_numpy()
+
+    for col, method in agg_config.items():
+        if col not in sub.columns:
+            continue
         if method == 'min':
-            return group.min()
+            values = grouped[col].min()
         elif method == 'max':
-            return group.max()
+            values = grouped[col].max()
         elif method == 'avg':
-            return group.mean(numeric_only=True)
+            values = grouped[col].mean()
         elif method == 'join':
-            return '|'.join(group.dropna().astype(str).unique())
+            values = unique_join(groups, sub[col]).reindex(group_ids).fillna("")
         else:
-            return group.iloc[0]
-
-    df = df.sort_values([case_col, time_col])
-    records = []
+            continue  # 其他方式：保留第一行的值
+        rows[col] = values.to_numpy()
 
-    for case_id, group in df.groupby(case_col):
-        group = group.copy()
-        sub = group[group[activity_col] == target_activity]
-        others = group[group[activity_col] != target_activity]
-
-        if len(sub) <= 1:
-            records.append(group)
-        else:
-            row = sub.iloc[0].copy()
-            row[time_col] = sub[time_col].min()
-            for col, method in agg_config.items():
-                if col in sub.columns:
-                    row[col] = aggregate_column(sub[col], method)
-            records.append(pd.concat([others, pd.DataFrame([row])]))
-
-    result_df = pd.concat(records).sort_values([case_col, time_col])
-    return result_df
+    return insert_sorted(df[~merge_mask], rows, case_col, time_col)
 
 from pm4py.objects.conversion.log import converter as log_converter
 import pandas as pd
@@ -145,6 +593,8 @@ def filter_traces_by_end_event(event_log, required_end_event):
     return filtered_log
 
 def apply_merge_operations(event_log, ops_list):
+    import numpy as np
+
     df = log_converter.apply(event_log, variant=log_converter.Variants.TO_DATA_FRAME)
 
     for op in ops_list:
@@ -153,76 +603,130 @@ def apply_merge_operations(event_log, ops_list):
         strategy = op["strategy"]
         fields = op["fields"]
 
-        df = df[df["concept:name"].notna()]
-        df["is_merge_target"] = df["concept:name"].isin(acts)
+        df = df[df["concept:name"].notna() & df["case:concept:name"].notna()]
+        target_mask = df["concept:name"].isin(acts).to_numpy()
 
-        grouped = df[df["is_merge_target"]].groupby("case:concept:name")
+        # 每个 case 的目标活动行合并为一行（保留第一行）
+        sub = df[target_mask]
+        groups = pd.factorize(sub["case:concept:name"], sort=False)[0]
+        group_ids, first = np.unique(groups, return_index=True)
+        grouped = sub["time:timestamp"].groupby(groups)
+        merged = sub.iloc[first].copy()
+        times = grouped.max() if strategy == "last" else grouped.min()
+        merged["time:timestamp"] = times.to_numpy()
+        merged["concept:name"] = new_name
+        for field in fields:
+            merged[field] = unique_join(groups, sub[field]).reindex(group_ids).fillna("").to_numpy()
 
-        merged_rows = []
-        for case, group in grouped:
-            row = group.iloc[0].copy()
-            if strategy == "first":
-                row["time:timestamp"] = group["time:timestamp"].min()
-            elif strategy == "last":
-                row["time:timestamp"] = group["time:timestamp"].max()
-            else:
-                row["time:timestamp"] = group["time:timestamp"].min()
-
-            row["concept:name"] = new_name
-            for field in fields:
-                vals = group[field].dropna().astype(str).unique()
-                row[field] = "|".join(vals)
-            merged_rows.append(row)
-
-        df = df[~df["is_merge_target"]]
-        df = pd.concat([df] + merged_rows, ignore_index=True)
-        df = df.drop(columns=["is_merge_target"])
-        df = df.sort_values(by=["case:concept:name", "time:timestamp"])
+        df = insert_sorted(df[~target_mask], merged, ignore_index=True)
 
     return log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
 
 
+def _compile_merge_rules(rule_list, act_names):
+    """
+    规则表 → 活动 × 规则 的布尔查找表：member[活动编码, 规则号] 表示该活动属于该规则。
+    同一活动出现在多条规则中时，各规则分别合并（与逐条规则处理一致）。
+    """
+    import numpy as np
+
+    member = np.zeros((len(act_names) + 1, len(rule_list)), dtype=bool)  # 末行对应缺失活动（编码 -1）
+    for rule_id, rule in enumerate(rule_list):
+        codes = act_names.get_indexer(pd.Index(list(rule["source_activities"])))
+        member[codes[codes >= 0], rule_id] = True
+    return member
+
+
+def _grouped_time_mean(times, sizes):
+    """
+    按连续分组求时间均值，逐组与 Series.mean() 结果一致（int64 纳秒以 float64 求和后除以个数）。
+    times: 已按组连续排列的时间 Series；sizes: 每组行数
+    """
+    import numpy as np
+
+    if times.isna().any():
+        return times.groupby(np.repeat(np.arange(len(sizes)), sizes)).mean().reset_index(drop=True)
+    ns = times.array.asi8.astype(np.float64)
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    sums = np.add.reduceat(ns, starts) if len(ns) else np.zeros(0)
+    # 8 行以上 np.sum 为成对求和，顺序与 reduceat 不同，逐组单独计算
+    for g in np.flatnonzero(sizes >= 8):
+        sums[g] = ns[starts[g]:starts[g] + sizes[g]].sum()
+    means = pd.Series((sums / sizes).astype(np.int64).view("datetime64[ns]"))
+    tz = getattr(times.dtype, "tz", None)
+    return means.dt.tz_localize("UTC").dt.tz_convert(tz) if tz is not None else means
+
+
 def apply_activity_merge_rules(event_log, rule_list):
     """
     根据多个 merge 规则合并事件
+
+    所有规则先编译成一张活动查找表，再在 (case, 规则号) 上做一次分组聚合：
+    每组保留第一行，活动名改为规则目标，时间按 strategy（first / last / average）取组内
+    最早 / 最晚 / 平均时间，agg_columns 中的字段取组内去重值用 "|" 拼接；最后一次性拼回日志。
     """
+    import numpy as np
+
     df = log_converter.apply(event_log, variant=log_converter.Variants.TO_DATA_FRAME)
     df["lifecycle:transition"] = "complete"
     if not pd.api.types.is_datetime64_any_dtype(df["time:timestamp"]):
         df["time:timestamp"] = pd.to_datetime(df["time:timestamp"])
-
-    all_new_rows = []
-    for case, group in df.groupby("case:concept:name"):
-        new_rows = []
-        skip_idx = set()
-        for rule in rule_list:
-            src_acts = rule["source_activities"]
-            target = rule["target_activity"]
-            strategy = rule["strategy"]
-            agg_cols = rule.get("agg_columns", [])
-
-            mask = group["concept:name"].isin(src_acts)
-            group_sub = group[mask]
-            if not group_sub.empty:
-                row = group_sub.iloc[0].copy()
-                row["concept:name"] = target
-                if strategy == "first":
-                    row["time:timestamp"] = group_sub["time:timestamp"].min()
-                elif strategy == "last":
-                    row["time:timestamp"] = group_sub["time:timestamp"].max()
-                elif strategy == "average":
-                    row["time:timestamp"] = group_sub["time:timestamp"].mean()
-
-                for col in agg_cols:
-                    row[col] = "|".join(group_sub[col].dropna().astype(str).unique())
-                new_rows.append(row)
-                skip_idx.update(group_sub.index.tolist())
-
-        group_remain = group.drop(index=skip_idx)
-        all_new_rows.extend(group_remain.to_dict("records") + [r.to_dict() for r in new_rows])
-
-    new_df = pd.DataFrame(all_new_rows)
-    new_df = new_df.sort_values(by=["case:concept:name", "time:timestamp"])
+    df = df[df["case:concept:name"].notna()].reset_index(drop=True)
+
+    case_codes = pd.factorize(df["case:concept:name"], sort=False)[0]
+    act_codes, act_names = pd.factorize(df["concept:name"], sort=False)
+    member = _compile_merge_rules(rule_list, act_names)
+
+    # (行, 规则) 对：行号升序，同一行按规则号升序
+    rows, rule_ids = np.nonzero(member[act_codes])
+    if not len(rows):
+        new_df = sort_case_time(df)
+        return log_converter.apply(new_df, variant=log_converter.Variants.TO_EVENT_LOG)
+
+    n_rules = len(rule_list)
+    keys = case_codes[rows].astype(np.int64) * n_rules + rule_ids
+    pair_times = df["time:timestamp"].take(rows).reset_index(drop=True)
+    grouped = pd.DataFrame({"row": rows, "time": pair_times}).groupby(keys, sort=True)
+
+    group_sizes = grouped.size()
+    group_keys = group_sizes.index.to_numpy()
+    group_rules = group_keys % n_rules
+    new_rows = df.iloc[grouped["row"].min().to_numpy()].reset_index(drop=True)
+
+    targets = np.array([rule["target_activity"] for rule in rule_list], dtype=object)
+    new_rows["concept:name"] = targets[group_rules]
+
+    strategies = np.array([rule["strategy"] for rule in rule_list], dtype=object)[group_rules]
+    times = new_rows["time:timestamp"]
+    for strategy in ("first", "last", "average"):
+        sel = strategies == strategy
+        if not sel.any():
+            continue
+        if strategy == "average":
+            # (行, 规则) 对已按 (case, 规则) 排列时组内连续
+            order = np.argsort(keys, kind="stable")
+            agg = _grouped_time_mean(pair_times.take(order).reset_index(drop=True), group_sizes.to_numpy())
+        else:
+            agg = grouped["time"].agg("min" if strategy == "first" else "max").reset_index(drop=True)
+        times = times.mask(sel, agg)
+    new_rows["time:timestamp"] = times
+
+    # agg_columns：每个字段只对声明了它的规则做一次“去重拼接”
+    agg_rules = {}
+    for rule_id, rule in enumerate(rule_list):
+        for col in rule.get("agg_columns", []):
+            agg_rules.setdefault(col, []).append(rule_id)
+    for col, col_rules in agg_rules.items():
+        pair_sel = np.isin(rule_ids, col_rules)
+        joined = unique_join(keys[pair_sel], df[col].take(rows[pair_sel]))
+        group_sel = np.isin(group_rules, col_rules)
+        out = new_rows[col].astype(object).to_numpy(copy=True)
+        out[group_sel] = joined.reindex(group_keys[group_sel]).fillna("").to_numpy()
+        new_rows[col] = out
+
+    covered = np.zeros(len(df), dtype=bool)
+    covered[rows] = True
+    new_df = insert_sorted(df[~covered], new_rows, ignore_index=True)
     new_df["lifecycle:transition"] = "complete"
     return log_converter.apply(new_df, variant=log_converter.Variants.TO_EVENT_LOG)
 
@@ -243,7 +747,7 @@ def merge_activities_in_event_log(event_log, activities_to_merge, new_activity="
     if not pd.api.types.is_datetime64_any_dtype(df["time:timestamp"]):
         df["time:timestamp"] = pd.to_datetime(df["time:timestamp"])
 
-    df = df.sort_values(by=["case:concept:name", "time:timestamp"])
+    df = sort_case_time(df)
 
     grouped = df[df["concept:name"].isin(activities_to_merge)].groupby("case:concept:name")
     replace_df = []
@@ -257,8 +761,7 @@ def merge_activities_in_event_log(event_log, activities_to_merge, new_activity="
         replace_df.append(row)
 
     df = df[~df["concept:name"].isin(activities_to_merge)]
-    df = pd.concat([df, pd.DataFrame(replace_df)], ignore_index=True)
-    df = df.sort_values(by=["case:concept:name", "time:timestamp"])
+    df = insert_sorted(df, pd.DataFrame(replace_df), ignore_index=True)
 
     return log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
 
@@ -277,46 +780,16 @@ def aggregate_activity_occurrences(df, target_activity, keep="first", timestamp_
     Returns:
         df: 处理后的 DataFrame
     """
-    import numpy as np
-
     df = df.copy()
     df[timestamp_col] = pd.to_datetime(df[timestamp_col])
-    df = df.sort_values(by=["case:concept:name", timestamp_col])
-
-    result = []
-
-    for case_id, group in df.groupby("case:concept:name"):
-        group = group.copy()
-        to_agg = group[group["concept:name"] == target_activity]
-        others = group[group["concept:name"] != target_activity]
-
-        if to_agg.empty:
-            result.append(group)
-            continue
-
-        if keep == "first":
-            row = to_agg.iloc[0].copy()
-        else:
-            row = to_agg.iloc[-1].copy()
-
-        if agg_fields:
-            for field in agg_fields:
-                values = to_agg[field].dropna().astype(str).unique()
-                joined = "|".join(values)
-                if new_col:
-                    row[new_col] = joined  # ✅ 聚合写入新列
-                else:
-                    row[field] = joined  # ✅ 覆盖原列
-
-        merged = pd.concat([others, pd.DataFrame([row])], ignore_index=True)
-        merged = merged.sort_values(by=timestamp_col)
-        result.append(merged)
-
-    new_df = pd.concat(result, ignore_index=True)
-    return new_df
+    new_df = dedup_occurrences(df, keep=keep, activities=[target_activity], agg_fields=agg_fields,
+                               new_col=new_col, time_col=timestamp_col)
+    return new_df.reset_index(drop=True)
 
 def filter_incomplete_traces(df, start_event=None, end_event=None, mode="不同时满足起止"):
-    df = df.sort_values("time:timestamp")
+    # 已按 (case, time) 排序时，每个 case 的首 / 末行即最早 / 最晚事件，无需再按时间排序
+    if not is_sorted_by_case_time(df):
+        df = df.sort_values("time:timestamp", kind="stable")
     keep_cases = set(df['case:concept:name'].unique())
 
     if "起始" in mode or "起止" in mode:
@@ -337,37 +810,44 @@ def filter_incomplete_traces(df, start_event=None, end_event=None, mode="不同
 
     return df[df["case:concept:name"].isin(keep_cases)].copy()
 
+def filter_traces_by_duration(df, min_sec=0, max_sec=0, case_col="case:concept:name", time_col="time:timestamp"):
+    """
+    保留持续时间（最晚 - 最早事件，秒）在 [min_sec, max_sec] 内的 trace。
+    max_sec 为 0 表示不设上限；含空时间的 case 持续时间按 0 秒处理（与筛选预估一致）。
+    """
+    import numpy as np
+
+    times = df[time_col]
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times, errors="coerce")
+    grouped = times.groupby(df[case_col], sort=False)
+    durations = (grouped.max() - grouped.min()).dt.total_seconds()
+    durations[grouped.count() < grouped.size()] = 0
+    max_sec = np.inf if not max_sec else max_sec
+    keep_cases = durations.index[(durations >= min_sec) & (durations <= max_sec)]
+    return df[df[case_col].isin(keep_cases)].copy()
+
 def remove_consecutive_self_loops(df, case_col="case:concept:name", act_col="concept:name", time_col="time:timestamp", keep="first"):
     """
     移除每条 trace 中相邻重复的活动，仅保留首次或最后一次出现。
     非相邻的相同活动不受影响。
     """
-    import pandas as pd
-    result = []
-    df = df.sort_values(by=[case_col, time_col]).copy()
-
-    for case_id, group in df.groupby(case_col):
-        group = group.copy()
-        keep_rows = []
-
-        acts = group[act_col].tolist()
-        indices = group.index.tolist()
-
-        i = 0
-        while i < len(acts):
-            j = i
-            while j + 1 < len(acts) and acts[j + 1] == acts[i]:
-                j += 1
-            if keep == "first":
-                keep_rows.append(indices[i])
-            elif keep == "last":
-                keep_rows.append(indices[j])
-            i = j + 1
-
-        result.append(group.loc[keep_rows])
+    import numpy as np
 
-    final_df = pd.concat(result).sort_values(by=[case_col, time_col])
-    return final_df
+    df = sort_case_time(df[df[case_col].notna()], case_col, time_col)
+    cases = df[case_col].to_numpy()
+    acts = df[act_col].to_numpy()
+    # 与前 / 后一行同 case 且同活动即为自循环片段的一部分（NaN 活动互不相等）
+    same = (cases[1:] == cases[:-1]) & (acts[1:] == acts[:-1])
+    if keep == "first":
+        keep_mask = np.r_[True, ~same]
+    elif keep == "last":
+        keep_mask = np.r_[~same, True]
+    else:
+        keep_mask = np.zeros(len(df), dtype=bool)
+    out = df[keep_mask]
+    _mark_sorted(out, case_col, time_col)
+    return out
 
 def filter_traces_containing_start_end(df, start_event=None, end_event=None):
     """
@@ -376,20 +856,26 @@ def filter_traces_containing_start_end(df, start_event=None, end_event=None):
     - 若只填 end_event，则保留包含该事件的流程
     - 若两者都填，start 必须在 end 之前
     """
-    df = df.sort_values(["case:concept:name", "time:timestamp"])
-    keep_cases = []
-
-    for case_id, group in df.groupby("case:concept:name"):
-        events = group["concept:name"].tolist()
-        if start_event and end_event:
-            if start_event in events and end_event in events:
-                if events.index(start_event) < events.index(end_event):
-                    keep_cases.append(case_id)
-        elif start_event:
-            if start_event in events:
-                keep_cases.append(case_id)
-        elif end_event:
-            if end_event in events:
-                keep_cases.append(case_id)
+    df = sort_case_time(df)
+    cases = df["case:concept:name"].to_numpy()
+    acts = df["concept:name"].to_numpy()
+    pos = df.groupby("case:concept:name", sort=False).cumcount().to_numpy()
+
+    def first_pos(event):
+        """每个 case 中该事件第一次出现的位置"""
+        hit = acts == event
+        return pd.Series(pos[hit]).groupby(cases[hit]).min()
+
+    first_start = first_pos(start_event) if start_event else None
+    first_end = first_pos(end_event) if end_event else None
+    if start_event and end_event:
+        both = pd.concat([first_start, first_end], axis=1, keys=["s", "e"]).dropna()
+        keep_cases = both.index[both["s"] < both["e"]]
+    elif start_event:
+        keep_cases = first_start.index
+    elif end_event:
+        keep_cases = first_end.index
+    else:
+        keep_cases = []
 
     return df[df["case:concept:name"].isin(keep_cases)].copy()
@@ -1,55 +1,163 @@
 # csv2xes_improved.py  —— 修正版
-import sys, os, re, pandas as pd, chardet
-from typing import Dict, Callable
+# 启动时只加载 PyQt5 与主窗口；pandas / chardet / PM4Py 等重量级依赖在首次使用时导入，
+# 并在窗口显示后由 lazy_imports.warm_up_in_background 在后台线程预热
+from __future__ import annotations
+
+import sys, os, re
+from typing import TYPE_CHECKING, Dict, Callable
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QFileDialog, QWidget, QLabel, QPushButton, QComboBox,
     QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QMessageBox,
-    QGroupBox, QGridLayout, QListWidget, QListWidgetItem, QSizePolicy, QProgressDialog, QDialog
+    QGroupBox, QGridLayout, QListWidget, QListWidgetItem, QSizePolicy, QProgressDialog, QDialog, QDialogButtonBox
 )
 from PyQt5.QtCore import Qt, QTimer
-from pm4py.objects.log.exporter.xes import exporter as xes_exporter
-from pm4py.objects.log.util import dataframe_utils
-from pm4py.objects.conversion.log import converter as log_converter
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # ---------- 常量 ----------
 PREVIEW_ROWS = 200
+UNKNOWN = "unknown"  # 空值在 XES 中的写法
+SCAN_ROWS = 1000   # 打开文件时只扫描表头 + 前若干行，用于映射下拉框与预览
 
 # ---------- 辅助 ----------
-def clean_headers_unique(df: pd.DataFrame) -> pd.DataFrame:
+def clean_header_names(cols) -> list:
     """去除列名空格/特殊字符并转小写，确保唯一"""
     new_cols, seen = [], {}
-    for col in df.columns:
-        c = re.sub(r'[^0-9a-zA-Z_]+', '', col.strip().lower()) or "col"
+    for col in cols:
+        c = re.sub(r'[^0-9a-zA-Z_]+', '', str(col).strip().lower()) or "col"
         seen[c] = seen.get(c, 0) + 1
         new_cols.append(c if seen[c] == 1 else f"{c}_{seen[c]-1}")
-    df.columns = new_cols
+    return new_cols
+
+def clean_headers_unique(df: pd.DataFrame) -> pd.DataFrame:
+    """去除列名空格/特殊字符并转小写，确保唯一"""
+    df.columns = clean_header_names(df.columns)
+    return df
+
+def detect_encoding(path: str) -> str:
+    import chardet
+    with open(path, 'rb') as fh:
+        return chardet.detect(fh.read(200_000))['encoding'] or 'utf-8'
+
+def scan_csv(path: str):
+    """
+    第一阶段：只读表头与前 SCAN_ROWS 行。
+    Returns:
+        (原始表头列表, 清理后的列名列表, 样本 DataFrame（列名已清理）, 编码)
+    """
+    import csv
+    import pandas as pd
+
+    tried = []
+    for enc in ("utf-8", None):
+        enc = enc or detect_encoding(path)
+        tried.append(enc)
+        try:
+            with open(path, encoding=enc, newline="") as fh:
+                header = next(csv.reader(fh), [])
+            sample = pd.read_csv(path, nrows=SCAN_ROWS, encoding=enc, low_memory=False)
+            break
+        except (UnicodeDecodeError, LookupError):
+            continue
+    else:
+        raise ValueError(f"无法识别文件编码（已尝试 {'、'.join(dict.fromkeys(tried))}），"
+                         f"请将文件另存为 UTF-8 后重试")
+    sample.columns = clean_header_names(header)
+    return header, sample.columns.tolist(), sample, enc
+
+def read_csv_columns(path: str, header: list, positions: list, names: list, encoding: str = "utf-8") -> pd.DataFrame:
+    """
+    第二阶段：只读取指定位置的列（usecols），返回按 positions 顺序、列名为 names 的 DataFrame。
+    表头唯一且为 UTF-8 时用 pyarrow 按列名读取，否则按列位置用 C 引擎读取。
+    """
+    import pandas as pd
+
+    positions = list(positions)
+    raw = [header[i] for i in positions]
+    if encoding.lower().replace("-", "") == "utf8" and len(set(header)) == len(header) and all(header):
+        try:
+            df = pd.read_csv(path, engine="pyarrow", usecols=raw)
+            df = df[raw]
+        except (ValueError, UnicodeDecodeError, KeyError):
+            df = None
+    else:
+        df = None
+    if df is None:
+        df = pd.read_csv(path, usecols=positions, encoding=encoding, low_memory=False)
+        df = df.iloc[:, [sorted(positions).index(i) for i in positions]]  # usecols 按文件列序返回
+    df.columns = names
     return df
 
-TYPE_RULES: Dict[str, Callable[[pd.Series], pd.Series]] = {
-    r'^-?\d+$'           : pd.to_numeric,
-    r'^-?\d+\.\d+$'      : pd.to_numeric,
-    r'^(true|false)$'    : lambda s: s.map({'true': True, 'false': False}),
-    r'^(yes|no)$'        : lambda s: s.map({'yes': True, 'no': False}),
-    r'^\d+(\.\d+)?%$'    : lambda s: pd.to_numeric(s.str.rstrip('%')) / 100,
-    r'^\d{4}-\d{2}-\d{2}': pd.to_datetime
-}
+def type_rules() -> Dict[str, Callable[[pd.Series], pd.Series]]:
+    """类型推断规则（正则 → 转换函数）；pandas 延迟到首次调用时导入"""
+    import pandas as pd
+    return {
+        r'^-?\d+$'           : pd.to_numeric,
+        r'^-?\d+\.\d+$'      : pd.to_numeric,
+        r'^(true|false)$'    : lambda s: s.map({'true': True, 'false': False}),
+        r'^(yes|no)$'        : lambda s: s.map({'yes': True, 'no': False}),
+        r'^\d+(\.\d+)?%$'    : lambda s: pd.to_numeric(s.str.rstrip('%')) / 100,
+        r'^\d{4}-\d{2}-\d{2}': pd.to_datetime
+    }
+
+def smart_cast_series(s: pd.Series, rules=None) -> pd.Series:
+    """单列智能类型转换；数值 / 时间列原样返回"""
+    if s.dtype.kind in "biufcM":
+        return s
+    rules = rules or type_rules()
+    sample = s.dropna().astype(str).head(50)
+    for pat, func in rules.items():
+        if sample.str.match(pat).all():
+            try:
+                s = func(s)
+            except Exception:
+                pass
+            break
+    if s.nunique(dropna=True) <= 20:
+        s = s.astype("category")
+    return s
+
 def smart_cast_columns(df: pd.DataFrame) -> pd.DataFrame:
     """智能类型转换"""
+    rules = type_rules()
     for col in df.columns:
-        if df[col].dtype.kind in "biufcM":
+        df[col] = smart_cast_series(df[col], rules)
+    return df
+
+def prepare_nulls(df: pd.DataFrame, key_cols=()) -> pd.DataFrame:
+    """
+    空值处理（保持列类型）：
+    - key_cols（case / activity 列）的空值填为 UNKNOWN
+    - 其他列保留原类型（含空值的数值列仍为 float，XES 中写为 <float>），
+      空值保持为 NaN / NaT / <NA>；UNKNOWN 只在写 XES 时补入
+    """
+    import pandas as pd
+
+    for col in key_cols:
+        s = df[col]
+        if not s.isna().any():
             continue
-        sample = df[col].dropna().astype(str).head(50)
-        for pat, func in TYPE_RULES.items():
-            if sample.str.match(pat).all():
-                try:
-                    df[col] = func(df[col])
-                except Exception:
-                    pass
-                break
-        if df[col].nunique(dropna=True) <= 20:
-            df[col] = df[col].astype("category")
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            if UNKNOWN not in s.cat.categories:
+                s = s.cat.add_categories([UNKNOWN])
+            df[col] = s.fillna(UNKNOWN)
+        else:
+            df[col] = s.astype(object).fillna(UNKNOWN)
     return df
 
+def fill_unknown_attributes(log, attrs):
+    """写 XES 前把事件上缺失 / 为空的属性写成 UNKNOWN（只作用于即将序列化的事件）"""
+    import pandas as pd
+
+    for trace in log:
+        for event in trace:
+            for a in attrs:
+                v = event.get(a)
+                if v is None or (not isinstance(v, str) and pd.isna(v)):
+                    event[a] = UNKNOWN
+    return log
+
 def show_preview(tbl: QTableWidget, df: pd.DataFrame):
     """在预览表格中显示前 PREVIEW_ROWS 行"""
     tbl.clear()
@@ -82,6 +190,29 @@ class ProcessingDialog(QDialog):
         self.setLayout(layout)
 
 
+class CaseColumnsDialog(QDialog):
+    """选择与 CaseID 主列组合成 case 标识的附加列（可多选）"""
+
+    def __init__(self, cols, selected, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("组合 CaseID")
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("与 CaseID 列一起组成 case 标识的列："))
+        self.lst = QListWidget(selectionMode=QListWidget.MultiSelection)
+        for c in cols:
+            item = QListWidgetItem(c)
+            self.lst.addItem(item)
+            item.setSelected(c in selected)
+        layout.addWidget(self.lst)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def selected_columns(self):
+        return [self.lst.item(i).text() for i in range(self.lst.count()) if self.lst.item(i).isSelected()]
+
+
 # ---------- 主窗口 ----------
 class CSV2XESConverter(QMainWindow):
     def __init__(self):
@@ -89,9 +220,16 @@ class CSV2XESConverter(QMainWindow):
         self.setWindowTitle("CSV → XES 预处理工具")
         self.resize(1050, 680)
 
-        self.df_orig = None      # 原始数据
+        self.df_orig = None      # 已从源文件读取的列（按需补读）
         self.df_work = None      # 工作副本
-        self.all_cols = []       # 原始列全集
+        self.df_sample = None    # 表头扫描时读取的样本行（全部列，仅用于预览）
+        self.all_cols = []       # 原始列全集（已清理列名）
+        self.src_path = None     # 源 CSV（XES 为转换后的临时 CSV，按原文件指纹复用）
+        self.src_header = []     # 源文件原始表头
+        self.src_encoding = "utf-8"
+        self.src_fingerprint = None  # 解析缓存的源文件指纹（见 parse_cache）
+        self._loading = False    # 打开文件过程中，映射变化不触发补读
+        self.case_extra_cols = []  # 与 CaseID 列组合成 case 标识的附加列
         self.undo_stack = []
         # 保存当前在复选栏中选中的额外列
         self.selected_extra_cols = []
@@ -109,8 +247,12 @@ class CSV2XESConverter(QMainWindow):
         self.lab_file = QLabel("未加载文件")
         btn_open = QPushButton("浏览…")
         btn_open.clicked.connect(self.open_file)
+        btn_clear_cache = QPushButton("清除缓存")
+        btn_clear_cache.setToolTip("删除本地保存的 CSV 解析结果")
+        btn_clear_cache.clicked.connect(self.clear_cache)
         bar.addWidget(self.lab_file)
         bar.addStretch()
+        bar.addWidget(btn_clear_cache)
         bar.addWidget(btn_open)
         out.addLayout(bar)
 
@@ -157,8 +299,13 @@ class CSV2XESConverter(QMainWindow):
 
         # ---- 控件初始化 ----
         self.cbo_case = QComboBox()
+        self.btn_case_combo = QPushButton("组合…")
+        self.btn_case_combo.setToolTip("选择与 CaseID 一起组成 case 标识的列（如 UserID + SessionID）")
+        self.btn_case_combo.clicked.connect(self.choose_case_columns)
         self.cbo_act = QComboBox()
         self.cbo_time = QComboBox()
+        for cbo in (self.cbo_case, self.cbo_act, self.cbo_time):
+            cbo.currentTextChanged.connect(self.on_mapping_changed)
 
         self.cbo_fmt = QComboBox(editable=True)
         self.cbo_fmt.addItems([
@@ -174,7 +321,7 @@ class CSV2XESConverter(QMainWindow):
         self.btn_clean_time.clicked.connect(self.clean_time)
 
         # ---- 构建每行 ----
-        vbox_all.addLayout(make_right_aligned_row("CaseID", self.cbo_case))
+        vbox_all.addLayout(make_right_aligned_row("CaseID", self.cbo_case, self.btn_case_combo))
         vbox_all.addLayout(make_right_aligned_row("Activity", self.cbo_act))
         vbox_all.addLayout(make_right_aligned_row("Timestamp", self.cbo_time))
         vbox_all.addLayout(make_right_aligned_row("原时间格式", self.cbo_fmt, self.btn_clean_time))
@@ -209,53 +356,138 @@ class CSV2XESConverter(QMainWindow):
 
         if not path:
             return
-        import tempfile
 
         try:
             if path.lower().endswith(".xes"):
-                from pm4py.objects.log.importer.xes import importer as xes_importer
-                from pm4py.objects.log.util import dataframe_utils
-
-                # 读取 XES 文件
-                log = xes_importer.apply(path)
-                df = log_converter.apply(log, variant=log_converter.Variants.TO_DATA_FRAME)
-
-                # 创建临时 CSV 文件
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".csv")
-                df.to_csv(temp_file.name, index=False)
-                path = temp_file.name  # 更新路径为临时 CSV 文件
-
-            # 使用更新的路径加载 CSV
-            df = pd.read_csv(path, engine="pyarrow", low_memory=True)
-
-        except UnicodeDecodeError:
-            with open(path, 'rb') as fh:
-                enc = chardet.detect(fh.read(200_000))['encoding'] or 'utf-8'
-            df = pd.read_csv(path, encoding=enc, low_memory=False)
+                path, fingerprint = self._xes_to_csv(path)  # 之后按 CSV 处理
+            else:
+                fingerprint = self._fingerprint(path)
+            # 第一阶段：只扫描表头与样本行
+            header, cols, sample, enc = scan_csv(path)
         except Exception as e:
             QMessageBox.critical(self, "加载失败", str(e))
             return
 
-        # 自动清理列标题
-        df = clean_headers_unique(df)
-
-        self.df_orig = df
-        self.df_work = df.copy()
-        self.all_cols = df.columns.tolist()
+        self.src_path, self.src_header, self.src_encoding = path, header, enc
+        self.src_fingerprint = fingerprint
+        self.df_sample = sample
+        self.df_orig = sample.iloc[:0, :0]
+        self.df_work = None
+        self.undo_stack = []
+        self.all_cols = cols
         self.lab_file.setText(os.path.basename(path))
         self.selected_extra_cols = []  # 重置复选状态
-        self.refresh_ui()
+        self.case_extra_cols = []
+
+        # 第二阶段：只读取映射到的三列；其余列在勾选并应用时再读取
+        self._loading = True
+        try:
+            self.df_work = sample.iloc[:0, :0]
+            self.refresh_ui()
+            mains = [c for c in self.main_columns() if c]
+            self.load_columns(mains)
+        except Exception as e:
+            QMessageBox.critical(self, "加载失败", str(e))
+            return
+        finally:
+            self._loading = False
+        self.df_work = self.df_orig[list(dict.fromkeys(mains))].copy()
+        show_preview(self.tbl, self.df_sample)
+
+    @staticmethod
+    def _fingerprint(path):
+        from parse_cache import file_fingerprint
+        try:
+            return file_fingerprint(path)
+        except OSError:
+            return None
+
+    def _xes_to_csv(self, path):
+        """
+        XES 转为 CSV 供按列读取：缓存指纹取自原 XES 文件（而非临时 CSV），
+        临时 CSV 按指纹命名、重复打开时直接复用；同一 XES 的旧版本转换结果随之删除。
+        Returns: (CSV 路径, 缓存指纹)
+        """
+        import glob
+        import hashlib
+        import tempfile
+        import pm4py
+
+        fingerprint = self._fingerprint(path)
+        if fingerprint is not None:
+            fingerprint = f"{fingerprint}|xes|pm4py {pm4py.__version__}"
+        digest = lambda text: hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+        prefix = os.path.join(tempfile.gettempdir(), f"cpa_pm_xes_{digest(os.path.abspath(path))}_")
+        csv_path = prefix + digest(fingerprint or str(os.getpid())) + ".csv"
+        if fingerprint is not None and os.path.exists(csv_path):
+            return csv_path, fingerprint
+
+        from pm4py.objects.log.importer.xes import importer as xes_importer
+        from pm4py.objects.conversion.log import converter as log_converter
+
+        log = xes_importer.apply(path)
+        df = log_converter.apply(log, variant=log_converter.Variants.TO_DATA_FRAME)
+        for old in glob.glob(prefix + "*.csv"):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        tmp = f"{csv_path}.{os.getpid()}.tmp"
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, csv_path)  # 写完整后再出现，避免中途失败留下残缺文件被复用
+        return csv_path, fingerprint
+
+    def _cache_settings(self, col, stage, **extra):
+        """列 col 在某一处理阶段的缓存键设置（与源文件指纹一起确定缓存条目）"""
+        return dict(stage=stage, column=col, position=self.all_cols.index(col),
+                    encoding=self.src_encoding, **extra)
+
+    def _is_source_column(self, col):
+        """工作副本中的 col 仍是未经处理、行与源文件一致的原始列（此时才读写时间 / 类型缓存）"""
+        return (self.src_fingerprint is not None and col in self.df_orig.columns
+                and self.df_work[col].dtype == self.df_orig[col].dtype
+                and self.df_work.index.equals(self.df_orig.index))
+
+    def load_columns(self, cols):
+        """确保 df_orig 含有 cols：缺少的列先查解析缓存，其余一次性从源文件读取并写入缓存"""
+        import pandas as pd
+        from parse_cache import get_cache
+
+        missing = [c for c in dict.fromkeys(cols) if c in self.all_cols and c not in self.df_orig.columns]
+        if not missing:
+            return
+        cache = get_cache()
+        parts = {}
+        for c in missing:
+            s = cache.get(self.src_fingerprint, **self._cache_settings(c, "raw"))
+            if s is not None:
+                parts[c] = s
+        rest = [c for c in missing if c not in parts]
+        if rest:
+            positions = [self.all_cols.index(c) for c in rest]
+            read = read_csv_columns(self.src_path, self.src_header, positions, rest, self.src_encoding)
+            for c in rest:
+                parts[c] = read[c]
+                cache.put(self.src_fingerprint, read[c], **self._cache_settings(c, "raw"))
+        part = pd.DataFrame({c: parts[c] for c in missing})
+        self.df_orig = part if self.df_orig.shape[1] == 0 else pd.concat([self.df_orig, part], axis=1)
+
+    def on_mapping_changed(self, col):
+        """映射改到尚未读取的列时，补读该列并加入工作副本（保持工作副本现有的行）"""
+        if self._loading or self.df_work is None or not col or col in self.df_work.columns:
+            return
+        try:
+            self.load_columns([col])
+        except Exception as e:
+            QMessageBox.critical(self, "读取列失败", str(e))
+            return
+        self.df_work[col] = self.df_orig[col].reindex(self.df_work.index)
 
     # ---- UI 刷新 ----
     def refresh_ui(self):
         if self.df_work is None:
             return
         cols = self.all_cols
-        mains = {
-            self.cbo_case.currentText(),
-            self.cbo_act.currentText(),
-            self.cbo_time.currentText()
-        }
 
         # 刷新下拉映射
         for cbo in (self.cbo_case, self.cbo_act, self.cbo_time):
@@ -264,11 +496,17 @@ class CSV2XESConverter(QMainWindow):
             cbo.addItems(cols)
             cbo.blockSignals(False)
         self.auto_map(cols)
+        self._refresh_retained_list()
+
+        # 预览
+        show_preview(self.tbl, self.df_work)
 
-        # 刷新保留列列表，仅剩余列可选
+    def _refresh_retained_list(self):
+        """刷新保留列列表，仅剩余列可选"""
+        cols = self.all_cols
         self.lst.blockSignals(True)
         self.lst.clear()
-        mains = {self.cbo_case.currentText(), self.cbo_act.currentText(), self.cbo_time.currentText()}
+        mains = set(self.main_columns())
         for c in cols:
             if c in mains:
                 continue
@@ -276,21 +514,86 @@ class CSV2XESConverter(QMainWindow):
             item.setSelected(c in self.selected_extra_cols)
             self.lst.addItem(item)
         self.lst.blockSignals(False)
-
-        # 预览
-        show_preview(self.tbl, self.df_work)
+        self._update_case_combo_button()
 
     def auto_map(self, cols):
-        def pick(keys, target):
+        def find(keys):
             for k in keys:
                 for c in cols:
                     if k in c.lower():
-                        target.setCurrentText(c)
-                        return
-        pick(("case","case_id","company"), self.cbo_case)
+                        return c
+            return None
+
+        def pick(keys, target):
+            c = find(keys)
+            if c is not None:
+                target.setCurrentText(c)
+            return c
+
+        if pick(("case","case_id","company"), self.cbo_case) is None:
+            # 没有单独的 case 列、但有 用户 + 会话 两列时（点击流日志），默认组合二者
+            user, session = find(("user",)), find(("session",))
+            if user and session and user != session and not self.case_extra_cols:
+                self.cbo_case.setCurrentText(user)
+                self.case_extra_cols = [session]
         pick(("event","activity"), self.cbo_act)
         pick(("time","date","timestamp"), self.cbo_time)
 
+    def case_columns(self):
+        """组成 case 标识的全部列：CaseID 主列在前，其后为组合列"""
+        case = self.cbo_case.currentText()
+        return [case] + [c for c in self.case_extra_cols if c != case] if case else []
+
+    def main_columns(self):
+        """case 标识列 + Activity + Timestamp（不出现在保留列复选栏中）"""
+        return list(dict.fromkeys(self.case_columns() + [self.cbo_act.currentText(), self.cbo_time.currentText()]))
+
+    def _update_case_combo_button(self):
+        extras = [c for c in self.case_extra_cols if c != self.cbo_case.currentText()]
+        self.btn_case_combo.setText(f"组合（+{len(extras)}）" if extras else "组合…")
+        self.btn_case_combo.setToolTip(" + ".join(self.case_columns()) if extras else
+                                       "选择与 CaseID 一起组成 case 标识的列（如 UserID + SessionID）")
+
+    def choose_case_columns(self):
+        if self.df_work is None:
+            return
+        case = self.cbo_case.currentText()
+        candidates = [c for c in self.all_cols if c not in (case, self.cbo_act.currentText(), self.cbo_time.currentText())]
+        dlg = CaseColumnsDialog(candidates, self.case_extra_cols, self)
+        if not dlg.exec_():
+            return
+        extras = dlg.selected_columns()
+        try:
+            self.load_columns(extras)
+        except Exception as e:
+            QMessageBox.critical(self, "读取列失败", str(e))
+            return
+        self.case_extra_cols = extras
+        for c in extras:
+            if c not in self.df_work.columns:
+                self.df_work[c] = self.df_orig[c].reindex(self.df_work.index)
+        self.selected_extra_cols = [c for c in self.selected_extra_cols if c not in extras]
+        self._refresh_retained_list()
+        show_preview(self.tbl, self.df_work)
+
+    def _to_pm4py_frame(self):
+        """
+        工作副本 → PM4Py 标准列名的 DataFrame。
+        多列 case 标识打包为 int64 键写入 case:concept:name（分组 / 筛选都在整数上进行），
+        返回 (df, labels)：labels[key] 为可读的组合标签，单列 case 时为 None
+        """
+        from cpa_utils import pack_case_key
+
+        case_cols = self.case_columns()
+        act, ts = self.cbo_act.currentText(), self.cbo_time.currentText()
+        if len(case_cols) == 1:
+            return self.df_work.rename(columns={case_cols[0]: "case:concept:name", act: "concept:name",
+                                                ts: "time:timestamp"}), None
+        keys, labels = pack_case_key(self.df_work, case_cols)
+        df = self.df_work.drop(columns=case_cols).rename(columns={act: "concept:name", ts: "time:timestamp"})
+        df.insert(0, "case:concept:name", keys)
+        return df, labels
+
     # ---- 撤销 ----
     def push_undo(self):
         if self.df_work is not None:
@@ -307,23 +610,28 @@ class CSV2XESConverter(QMainWindow):
     def apply_cols(self):
         if self.df_work is None:
             return
-        mains = [
-            self.cbo_case.currentText(),
-            self.cbo_act.currentText(),
-            self.cbo_time.currentText()
-        ]
+        mains = self.main_columns()
         # 记录当前复选栏选中的额外列
+        import pandas as pd
+
         self.selected_extra_cols = [item.text() for item in self.lst.selectedItems()]
         keep = mains + self.selected_extra_cols
 
+        keep = [col for col in dict.fromkeys(keep) if col]
+        try:
+            self.load_columns(keep)  # 新勾选的列此时才从源文件读取
+        except Exception as e:
+            QMessageBox.critical(self, "读取列失败", str(e))
+            return
+
         self.push_undo()
-        # 保留清洗结果 + 加入新列
+        # 保留清洗结果 + 加入新列（按工作副本现有的行对齐）
         cleaned_cols = [col for col in keep if col in self.df_work.columns]
         new_cols = [col for col in keep if col not in self.df_work.columns]
         self.df_work = pd.concat([
             self.df_work[cleaned_cols],
-            self.df_orig[new_cols]
-        ], axis=1)
+            self.df_orig[new_cols].reindex(self.df_work.index)
+        ], axis=1)[keep]
 
         # 只更新预览表格，保留复选框选中状态
         show_preview(self.tbl, self.df_work)
@@ -338,15 +646,27 @@ class CSV2XESConverter(QMainWindow):
             QMessageBox.warning(self, "缺少映射", "请先指定 Timestamp 列")
             return
 
+        import pandas as pd
+        from pm4py.objects.log.util import dataframe_utils
+        from parse_cache import get_cache
+
         fmt = self.cbo_fmt.currentText().strip()
         self.push_undo()
 
         try:
-            if fmt in ("", "自动检测"):
-                self.df_work = dataframe_utils.convert_timestamp_columns_in_df(self.df_work, [ts])
-                self.df_work[ts] = pd.to_datetime(self.df_work[ts], errors="coerce")
+            cache = get_cache()
+            settings = self._cache_settings(ts, "time", fmt=fmt) if self._is_source_column(ts) else None
+            parsed = cache.get(self.src_fingerprint, **settings) if settings else None
+            if parsed is not None:
+                self.df_work[ts] = parsed.reindex(self.df_work.index)
             else:
-                self.df_work[ts] = pd.to_datetime(self.df_work[ts], format=fmt, errors="coerce")
+                if fmt in ("", "自动检测"):
+                    self.df_work = dataframe_utils.convert_timestamp_columns_in_df(self.df_work, [ts])
+                    self.df_work[ts] = pd.to_datetime(self.df_work[ts], errors="coerce")
+                else:
+                    self.df_work[ts] = pd.to_datetime(self.df_work[ts], format=fmt, errors="coerce")
+                if settings:
+                    cache.put(self.src_fingerprint, self.df_work[ts], **settings)
 
             # 记录非法时间行数
             n_invalid = self.df_work[ts].isna().sum()
@@ -378,11 +698,35 @@ class CSV2XESConverter(QMainWindow):
     def cast_types(self):
         if self.df_work is None:
             return
+        from parse_cache import get_cache
+
         self.push_undo()
-        self.df_work = smart_cast_columns(self.df_work)
+        cache, rules = get_cache(), type_rules()
+        for col in self.df_work.columns:
+            settings = self._cache_settings(col, "cast") if self._is_source_column(col) else None
+            cached = cache.get(self.src_fingerprint, **settings) if settings else None
+            if cached is not None:
+                if len(cached):  # 空 Series 表示该列无需转换
+                    self.df_work[col] = cached.reindex(self.df_work.index)
+                continue
+            orig = self.df_work[col]
+            s = smart_cast_series(orig, rules)
+            if settings:
+                cache.put(self.src_fingerprint, s if s is not orig else s.iloc[:0], **settings)
+            self.df_work[col] = s
         show_preview(self.tbl, self.df_work)
         QMessageBox.information(self, "完成", "已尝试类型转换")
 
+    def clear_cache(self):
+        from parse_cache import get_cache
+
+        cache = get_cache()
+        if QMessageBox.question(self, "清除缓存",
+                                f"删除 {cache.root} 中的全部解析缓存（{cache.size() / (1 << 20):.1f} MB）？") != QMessageBox.Yes:
+            return
+        freed = cache.clear()
+        QMessageBox.information(self, "完成", f"已释放 {freed / (1 << 20):.1f} MB")
+
     # ---- 导出 / 分析 ----
     def export_xes(self):
         if self.df_work is None or self.df_work.empty:
@@ -401,16 +745,21 @@ class CSV2XESConverter(QMainWindow):
             return
         if not save.lower().endswith(".xes"):
             save += ".xes"
-        df = self.df_work.rename(columns={
-            case: "case:concept:name",
-            act:  "concept:name",
-            ts:   "time:timestamp"
-        })
+        df, case_labels = self._to_pm4py_frame()
         df["lifecycle:transition"] = "complete"
-        df.fillna("unknown", inplace=True)
+        df = prepare_nulls(df, key_cols=["case:concept:name", "concept:name"])
         try:
+            from pm4py.objects.conversion.log import converter as log_converter
+            from pm4py.objects.log.exporter.xes import exporter as xes_exporter
+
+            attrs = [c for c in df.columns if not c.startswith("case:") and c not in ("concept:name", "time:timestamp")]
             log = log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
-            xes_exporter.apply(log, save)
+            del df
+            if case_labels is not None:
+                # 组合 case 键只在写出时还原为可读标签（每条 trace 一次）
+                for trace in log:
+                    trace.attributes["concept:name"] = case_labels[trace.attributes["concept:name"]]
+            xes_exporter.apply(fill_unknown_attributes(log, attrs), save)
             QMessageBox.information(self, "成功", f"已导出：\n{save}")
         except Exception as e:
             QMessageBox.critical(self, "导出失败", str(e))
@@ -420,16 +769,16 @@ class CSV2XESConverter(QMainWindow):
             QMessageBox.warning(self, "提示", "无数据")
             return
 
+        import pandas as pd
+
         case, act, ts = (
             self.cbo_case.currentText(),
             self.cbo_act.currentText(),
             self.cbo_time.currentText()
         )
-        df = self.df_work.rename(columns={
-            case: "case:concept:name",
-            act: "concept:name",
-            ts: "time:timestamp"
-        })
+        df, case_labels = self._to_pm4py_frame()
+        if case_labels is not None:
+            case = " + ".join(self.case_columns())
 
         # ✅ 再次确保时间字段为 datetime（防止用户没点“清理时间格式”按钮）
         try:
@@ -440,7 +789,7 @@ class CSV2XESConverter(QMainWindow):
             return
 
         df["lifecycle:transition"] = "complete"
-        df.fillna("unknown", inplace=True)
+        df = prepare_nulls(df, key_cols=["case:concept:name", "concept:name"])
 
         # 显示“正在处理”弹窗
         dlg = ProcessingDialog(self)
@@ -448,6 +797,8 @@ class CSV2XESConverter(QMainWindow):
 
         def do_analysis():
             try:
+                from pm4py.objects.conversion.log import converter as log_converter
+
                 log = log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
                 from process_analysis_window import launch_analysis_window
 
@@ -456,7 +807,7 @@ class CSV2XESConverter(QMainWindow):
                     "concept:name": act,
                     "time:timestamp": ts
                 }
-                analysis_win = launch_analysis_window(log, col_mapping)
+                analysis_win = launch_analysis_window(log, col_mapping, case_labels=case_labels)
 
                 analysis_win.raise_()
             except Exception as e:
@@ -475,6 +826,10 @@ def main():
     app = QApplication(sys.argv)
     win = CSV2XESConverter()
     win.show()
+    # 窗口显示后再在后台预热 pandas / PM4Py / networkx / matplotlib
+    if not os.environ.get("CPA_PM_NO_WARMUP"):
+        from lazy_imports import warm_up_in_background
+        QTimer.singleShot(0, warm_up_in_background)
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
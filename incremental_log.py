@@ -0,0 +1,211 @@
+# incremental_log.py
+"""
+增量追加：新到的事件并入已清洗的日志，只对受影响的 case 重放操作链。
+
+- 新事件所属的 case（新 case，或已有 case 追加了事件）从原始数据中取出全部事件，按操作链重放，
+  结果按 case 替换进清洗后的 DataFrame；其余 case 不再计算
+- 除全局频次过滤（filter）外，操作链中的操作都只依赖 case 自身的事件。filter 依赖全日志的活动频次：
+  这里为每个 filter 维护其输入端的 (case, 活动) 计数，按受影响 case 的新旧贡献增减；
+  若有活动跨过阈值，含这些活动的其它 case 也加入重放
+- DFG 边频次同样只减去受影响 case 的旧贡献、加上新贡献
+
+sessionize（按实体重新编号 case）、filter_variant_top（依赖全部变体的排名）与 custom（无法重放）
+不是 case 内操作，操作链中含有它们时 supports() 返回 False，由调用方整体重放。
+"""
+import numpy as np
+import pandas as pd
+
+CASE = "case:concept:name"
+ACT = "concept:name"
+TIME = "time:timestamp"
+
+NON_LOCAL_OPS = ("sessionize", "filter_variant_top", "custom")
+
+
+def active_ops(ops):
+    """最后一次 reset 之后的操作（reset 回到原始日志，之前的操作不影响结果）"""
+    for i in range(len(ops) - 1, -1, -1):
+        if ops[i]["type"] == "reset":
+            return list(ops[i + 1:])
+    return list(ops)
+
+
+def filter_threshold(op, scale=1.0):
+    """
+    filter 操作在目标日志上的频次阈值。op["scale"] 为记录操作时日志的抽样倍数（完整 case 数 / 样本 case 数，
+    在完整日志上记录时省略）；目标日志的倍数为 scale，阈值按两者之比换算
+    """
+    return op["threshold"] * op.get("scale", 1.0) / scale
+
+
+def directly_follows_counts(df, case_col=CASE, act_col=ACT, time_col=TIME):
+    """(source, target) → 直接跟随次数，按 case 内时间顺序统计（与 PM4Py 的 DFG 一致）"""
+    from cpa_utils import sort_case_time
+
+    if len(df) < 2:
+        return pd.Series(dtype=np.int64, index=pd.MultiIndex.from_arrays([[], []], names=["source", "target"]))
+    work = sort_case_time(df[[case_col, act_col, time_col]], case_col, time_col)
+    codes = pd.factorize(work[case_col], sort=False)[0]
+    acts = work[act_col].to_numpy()
+    same = codes[1:] == codes[:-1]
+    pairs = pd.DataFrame({"source": acts[:-1][same], "target": acts[1:][same]})
+    return pairs.value_counts(sort=False).astype(np.int64)
+
+
+def normalize_rows(rows, like, case_col=CASE, time_col=TIME):
+    """
+    新事件（如 CSV 读入的字符串时间）的时间列 / case 列类型与已有事件 like 对齐：
+    解析时间、统一时区，case 列尽量转为 like 的类型（如整数 case 键）
+    """
+    rows = rows.copy()
+    times = rows[time_col]
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times, errors="coerce")
+    tz = getattr(like[time_col].dtype, "tz", None)
+    if getattr(times.dtype, "tz", None) is None:
+        times = times if tz is None else times.dt.tz_localize(tz)
+    else:
+        times = times.dt.tz_convert(tz)
+    rows[time_col] = times
+    case_dtype = like[case_col].dtype
+    if rows[case_col].dtype != case_dtype:
+        try:
+            rows[case_col] = rows[case_col].astype(case_dtype)
+        except (TypeError, ValueError):
+            pass
+    return rows
+
+
+def splice_log(log, removed, part, case_col=CASE):
+    """
+    在 PM4Py EventLog 中去掉 removed 中的 case，再追加 part（DataFrame）转换出的 trace。
+    其余 trace 对象原样复用，不重新转换。
+    """
+    from pm4py.objects.conversion.log import converter as log_converter
+    from pm4py.objects.log.obj import EventLog
+
+    removed = set(removed)
+    kept = [trace for trace in log if trace.attributes.get("concept:name") not in removed]
+    added = log_converter.apply(part, variant=log_converter.Variants.TO_EVENT_LOG) if len(part) else []
+    return EventLog(kept + list(added), attributes=log.attributes, extensions=log.extensions,
+                    omni_present=log.omni_present, classifiers=log.classifiers, properties=log.properties)
+
+
+class IncrementalLog:
+    """
+    原始事件 + 操作链 + 清洗结果，以及增量重放所需的状态
+
+    raw     : 原始事件（按 case、时间排序）
+    cleaned : 操作链作用于 raw 的结果
+    edges   : cleaned 的 DFG 边频次
+    filters : filter 操作位置 → {"contrib": (case, 活动) 计数, "counts": 活动计数, "keep": 保留的活动}
+    """
+
+    def __init__(self, raw, ops, apply_op, case_col=CASE, act_col=ACT, time_col=TIME):
+        """
+        Args:
+            raw: 原始事件 DataFrame
+            ops: 操作链（已去掉最后一次 reset 之前的部分，见 active_ops）
+            apply_op: apply_op(df, op) → df，执行单个非 filter 操作
+        """
+        from cpa_utils import sort_case_time
+
+        self.case_col, self.act_col, self.time_col = case_col, act_col, time_col
+        self.apply_op = apply_op
+        self.raw = sort_case_time(raw, case_col, time_col)
+        self.ops = []
+        self.filters = {}
+        self.cleaned = self.raw
+        self.extend(ops)
+
+    @staticmethod
+    def supports(ops):
+        return not any(op["type"] in NON_LOCAL_OPS for op in ops)
+
+    def matches(self, ops):
+        """ops 是否以当前状态的操作链开头（之后可用 extend 补上新增的操作）"""
+        ids = [id(op) for op in ops]
+        return ids[:len(self.ops)] == [id(op) for op in self.ops]
+
+    def extend(self, ops):
+        """补跑 ops 中尚未执行的操作（作用于整个 cleaned，只在操作链变长后发生一次）"""
+        for k in range(len(self.ops), len(ops)):
+            op = ops[k]
+            if op["type"] == "filter":
+                contrib = self._contrib(self.cleaned)
+                counts = contrib.groupby(level=1).sum()
+                keep = counts.index[counts >= filter_threshold(op)]
+                self.filters[k] = {"contrib": contrib, "counts": counts, "keep": keep}
+                self.cleaned = self.cleaned[self.cleaned[self.act_col].isin(keep)]
+            else:
+                self.cleaned = self.apply_op(self.cleaned, op)
+            self.ops.append(op)
+        self.edges = directly_follows_counts(self.cleaned, self.case_col, self.act_col, self.time_col)
+
+    def _contrib(self, df):
+        return df.groupby([self.case_col, self.act_col], sort=False, observed=True).size()
+
+    def _replay(self, affected):
+        """
+        在 affected 的原始事件上重放操作链。
+        Returns:
+            (结果, 待提交的 filter 状态, None)；若某个 filter 的保留活动发生变化、
+            需要把其它 case 加入重放，返回 (None, None, 这些 case)
+        """
+        df = self.raw[self.raw[self.case_col].isin(affected)]
+        pending = {}
+        for k, op in enumerate(self.ops):
+            if op["type"] != "filter":
+                df = self.apply_op(df, op)
+                continue
+            st = self.filters[k]
+            stale = st["contrib"].index.get_level_values(0).isin(affected)
+            contrib = self._contrib(df)
+            counts = st["counts"].sub(st["contrib"][stale].groupby(level=1).sum(), fill_value=0) \
+                .add(contrib.groupby(level=1).sum(), fill_value=0)
+            counts = counts[counts > 0].astype(np.int64)
+            keep = counts.index[counts >= filter_threshold(op)]
+            flipped = keep.symmetric_difference(st["keep"])
+            if len(flipped):
+                rest = st["contrib"].index[~stale]
+                hit = rest[rest.get_level_values(1).isin(flipped)].get_level_values(0).unique()
+                if len(hit):
+                    return None, None, hit
+            pending[k] = {"contrib": pd.concat([st["contrib"][~stale], contrib]), "counts": counts, "keep": keep}
+            df = df[df[self.act_col].isin(keep)]
+        return df, pending, None
+
+    def append(self, new_rows):
+        """
+        并入新事件并增量重放。
+        Returns:
+            (changed, affected, raw_part, part)
+            changed : 有新事件的 case
+            affected: 实际重放的 case（changed，以及因 filter 阈值变化而牵连的 case）
+            raw_part: changed 的全部原始事件
+            part    : affected 重放后的结果，替换 cleaned 中这些 case 的旧结果
+        """
+        from cpa_utils import insert_sorted
+
+        new_rows = normalize_rows(new_rows, self.raw, self.case_col, self.time_col)
+        changed = pd.Index(new_rows[self.case_col].dropna().unique())
+        self.raw = insert_sorted(self.raw, new_rows, self.case_col, self.time_col, ignore_index=True)
+
+        affected = changed
+        while True:
+            part, pending, extra = self._replay(affected)
+            if extra is None:
+                break
+            affected = affected.union(extra)
+        self.filters.update(pending)
+
+        stale = self.cleaned[self.case_col].isin(affected)
+        old_part = self.cleaned[stale]
+        edges = self.edges.sub(directly_follows_counts(old_part, self.case_col, self.act_col, self.time_col),
+                               fill_value=0)
+        edges = edges.add(directly_follows_counts(part, self.case_col, self.act_col, self.time_col), fill_value=0)
+        self.edges = edges[edges > 0].astype(np.int64)
+        self.cleaned = pd.concat([self.cleaned[~stale], part], ignore_index=True)
+
+        raw_part = self.raw[self.raw[self.case_col].isin(changed)]
+        return changed, affected, raw_part, part
@@ -0,0 +1,47 @@
+# lazy_imports.py
+"""
+重量级依赖的后台预热。
+
+主窗口只依赖 PyQt5；pandas / PM4Py / networkx / matplotlib 都在首次使用处局部导入。
+窗口显示后调用 warm_up_in_background()，在守护线程里提前导入这些模块，
+用户第一次打开文件 / 开始分析时就不必再等待导入。
+"""
+import importlib
+import threading
+
+HEAVY_MODULES = (
+    "pandas",
+    "chardet",
+    "pm4py.objects.conversion.log.converter",
+    "pm4py.objects.log.util.dataframe_utils",
+    "pm4py.objects.log.exporter.xes.exporter",
+    "pm4py.algo.discovery.dfg.algorithm",
+    "networkx",
+    "networkx.drawing.nx_pydot",
+    "cpa_utils",
+    "process_analysis_window",
+    "matplotlib.figure",
+    "matplotlib.backends.backend_qt5agg",
+)
+
+_warm_thread = None
+
+
+def _import_all(modules):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            # 预热失败不影响主流程：真正使用时会在原处抛出并提示
+            pass
+
+
+def warm_up_in_background(modules=HEAVY_MODULES):
+    """在守护线程中依次导入 modules；重复调用只会启动一次"""
+    global _warm_thread
+    if _warm_thread is not None:
+        return _warm_thread
+    _warm_thread = threading.Thread(target=_import_all, args=(tuple(modules),),
+                                    name="cpa-pm-warmup", daemon=True)
+    _warm_thread.start()
+    return _warm_thread
@@ -0,0 +1,188 @@
+# log_summary.py
+"""
+概况统计（记录数 / 流程数 / 活动数 / 变体数）的版本化缓存。
+
+每个日志版本只完整计算一次；对“整条删除 trace”的筛选，直接从上一版本中减去被删 case 的贡献，
+无需重新排序分组。滑块等只影响显示的操作不会触发任何计算。
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+CASE = "case:concept:name"
+ACT = "concept:name"
+TIME = "time:timestamp"
+
+# 两个不同底数的多项式哈希混合成 64 位变体键（按 2^64 取模，溢出即取模）
+_BASE_1 = np.uint64(1_000_003)
+_BASE_2 = np.uint64(0x100000001B3)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _positional_powers(base, positions):
+    """base ** positions（uint64 溢出回绕），positions 为每个事件在 case 内的位置"""
+    max_pos = int(positions.max()) + 1 if len(positions) else 1
+    table = np.empty(max_pos, dtype=np.uint64)
+    table[0] = 1
+    with np.errstate(over="ignore"):
+        for i in range(1, max_pos):  # 长度为最长 trace，而非事件数
+            table[i] = table[i - 1] * base
+    return table[positions]
+
+
+def sequence_keys(codes, boundaries):
+    """
+    对按 case 连续存放的活动编码序列计算 64 位哈希键（相同序列 → 相同键）
+
+    Args:
+        codes: 整数活动编码（已按 case + 时间排序）
+        boundaries: 每个 case 第一个事件的位置（升序，首元素为 0）
+    """
+    n = len(codes)
+    codes = (np.asarray(codes, dtype=np.int64) + 1).astype(np.uint64)
+    lengths = np.diff(np.r_[boundaries, n])
+    positions = np.arange(n) - np.repeat(boundaries, lengths)
+
+    with np.errstate(over="ignore"):
+        h1 = np.add.reduceat(codes * _positional_powers(_BASE_1, positions), boundaries)
+        h2 = np.add.reduceat(codes * _positional_powers(_BASE_2, positions), boundaries)
+        return h1 ^ (h2 * _MIX) ^ (lengths.astype(np.uint64) << np.uint64(48))
+
+
+def case_variant_keys(df, case_col=CASE, act_col=ACT, time_col=TIME):
+    """
+    为每个 case 计算其活动序列的 64 位哈希键（相同序列 → 相同键），全程向量化。
+    活动编码取活动名的哈希而非出现顺序，不同 DataFrame 算出的键可以直接比较（增量合并概况时需要）。
+
+    Returns:
+        pd.Series，index 为 case id，值为 uint64 变体键
+    """
+    if df.empty:
+        return pd.Series(dtype=np.uint64)
+    work = df[[case_col, act_col, time_col]].sort_values([case_col, time_col], kind="stable")
+    local, names = pd.factorize(work[act_col])
+    # 末尾补一个 0：缺失活动（编码 -1）取到它
+    codes = np.r_[pd.util.hash_array(np.asarray(names, dtype=object)).view(np.int64), 0][local]
+    case_codes, case_ids = pd.factorize(work[case_col], sort=False)
+    boundaries = np.flatnonzero(np.r_[True, case_codes[1:] != case_codes[:-1]])
+    return pd.Series(sequence_keys(codes, boundaries), index=case_ids[case_codes[boundaries]])
+
+
+class LogSummary:
+    """
+    某一日志版本的概况统计，以及按 case 拆分的贡献（用于增量更新）
+
+    cases        : 以 case id 为索引，列 n_events / variant / start / end
+    case_activity: (case, activity) → 出现次数
+    """
+
+    def __init__(self, cases, case_activity, activity_counts, variant_counts, version=0):
+        self.cases = cases
+        self.case_activity = case_activity
+        self.activity_counts = activity_counts
+        self.variant_counts = variant_counts
+        self.version = version
+
+    @classmethod
+    def from_dataframe(cls, df, version=0, case_col=CASE, act_col=ACT, time_col=TIME):
+        times = df[time_col]
+        if not pd.api.types.is_datetime64_any_dtype(times):
+            times = pd.to_datetime(times, errors="coerce")
+        grouped = times.groupby(df[case_col], sort=False)
+        cases = pd.DataFrame({
+            "n_events": grouped.size(),
+            "start": grouped.min(),
+            "end": grouped.max(),
+        })
+        cases["variant"] = case_variant_keys(df, case_col, act_col, time_col).reindex(cases.index)
+
+        case_activity = df.groupby([case_col, act_col], sort=False, observed=True).size()
+        activity_counts = df[act_col].value_counts()
+        variant_counts = cases["variant"].value_counts()
+        return cls(cases, case_activity, activity_counts, variant_counts, version)
+
+    # ---- 概况数值 ----
+    @property
+    def num_records(self):
+        return int(self.cases["n_events"].sum())
+
+    @property
+    def num_traces(self):
+        return len(self.cases)
+
+    @property
+    def num_activities(self):
+        return int((self.activity_counts > 0).sum())
+
+    @property
+    def num_variants(self):
+        return int((self.variant_counts > 0).sum())
+
+    # ---- 增量更新 ----
+    def without_cases(self, removed, version=None):
+        """
+        删除若干整条 trace 后的概况：只减去被删 case 的贡献
+        """
+        removed = pd.Index(removed).intersection(self.cases.index)
+        version = self.version + 1 if version is None else version
+        if removed.empty:
+            return LogSummary(self.cases, self.case_activity, self.activity_counts,
+                              self.variant_counts, version)
+
+        gone = self.cases.loc[removed]
+        cases = self.cases.drop(index=removed)
+
+        variant_counts = self.variant_counts.sub(gone["variant"].value_counts(), fill_value=0)
+        variant_counts = variant_counts[variant_counts > 0].astype(np.int64)
+
+        in_removed = self.case_activity.index.get_level_values(0).isin(removed)
+        removed_acts = self.case_activity[in_removed].groupby(level=1).sum()
+        activity_counts = self.activity_counts.sub(removed_acts, fill_value=0)
+        activity_counts = activity_counts[activity_counts > 0].astype(np.int64)
+
+        return LogSummary(cases, self.case_activity[~in_removed], activity_counts, variant_counts, version)
+
+    def keep_cases(self, kept, version=None):
+        """仅保留 kept 中的 case（整条 trace 级筛选的结果）"""
+        removed = self.cases.index.difference(pd.Index(kept))
+        return self.without_cases(removed, version)
+
+    def with_cases(self, df, version=None):
+        """
+        并入 df 中的 case（增量追加的结果）：只加上这些 case 的贡献。
+        df 中的 case 不应已在本概况中，替换已有 case 时先用 without_cases 去掉旧贡献
+        """
+        version = self.version + 1 if version is None else version
+        if df.empty:
+            return LogSummary(self.cases, self.case_activity, self.activity_counts,
+                              self.variant_counts, version)
+        added = LogSummary.from_dataframe(df)
+        activity_counts = self.activity_counts.add(added.activity_counts, fill_value=0).astype(np.int64)
+        variant_counts = self.variant_counts.add(added.variant_counts, fill_value=0).astype(np.int64)
+        return LogSummary(pd.concat([self.cases, added.cases]),
+                          pd.concat([self.case_activity, added.case_activity]),
+                          activity_counts, variant_counts, version)
+
+
+class SummaryCache:
+    """
+    以日志对象身份为键的小型 LRU：撤销 / 重做回到旧版本时直接复用其概况
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # id(log) -> (log, summary)
+
+    def get(self, log):
+        entry = self._entries.get(id(log))
+        if entry is None or entry[0] is not log:
+            return None
+        self._entries.move_to_end(id(log))
+        return entry[1]
+
+    def put(self, log, summary):
+        self._entries[id(log)] = (log, summary)
+        self._entries.move_to_end(id(log))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,130 @@
+# op_profiler.py
+"""
+轻量级操作耗时记录：为 activity_ops 中每个操作的各阶段（to_data_frame / op / to_event_log /
+update_graph / update_preview ...）记录耗时、输入输出行数与（可选的）峰值内存分配。
+
+- 计时只用 perf_counter_ns，开销在微秒级，可以常开
+- 峰值内存依赖 tracemalloc，开销较大，默认关闭，需要时通过 track_memory 打开
+- 结果可导出为 Chrome Trace JSON（chrome://tracing / Perfetto 直接打开）
+"""
+import json
+import os
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+MAX_PHASES_PER_OP = 64  # 每个操作最多保留的阶段记录数；超出时丢弃最早追加的记录
+
+
+class OpProfiler:
+    def __init__(self, track_memory=False, max_records=5000):
+        self.track_memory = track_memory
+        self._t0 = time.perf_counter_ns()
+        self._pending = []                       # 尚未归属到某个操作的阶段记录
+        self._records = deque(maxlen=max_records)  # 全部阶段记录（用于导出 trace）
+        self._by_op = {}                         # id(op) -> (op, [阶段记录], 操作自身的阶段数)
+
+    def set_track_memory(self, enabled):
+        self.track_memory = enabled
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name, rows_in=None):
+        """
+        记录一个阶段；调用方可在 with 块内写入 rec["rows_out"]
+        """
+        rec = {"name": name, "rows_in": rows_in, "rows_out": None, "peak_mb": None}
+        tracing = self.track_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter_ns()
+        try:
+            yield rec
+        finally:
+            end = time.perf_counter_ns()
+            rec["ts_us"] = (start - self._t0) / 1000
+            rec["dur_us"] = (end - start) / 1000
+            if tracing:
+                rec["peak_mb"] = max(0, tracemalloc.get_traced_memory()[1] - base) / 2 ** 20
+            self._pending.append(rec)
+
+    def commit(self, op, append=False):
+        """
+        将待归属的阶段记录挂到 op 上；append=True 时追加到该操作已有的记录之后
+        （例如重放整条操作链后的转换与绘图，记到最后一个操作上）
+        """
+        phases, self._pending = self._pending, []
+        if op is None or not phases:
+            return
+        label = op.get("type", "op") if isinstance(op, dict) else str(op)
+        for rec in phases:
+            rec["op"] = label
+            self._records.append(rec)
+
+        key = id(op)
+        entry = self._by_op.get(key)
+        if append and entry is not None and entry[0] is op:
+            _, recs, n_own = entry
+            recs.extend(phases)
+            # 操作自身的阶段始终保留，追加的记录只留最近的若干条
+            excess = len(recs) - max(MAX_PHASES_PER_OP, n_own)
+            if excess > 0:
+                del recs[n_own:n_own + excess]
+        else:
+            self._by_op[key] = (op, phases, len(phases))
+
+    def prune(self, live_ops):
+        """只保留 live_ops 中操作的记录（撤销 / 重置 / 清空历史后，已不可达的操作不再占用内存）"""
+        live = {id(op): op for op in live_ops}
+        self._by_op = {key: entry for key, entry in self._by_op.items() if live.get(key) is entry[0]}
+
+    def discard_pending(self):
+        self._pending = []
+
+    def phases_for(self, op):
+        entry = self._by_op.get(id(op))
+        if entry is None or entry[0] is not op:
+            return []
+        return entry[1]
+
+    def total_seconds(self, op):
+        return sum(rec["dur_us"] for rec in self.phases_for(op)) / 1e6
+
+    def summary_text(self, op):
+        """操作历史列表的 tooltip 文本"""
+        phases = self.phases_for(op)
+        if not phases:
+            return "尚无耗时记录"
+        lines = [f"总耗时: {self.total_seconds(op):.3f}s"]
+        for rec in phases:
+            rows = ""
+            if rec["rows_in"] is not None or rec["rows_out"] is not None:
+                rows_in = "-" if rec["rows_in"] is None else f"{rec['rows_in']:,}"
+                rows_out = "-" if rec["rows_out"] is None else f"{rec['rows_out']:,}"
+                rows = f"  行数 {rows_in} → {rows_out}"
+            mem = "" if rec["peak_mb"] is None else f"  峰值 {rec['peak_mb']:.1f}MB"
+            lines.append(f"  {rec['name']}: {rec['dur_us'] / 1e6:.3f}s{rows}{mem}")
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path):
+        """导出为 Chrome Trace Event 格式（"X" 完整事件，单位微秒）"""
+        events = []
+        for rec in self._records:
+            args = {k: rec[k] for k in ("rows_in", "rows_out", "peak_mb") if rec[k] is not None}
+            events.append({
+                "name": rec["name"],
+                "cat": rec.get("op", "op"),
+                "ph": "X",
+                "ts": rec["ts_us"],
+                "dur": rec["dur_us"],
+                "pid": os.getpid(),
+                "tid": 1,
+                "args": args,
+            })
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fh, ensure_ascii=False)
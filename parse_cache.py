@@ -0,0 +1,175 @@
+# parse_cache.py
+"""
+源文件解析结果的本地磁盘缓存。
+
+同一个 CSV 反复打开时，读取列、时间解析（clean_time）、类型推断（smart_cast_columns）
+的结果按列写成无压缩的 Arrow IPC 文件，再次打开时以 memory_map 方式读回，不再重新解析。
+
+- 键：源文件指纹（绝对路径、大小、mtime、头尾各 HASH_BYTES 字节的哈希）+ 解析设置
+  （阶段、列名、编码、时间格式等）+ 缓存格式 / pandas / pyarrow 版本，任一变化即不命中
+- 容量：总大小超过 max_bytes 时按最近使用时间（命中时刷新文件 mtime）淘汰最旧的条目
+- 清除：窗口中的“清除缓存”按钮，或命令行 python parse_cache.py clear
+
+pyarrow 不可用或读写出错时缓存自动失效，调用方照常解析。
+"""
+import hashlib
+import json
+import os
+
+CACHE_VERSION = 1
+CACHE_DIR = os.environ.get("CPA_PM_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "cpa_pm", "parse")
+CACHE_MAX_BYTES = int(float(os.environ.get("CPA_PM_CACHE_MAX_GB", "8")) * (1 << 30))
+HASH_BYTES = 1 << 20  # 指纹中参与哈希的头 / 尾字节数
+SUFFIX = ".arrow"
+
+
+def file_fingerprint(path):
+    """源文件指纹：路径、大小、mtime 与头尾内容哈希；文件被改写或替换后指纹必然变化"""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        h.update(fh.read(HASH_BYTES))
+        if st.st_size > HASH_BYTES:
+            fh.seek(max(HASH_BYTES, st.st_size - HASH_BYTES))
+            h.update(fh.read(HASH_BYTES))
+    return f"{path}|{st.st_size}|{st.st_mtime_ns}|{h.hexdigest()}"
+
+
+class ParseCache:
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    # ---- 键 ----
+    @staticmethod
+    def _versions():
+        import pandas as pd
+        import pyarrow as pa
+        return [CACHE_VERSION, pd.__version__, pa.__version__]
+
+    def _path(self, fingerprint, settings):
+        raw = json.dumps([self._versions(), fingerprint, settings], sort_keys=True, default=str)
+        return os.path.join(self.root, hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest() + SUFFIX)
+
+    # ---- 读写 ----
+    def get(self, fingerprint, **settings):
+        """命中时返回缓存的 Series（保留原索引与 dtype），否则返回 None"""
+        if fingerprint is None:
+            return None
+        try:
+            import pyarrow as pa
+            path = self._path(fingerprint, settings)
+            if not os.path.exists(path):
+                return None
+            with pa.memory_map(path) as src:
+                table = pa.ipc.open_file(src).read_all()
+            df = table.to_pandas()
+            os.utime(path)  # 刷新最近使用时间
+        except Exception:
+            self._discard(fingerprint, settings)
+            return None
+        return df.iloc[:, 0]
+
+    def put(self, fingerprint, series, **settings):
+        """写入一列；写入失败（类型无法转为 Arrow、磁盘已满等）时静默放弃，返回是否写入"""
+        if fingerprint is None:
+            return False
+        tmp = None
+        try:
+            import pyarrow as pa
+            os.makedirs(self.root, exist_ok=True)
+            path = self._path(fingerprint, settings)
+            name = "value" if series.name is None else str(series.name)
+            table = pa.Table.from_pandas(series.to_frame(name=name), preserve_index=None)  # RangeIndex 只记元数据
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            if os.path.getsize(tmp) > self.max_bytes:
+                os.remove(tmp)
+                return False
+            os.replace(tmp, path)  # 原子替换：并发读取只会看到完整文件
+        except Exception:
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+            return False
+        self.evict()
+        return True
+
+    def _discard(self, fingerprint, settings):
+        try:
+            os.remove(self._path(fingerprint, settings))
+        except Exception:
+            pass
+
+    # ---- 容量管理 ----
+    def _entries(self):
+        """[(mtime, size, path), ...]，最近最少使用的在前"""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for entry in os.scandir(self.root):
+            if entry.is_file() and entry.name.endswith(SUFFIX):
+                st = entry.stat()
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        entries.sort()
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """总大小超过 max_bytes 时按 LRU 删除，返回删除的条目数"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """删除全部缓存条目，返回释放的字节数"""
+        freed = 0
+        for _, size, path in self._entries():
+            try:
+                os.remove(path)
+                freed += size
+            except OSError:
+                pass
+        return freed
+
+
+_default_cache = None
+
+
+def get_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ParseCache()
+    return _default_cache
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="CSV 解析缓存管理")
+    parser.add_argument("command", choices=("stats", "clear"))
+    args = parser.parse_args(argv)
+    cache = get_cache()
+    if args.command == "clear":
+        print(f"已清除 {cache.clear() / (1 << 20):.1f} MB（{cache.root}）")
+    else:
+        print(f"{cache.root}: {len(cache._entries())} 项，{cache.size() / (1 << 20):.1f} MB"
+              f" / 上限 {cache.max_bytes / (1 << 30):.1f} GB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+# predicate_engine.py
+"""
+“删除记录条件”使用的类型化谓词引擎，替代 eval() + df.query 字符串。
+
+- 只解析字面量（数字 / 字符串 / 布尔 / 列表），不执行任何代码
+- 字面量按列的 dtype 转换（数值 / 时间 / 布尔 / 文本）
+- 支持比较运算、in / not in、between、regex、is null / not null，以及 AND / OR / NOT 与括号
+- 每个条件编译一次为向量化的掩码函数，可缓存在操作记录上，重放时只需一次掩码计算
+- 掩码函数可接收一个 AttributeIndex：等值 / 范围 / isin 条件优先通过列索引解析
+
+表达式示例::
+
+    concept:name in ['A', 'B'] AND `org:resource` is null
+    amount between 10, 200 OR (time:timestamp >= '2024-01-01' AND NOT concept:name regex '^Test')
+"""
+import ast
+import re
+
+import numpy as np
+import pandas as pd
+
+COMPARE_OPS = ("==", "!=", ">", "<", ">=", "<=")
+LIST_OPS = ("in", "not in", "between")
+UNARY_OPS = ("is null", "not null")
+# 界面下拉框中的全部操作符；“表达式”表示值输入框中是一条完整的组合表达式
+UI_OPS = COMPARE_OPS + LIST_OPS + ("regex",) + UNARY_OPS + ("表达式",)
+
+
+class PredicateError(ValueError):
+    """条件无法解析，或字面量与列类型不匹配"""
+
+
+# ---------------------------------------------------------------
+# 字面量解析与类型转换
+# ---------------------------------------------------------------
+def parse_literal(text):
+    """
+    安全解析一个字面量：Python 字面量语法（ast.literal_eval），失败时视为去引号的字符串
+    """
+    text = text.strip()
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text.strip("'\"")
+
+
+def parse_list(text):
+    """解析 in / between 的值：[a, b] / (a, b) / a, b"""
+    value = parse_literal(text)
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    if isinstance(value, str) and ("," in value or value[:1] in "[("):
+        return [parse_literal(part) for part in _split_top_level(text)]
+    return [value]
+
+
+def _split_top_level(text):
+    parts, buf, quote = [], "", None
+    for ch in text.strip().strip("[]()"):
+        if quote:
+            buf += ch
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+            buf += ch
+        elif ch == ",":
+            parts.append(buf)
+            buf = ""
+        else:
+            buf += ch
+    parts.append(buf)
+    return [p for p in (p.strip() for p in parts) if p]
+
+
+def coerce_literal(value, series):
+    """将字面量转换为与列 dtype 可比较的值"""
+    dtype = series.dtype
+    if value is None:
+        return None
+    try:
+        if pd.api.types.is_bool_dtype(dtype):
+            if isinstance(value, str):
+                lowered = value.strip().lower()
+                if lowered in ("true", "1", "yes", "是"):
+                    return True
+                if lowered in ("false", "0", "no", "否"):
+                    return False
+                raise ValueError(value)
+            return bool(value)
+        if pd.api.types.is_numeric_dtype(dtype):
+            if isinstance(value, bool):
+                return int(value)
+            return pd.to_numeric(value)
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            ts = pd.Timestamp(value)
+            tz = getattr(dtype, "tz", None)
+            if tz is not None and ts.tzinfo is None:
+                ts = ts.tz_localize(tz)
+            elif tz is None and ts.tzinfo is not None:
+                ts = ts.tz_convert(None)
+            return ts
+    except (ValueError, TypeError) as e:
+        raise PredicateError(f"值 {value!r} 无法转换为列 {series.name} 的类型 {dtype}") from e
+    # 文本 / 分类 / 混合类型列：统一按字符串比较
+    return value if isinstance(value, str) else str(value)
+
+
+# ---------------------------------------------------------------
+# 谓词节点：compile() 返回 (df, index=None) -> 布尔 ndarray 的函数
+# ---------------------------------------------------------------
+class Condition:
+    """单列条件：column op literal"""
+
+    def __init__(self, col, op, raw=None):
+        if op not in COMPARE_OPS + LIST_OPS + ("regex",) + UNARY_OPS:
+            raise PredicateError(f"不支持的操作符：{op}")
+        if op not in UNARY_OPS and (raw is None or str(raw).strip() == ""):
+            raise PredicateError(f"操作符 {op} 需要一个值")
+        self.col = col
+        self.op = op
+        self.raw = raw
+
+    def __repr__(self):
+        return f"{self.col} {self.op}" + ("" if self.op in UNARY_OPS else f" {self.raw}")
+
+    def compile(self):
+        col, op, raw = self.col, self.op, self.raw
+
+        if op in UNARY_OPS:
+            negate = op == "not null"
+
+            def mask(df, index=None):
+                m = _column(df, col).isna().to_numpy()
+                return ~m if negate else m
+            return mask
+
+        if op == "regex":
+            try:
+                pattern = re.compile(str(parse_literal(raw)))
+            except re.error as e:
+                raise PredicateError(f"正则表达式无效：{e}") from e
+
+            def mask(df, index=None):
+                s = _column(df, col)
+                return s.astype("string").str.contains(pattern, na=False).to_numpy(dtype=bool)
+            return mask
+
+        literal = parse_list(raw) if op in LIST_OPS else parse_literal(raw)
+        if op == "between" and len(literal) != 2:
+            raise PredicateError("between 需要两个值，例如：10, 200")
+        coerced = {}  # dtype -> 转换后的字面量；同一列重复求值时不再转换
+
+        def mask(df, index=None):
+            s = _column(df, col)
+            key = str(s.dtype)
+            if key not in coerced:
+                if op in LIST_OPS:
+                    coerced[key] = [coerce_literal(v, s) for v in literal]
+                else:
+                    coerced[key] = coerce_literal(literal, s)
+            value = coerced[key]
+            if index is not None:
+                m = index.mask(df, col, op, value)
+                if m is not None:
+                    return m
+            if op == "in":
+                return s.isin(value).to_numpy(dtype=bool)
+            if op == "not in":
+                return (~s.isin(value)).to_numpy(dtype=bool)
+            if op == "between":
+                return s.between(value[0], value[1]).fillna(False).to_numpy(dtype=bool)
+            if pd.api.types.is_object_dtype(s.dtype) and isinstance(value, str):
+                s = s.astype("string")  # 混合类型列按文本比较，避免 str/int 比较报错
+            try:
+                result = _COMPARE[op](s, value)
+            except TypeError as e:
+                raise PredicateError(f"列 {col} 无法与 {value!r} 比较") from e
+            # 空值：!= 视为满足（与索引路径及原 df.query 一致），其余比较视为不满足
+            return result.fillna(op == "!=").to_numpy(dtype=bool)
+        return mask
+
+
+_COMPARE = {
+    "==": lambda s, v: s == v,
+    "!=": lambda s, v: s != v,
+    ">": lambda s, v: s > v,
+    "<": lambda s, v: s < v,
+    ">=": lambda s, v: s >= v,
+    "<=": lambda s, v: s <= v,
+}
+
+
+def _column(df, col):
+    if col not in df.columns:
+        raise PredicateError(f"列不存在：{col}")
+    return df[col]
+
+
+class And:
+    def __init__(self, *children):
+        self.children = children
+
+    def compile(self):
+        fns = [c.compile() for c in self.children]
+        return lambda df, index=None: np.logical_and.reduce([fn(df, index) for fn in fns])
+
+
+class Or:
+    def __init__(self, *children):
+        self.children = children
+
+    def compile(self):
+        fns = [c.compile() for c in self.children]
+        return lambda df, index=None: np.logical_or.reduce([fn(df, index) for fn in fns])
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def compile(self):
+        fn = self.child.compile()
+        return lambda df, index=None: ~fn(df, index)
+
+
+# ---------------------------------------------------------------
+# 表达式解析（递归下降）
+# ---------------------------------------------------------------
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+      (?P<lparen>\()|(?P<rparen>\))
+     |(?P<list>\[[^\]]*\])
+     |(?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+     |(?P<op>==|!=|>=|<=|>|<)
+     |(?P<comma>,)
+     |(?P<quoted>`[^`]+`)
+     |(?P<word>[^\s()\[\],'"`=!<>]+)
+    )""", re.VERBOSE)
+
+_KEYWORD_OPS = {"in", "between", "regex", "is", "not"}
+
+
+def _tokenize(text):
+    tokens, pos = [], 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise PredicateError(f"无法解析：{text[pos:]}")
+        kind = m.lastgroup
+        tokens.append((kind, m.group(kind)))
+        pos = m.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.i = 0
+
+    def peek(self, offset=0):
+        j = self.i + offset
+        return self.tokens[j] if j < len(self.tokens) else (None, None)
+
+    def next(self):
+        tok = self.peek()
+        self.i += 1
+        return tok
+
+    def keyword(self, word):
+        kind, val = self.peek()
+        if kind == "word" and val.upper() == word:
+            self.i += 1
+            return True
+        return False
+
+    def parse(self):
+        node = self.parse_or()
+        if self.i < len(self.tokens):
+            raise PredicateError(f"多余的内容：{self.peek()[1]}")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.keyword("OR"):
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else Or(*nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.keyword("AND"):
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else And(*nodes)
+
+    def parse_not(self):
+        # 条件开头的 NOT 为取反；“列 not in / not null”中的 not 由 parse_condition 处理
+        if self.keyword("NOT"):
+            return Not(self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind, val = self.peek()
+        if kind == "lparen":
+            self.i += 1
+            node = self.parse_or()
+            if self.next()[0] != "rparen":
+                raise PredicateError("缺少右括号")
+            return node
+        return self.parse_condition()
+
+    def parse_condition(self):
+        kind, col = self.next()
+        if kind == "quoted":
+            col = col[1:-1]
+        elif kind != "word":
+            raise PredicateError(f"此处应为列名：{col}")
+
+        kind, val = self.next()
+        word = (val or "").lower()
+        if kind == "op":
+            return Condition(col, val, self.literal_text())
+        if kind == "word" and word in _KEYWORD_OPS:
+            if word == "is":
+                if self.keyword("NOT"):
+                    op = "not null"
+                else:
+                    op = "is null"
+                if not self.keyword("NULL"):
+                    raise PredicateError("is 后应为 null / not null")
+                return Condition(col, op)
+            if word == "not":
+                if self.keyword("NULL"):
+                    return Condition(col, "not null")
+                if self.keyword("IN"):
+                    return Condition(col, "not in", self.literal_text())
+                raise PredicateError("not 后应为 in / null")
+            if word == "between":
+                low = self.literal_text()
+                if self.peek()[0] == "comma":
+                    self.i += 1
+                elif not self.keyword("AND"):
+                    raise PredicateError("between 写法：列 between a AND b")
+                return Condition(col, "between", f"[{low}, {self.literal_text()}]")
+            return Condition(col, word, self.literal_text())
+        raise PredicateError(f"列 {col} 后应为操作符")
+
+    def literal_text(self):
+        kind, val = self.next()
+        if kind not in ("string", "list", "word", "quoted"):
+            raise PredicateError("此处应为一个值")
+        return val
+
+
+def parse_expression(text):
+    """将一条组合表达式解析为谓词树"""
+    if not text or not text.strip():
+        raise PredicateError("表达式为空")
+    return _Parser(text).parse()
+
+
+def build_predicate(col, op, val):
+    """
+    由界面上的（列, 操作符, 值）构造谓词；op 为“表达式”时 val 是完整表达式
+    """
+    if op == "表达式":
+        return parse_expression(val)
+    return Condition(col, op, val)
+
+
+def compile_condition(col, op, val):
+    """编译为 df -> 布尔 ndarray 的掩码函数"""
+    return build_predicate(col, op, val).compile()
+
+
+def mask_for_op(op, df, index=None):
+    """
+    delete_condition 操作的掩码：编译结果缓存在 op["_mask_fn"] 上，重放时不再解析
+
+    Args:
+        index: 可选，与 df 行顺序一致的 AttributeIndex
+    """
+    fn = op.get("_mask_fn")
+    if fn is None:
+        fn = op["_mask_fn"] = compile_condition(op.get("col"), op["op"], op.get("val"))
+    return fn(df, index)
+
+
+def apply_delete_condition(df, mask, level, case_col="case:concept:name"):
+    """
+    根据掩码删除记录：事件级删除命中的事件；流程级删除含有命中事件的整条流程
+    """
+    if level == "流程级":
+        match_cases = pd.unique(df[case_col].to_numpy()[mask])
+        return df[~df[case_col].isin(match_cases)]
+    return df[~mask]
@@ -5,9 +5,10 @@ import pandas as pd
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QHBoxLayout, QVBoxLayout,
     QPushButton, QSplitter, QLabel, QSpinBox, QMessageBox, QSlider,
-    QGroupBox, QTableWidget, QTableWidgetItem, QListWidget, QDialog, QListWidgetItem, QFileDialog, QComboBox, QCompleter
+    QGroupBox, QTableWidget, QTableWidgetItem, QListWidget, QDialog, QListWidgetItem, QFileDialog, QComboBox, QCompleter,
+    QCheckBox
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtWidgets import QDateTimeEdit, QLineEdit, QGroupBox
 from PyQt5.QtCore import QDateTime
 from typing import List
@@ -17,10 +18,21 @@ from process_graph_view import ProcessGraphView
 from pm4py.objects.conversion.log import converter as log_converter
 from merge_activity_dialog import MergeActivityDialog
 from remove_self_loop_dialog import RemoveSelfLoopDialog
+from op_profiler import OpProfiler
+from log_summary import LogSummary, SummaryCache
+from filter_preview import FilterPreview
+from attribute_index import AttributeIndex
+from time_index import TimeIndex, event_window_mask, from_ns
+from temporal_dfg import TemporalDFG, WINDOW_FREQS
+from cases_utils import CaseIndex, VariantTrie, filter_by_variants
+from incremental_log import filter_threshold
+from predicate_engine import UI_OPS, UNARY_OPS, PredicateError, mask_for_op, apply_delete_condition
+
+SAMPLE_SEED = 0  # 抽样模式的随机种子：同一日志、同一比例总是抽到同一批 case
 
 
 class ProcessAnalysisWindow(QMainWindow):
-    def __init__(self, event_log, col_mapping=None, parent=None):
+    def __init__(self, event_log, col_mapping=None, parent=None, case_labels=None):
         self.col_mapping = col_mapping or {
             "case:concept:name": "case:concept:name",
             "concept:name": "concept:name",
@@ -31,10 +43,31 @@ class ProcessAnalysisWindow(QMainWindow):
         self.setWindowTitle("流程图分析与交互控制")
         self.setGeometry(200, 100, 1200, 700)
 
+        # 多列组合 case 标识时，日志中的 case id 为 int64 键，case_labels[key] 为可读标签（仅用于显示 / 导出）
+        self.case_labels = case_labels
+
         # 原始日志
         self.original_log = event_log
         # 当前日志 - 必须初始化
         self.current_log = event_log
+        # 日志版本号：每产生一个新日志加一；概况统计按日志缓存，同一版本只计算一次
+        self.log_version = 0
+        # 抽样模式：original_log 换成分层抽样后的日志，完整日志暂存在 _full_log
+        self._full_log = None
+        self._sample_fraction = None
+        self._sample_scale = None  # 完整日志 case 数 / 样本 case 数，用于把计数换算为估计值
+        self._full_replay_thread = None
+        self._full_replay_result = None
+        self._summary_cache = SummaryCache()
+        self._stats_cache = SummaryCache(max_entries=4)  # 日志 → StatisticsEngine
+        self._preview_cache = SummaryCache(max_entries=4)  # 日志 → FilterPreview
+        self._attr_index_cache = SummaryCache(max_entries=2)  # 日志 → AttributeIndex（按列懒建）
+        self._time_index_cache = SummaryCache(max_entries=2)  # 日志 → TimeIndex
+        self._drift_cache = SummaryCache(max_entries=2)  # 日志 → {窗口粒度: TemporalDFG}
+        self._variant_trie_cache = SummaryCache(max_entries=2)  # 日志 → VariantTrie
+        self._variant_preview_wanted = False  # 变体控件被调整过后才为预估构建前缀树
+        # 增量追加状态：(original_log, IncrementalLog)，original_log 或操作链变化后失效
+        self._append_state = None
 
         # 日志历史栈（用于撤销上一操作）
         self.log_history = []
@@ -73,11 +106,15 @@ class ProcessAnalysisWindow(QMainWindow):
         self.lbl_summary_traces = QLabel("流程数: 0")
         self.lbl_summary_activities = QLabel("活动数: 0")
         self.lbl_summary_variants = QLabel("变体数: 0")
+        self.lbl_sample_mode = QLabel()
+        self.lbl_sample_mode.setStyleSheet("color: #c06000;")
+        self.lbl_sample_mode.hide()
         for lbl in (
                 self.lbl_summary_events,
                 self.lbl_summary_traces,
                 self.lbl_summary_activities,
-                self.lbl_summary_variants
+                self.lbl_summary_variants,
+                self.lbl_sample_mode
         ):
             summary_layout.addWidget(lbl)
         # 将概况插入 splitter_main 第一行
@@ -133,6 +170,8 @@ class ProcessAnalysisWindow(QMainWindow):
         self.freq_spin.setMaximum(999)
         self.freq_spin.setValue(2)
         h_freq.addWidget(self.freq_spin)
+        self.lbl_preview_freq = QLabel()
+        h_freq.addWidget(self.lbl_preview_freq)
 
         btn_filter_freq = QPushButton("应用频次过滤")
         btn_filter_freq.clicked.connect(self.filter_events_by_global_frequency)
@@ -147,6 +186,8 @@ class ProcessAnalysisWindow(QMainWindow):
         self.spin_trace_len.setMinimum(1)
         self.spin_trace_len.setValue(2)
         h_short.addWidget(self.spin_trace_len)
+        self.lbl_preview_trace_len = QLabel()
+        h_short.addWidget(self.lbl_preview_trace_len)
 
         btn_trace_len_filter = QPushButton("筛选")
         btn_trace_len_filter.clicked.connect(self.filter_short_traces)
@@ -171,6 +212,8 @@ class ProcessAnalysisWindow(QMainWindow):
         self.spin_max_dur.setValue(0)
         h_dur.addWidget(QLabel("≤"))
         h_dur.addWidget(self.spin_max_dur)
+        self.lbl_preview_dur = QLabel()
+        h_dur.addWidget(self.lbl_preview_dur)
 
         btn_filter_dur = QPushButton("筛选")
         btn_filter_dur.clicked.connect(self.filter_by_trace_duration)
@@ -199,6 +242,35 @@ class ProcessAnalysisWindow(QMainWindow):
         layout_trace_time.addWidget(btn_trace_time_filter)
 
         adv_layout.addLayout(layout_trace_time)
+        self.lbl_preview_time = QLabel()
+        adv_layout.addWidget(self.lbl_preview_time)
+
+        # 事件时间窗口：拖动滑块平移窗口，窗口内事件数 / 完整流程数即时显示
+        layout_event_time = QHBoxLayout()
+        layout_event_time.addWidget(QLabel("事件时间窗口:"))
+        self.dt_start = QDateTimeEdit(default_time)
+        self.dt_start.setCalendarPopup(True)
+        layout_event_time.addWidget(self.dt_start)
+        layout_event_time.addWidget(QLabel("~"))
+        self.dt_end = QDateTimeEdit(default_time.addDays(30))
+        self.dt_end.setCalendarPopup(True)
+        layout_event_time.addWidget(self.dt_end)
+
+        btn_event_time_filter = QPushButton("筛选")
+        btn_event_time_filter.clicked.connect(self.filter_by_time_interval)
+        layout_event_time.addWidget(btn_event_time_filter)
+        adv_layout.addLayout(layout_event_time)
+
+        layout_time_scrub = QHBoxLayout()
+        self.slider_time_window = QSlider(Qt.Horizontal)
+        self.slider_time_window.setRange(0, 1000)
+        self.slider_time_window.valueChanged.connect(self.scrub_time_window)
+        layout_time_scrub.addWidget(self.slider_time_window)
+        self.lbl_time_window = QLabel()
+        layout_time_scrub.addWidget(self.lbl_time_window)
+        adv_layout.addLayout(layout_time_scrub)
+        for dt_edit in (self.dt_start, self.dt_end):
+            dt_edit.dateTimeChanged.connect(self.update_time_window_label)
 
         # 删除记录功能
         lbl_del = QLabel("删除记录条件：")
@@ -216,12 +288,12 @@ class ProcessAnalysisWindow(QMainWindow):
         layout_del.addWidget(self.cbo_del_col)
 
         self.cbo_del_op = QComboBox()
-        self.cbo_del_op.addItems(["==", "!=", ">", "<", ">=", "<="])
-        self.cbo_del_op.setFixedWidth(60)
+        self.cbo_del_op.addItems(UI_OPS)
+        self.cbo_del_op.setFixedWidth(80)
         layout_del.addWidget(self.cbo_del_op)
 
         self.edit_del_val = QLineEdit()
-        self.edit_del_val.setPlaceholderText("输入值")
+        self.edit_del_val.setPlaceholderText("输入值；in/between 用逗号分隔；表达式可用 AND / OR")
         layout_del.addWidget(self.edit_del_val)
 
         btn_del_apply = QPushButton("删除")
@@ -229,6 +301,21 @@ class ProcessAnalysisWindow(QMainWindow):
         layout_del.addWidget(btn_del_apply)
 
         adv_layout.addLayout(layout_del)
+        self.lbl_preview_del = QLabel()
+        adv_layout.addWidget(self.lbl_preview_del)
+
+        # 试运行预估：控件变化后防抖 150ms，只用按 case 预计算的统计量估算保留量，点击按钮才真正执行
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(150)
+        self._preview_timer.timeout.connect(self.update_filter_previews)
+        for spin in (self.freq_spin, self.spin_trace_len, self.spin_min_dur, self.spin_max_dur):
+            spin.valueChanged.connect(self._schedule_filter_preview)
+        for dt_edit in (self.dt_trace_start, self.dt_trace_end):
+            dt_edit.dateTimeChanged.connect(self._schedule_filter_preview)
+        for cbo in (self.cbo_del_level, self.cbo_del_col, self.cbo_del_op):
+            cbo.currentTextChanged.connect(self._schedule_filter_preview)
+        self.edit_del_val.textChanged.connect(self._schedule_filter_preview)
 
         # 包含起止事件筛选
         layout_contain_start_end = QHBoxLayout()
@@ -248,6 +335,39 @@ class ProcessAnalysisWindow(QMainWindow):
 
         adv_layout.addLayout(layout_contain_start_end)
 
+        # 变体筛选：前 N 个变体 / 按 case 覆盖率，基于变体前缀树
+        layout_variant_top = QHBoxLayout()
+        layout_variant_top.addWidget(QLabel("变体筛选:"))
+        self.cbo_variant_mode = QComboBox()
+        self.cbo_variant_mode.addItems(["前 N 个变体", "覆盖率 (%)"])
+        layout_variant_top.addWidget(self.cbo_variant_mode)
+        self.spin_variant_value = QSpinBox()
+        self.spin_variant_value.setRange(1, 1000000)
+        self.spin_variant_value.setValue(10)
+        layout_variant_top.addWidget(self.spin_variant_value)
+        self.lbl_preview_variant = QLabel()
+        layout_variant_top.addWidget(self.lbl_preview_variant)
+        btn_variant_top = QPushButton("筛选")
+        btn_variant_top.clicked.connect(self.filter_variants_top)
+        layout_variant_top.addWidget(btn_variant_top)
+        adv_layout.addLayout(layout_variant_top)
+
+        # 变体前缀：保留活动序列以指定前缀开头的 case
+        layout_variant_prefix = QHBoxLayout()
+        layout_variant_prefix.addWidget(QLabel("变体前缀:"))
+        self.edit_variant_prefix = QLineEdit()
+        self.edit_variant_prefix.setPlaceholderText("活动1 → 活动2 …（可用 → 或逗号分隔）")
+        layout_variant_prefix.addWidget(self.edit_variant_prefix)
+        self.lbl_preview_prefix = QLabel()
+        layout_variant_prefix.addWidget(self.lbl_preview_prefix)
+        btn_variant_prefix = QPushButton("筛选")
+        btn_variant_prefix.clicked.connect(self.filter_variant_prefix)
+        layout_variant_prefix.addWidget(btn_variant_prefix)
+        adv_layout.addLayout(layout_variant_prefix)
+        self.cbo_variant_mode.currentIndexChanged.connect(self._on_variant_controls_changed)
+        self.spin_variant_value.valueChanged.connect(self._on_variant_controls_changed)
+        self.edit_variant_prefix.textChanged.connect(self._on_variant_controls_changed)
+
         # ⑥ 活动合并按钮
         btn_merge_activity = QPushButton("活动合并")
         btn_merge_activity.clicked.connect(self.open_merge_activity_dialog)
@@ -263,9 +383,53 @@ class ProcessAnalysisWindow(QMainWindow):
         btn_remove_loops.clicked.connect(self.remove_self_loops)
         adv_layout.addWidget(btn_remove_loops)
 
+        # ⑧-2 活动去重：每个 trace 内同一活动只保留一次出现
+        layout_dedup = QHBoxLayout()
+        layout_dedup.addWidget(QLabel("活动去重：保留"))
+        self.cbo_dedup_keep = QComboBox()
+        self.cbo_dedup_keep.addItems(["第一次", "最后一次", "第 N 次"])
+        layout_dedup.addWidget(self.cbo_dedup_keep)
+        self.spin_dedup_nth = QSpinBox()
+        self.spin_dedup_nth.setRange(1, 999)
+        self.spin_dedup_nth.setValue(2)
+        self.spin_dedup_nth.setEnabled(False)
+        self.cbo_dedup_keep.currentTextChanged.connect(
+            lambda text: self.spin_dedup_nth.setEnabled(text == "第 N 次"))
+        layout_dedup.addWidget(self.spin_dedup_nth)
+        self.edit_dedup_activities = QLineEdit()
+        self.edit_dedup_activities.setPlaceholderText("仅这些活动（逗号分隔，留空为全部）")
+        layout_dedup.addWidget(self.edit_dedup_activities)
+        btn_dedup = QPushButton("去重")
+        btn_dedup.clicked.connect(self.dedup_activity_occurrences)
+        layout_dedup.addWidget(btn_dedup)
+        adv_layout.addLayout(layout_dedup)
+
+        # 会话切分：按实体列 + 不活跃间隔重新划分 case
+        layout_session = QHBoxLayout()
+        layout_session.addWidget(QLabel("会话切分：实体列"))
+        self.cbo_session_entity = QComboBox()
+        self.cbo_session_entity.setEditable(True)
+        self.cbo_session_entity.setInsertPolicy(QComboBox.NoInsert)
+        self.cbo_session_entity.addItem("case:concept:name")
+        layout_session.addWidget(self.cbo_session_entity)
+        layout_session.addWidget(QLabel("间隔超过"))
+        self.spin_session_gap = QSpinBox()
+        self.spin_session_gap.setRange(1, 10 ** 6)
+        self.spin_session_gap.setValue(30)
+        self.spin_session_gap.setSuffix(" 分钟")
+        layout_session.addWidget(self.spin_session_gap)
+        self.edit_session_start = QLineEdit()
+        self.edit_session_start.setPlaceholderText("会话起始活动（可选，逗号分隔）")
+        layout_session.addWidget(self.edit_session_start)
+        btn_session = QPushButton("切分会话")
+        btn_session.clicked.connect(self.sessionize_cases)
+        layout_session.addWidget(btn_session)
+        adv_layout.addLayout(layout_session)
+
         # ⑨ 已定义操作记录列表
         adv_layout.addWidget(QLabel("已定义的活动处理操作（可排序）:"))
         self.activity_ops = []
+        self.profiler = OpProfiler()  # 每个操作各阶段的耗时 / 行数 / 内存记录
         self.activity_ops_list = QListWidget()
         self.activity_ops_list.setDragDropMode(QListWidget.InternalMove)
         adv_layout.addWidget(self.activity_ops_list)
@@ -313,6 +477,55 @@ class ProcessAnalysisWindow(QMainWindow):
         adv_layout.addWidget(self.label_edge_slider)
         adv_layout.addWidget(self.slider_edge)
 
+        # 流程图显示模式：频次 / 性能（等待时间），切换时不重新布局
+        h_mode = QHBoxLayout()
+        h_mode.addWidget(QLabel("流程图显示模式："))
+        self.cbo_graph_mode = QComboBox()
+        self.cbo_graph_mode.addItem("频次", "frequency")
+        self.cbo_graph_mode.addItem("性能（等待时间）", "performance")
+        self.cbo_graph_mode.currentIndexChanged.connect(self.change_graph_mode)
+        h_mode.addWidget(self.cbo_graph_mode)
+        adv_layout.addLayout(h_mode)
+
+        # 时序漂移：按窗口逐段查看 DFG（布局固定），列出频次变化最大的边
+        drift_group = QGroupBox("时序漂移分析")
+        drift_layout = QVBoxLayout(drift_group)
+        h_drift = QHBoxLayout()
+        self.chk_drift = QCheckBox("按时间窗口查看")
+        self.chk_drift.toggled.connect(self.toggle_drift_mode)
+        h_drift.addWidget(self.chk_drift)
+        self.cbo_drift_window = QComboBox()
+        self.cbo_drift_window.addItems(["月", "周", "日"])
+        self.cbo_drift_window.currentIndexChanged.connect(self.refresh_drift)
+        h_drift.addWidget(self.cbo_drift_window)
+        btn_drift_prev = QPushButton("◀")
+        btn_drift_prev.setFixedWidth(30)
+        btn_drift_prev.clicked.connect(lambda: self.step_drift(-1))
+        h_drift.addWidget(btn_drift_prev)
+        btn_drift_next = QPushButton("▶")
+        btn_drift_next.setFixedWidth(30)
+        btn_drift_next.clicked.connect(lambda: self.step_drift(1))
+        h_drift.addWidget(btn_drift_next)
+        self.btn_drift_play = QPushButton("播放")
+        self.btn_drift_play.clicked.connect(self.toggle_drift_play)
+        h_drift.addWidget(self.btn_drift_play)
+        drift_layout.addLayout(h_drift)
+
+        self.slider_drift = QSlider(Qt.Horizontal)
+        self.slider_drift.setRange(0, 0)
+        self.slider_drift.valueChanged.connect(self.show_drift_window)
+        drift_layout.addWidget(self.slider_drift)
+        self.lbl_drift_window = QLabel("窗口: -")
+        drift_layout.addWidget(self.lbl_drift_window)
+        self.lst_drift_changes = QListWidget()
+        self.lst_drift_changes.setMaximumHeight(150)
+        drift_layout.addWidget(self.lst_drift_changes)
+        adv_layout.addWidget(drift_group)
+
+        self._drift_timer = QTimer(self)
+        self._drift_timer.setInterval(800)
+        self._drift_timer.timeout.connect(lambda: self.step_drift(1, wrap=True))
+
         layout_summary_time = QHBoxLayout()
 
         self.spin_time_value_1 = QSpinBox()
@@ -334,6 +547,11 @@ class ProcessAnalysisWindow(QMainWindow):
         layout_summary_time.addWidget(self.cbo_time_unit_2)
 
         adv_layout.addLayout(layout_summary_time)
+        # 统计窗口打开时，阈值变化只在缓存的持续时间数组上重新分箱
+        for spin in (self.spin_time_value_1, self.spin_time_value_2):
+            spin.valueChanged.connect(self.refresh_statistic_thresholds)
+        for cbo in (self.cbo_time_unit_1, self.cbo_time_unit_2):
+            cbo.currentIndexChanged.connect(self.refresh_statistic_thresholds)
 
         # --- 新增：生成统计指标按钮 ---
         btn_summary_stats = QPushButton("生成统计指标")
@@ -350,6 +568,41 @@ class ProcessAnalysisWindow(QMainWindow):
         btn_export_xes.clicked.connect(self.export_xes_file)
         adv_layout.addWidget(btn_export_xes)
 
+        # 追加新数据：只对新事件涉及的 case 重放操作链
+        btn_append = QPushButton("追加新数据…")
+        btn_append.clicked.connect(self.append_new_data)
+        adv_layout.addWidget(btn_append)
+
+        # 性能追踪：内存峰值开关 + 导出 Chrome Trace
+        h_trace = QHBoxLayout()
+        self.chk_trace_memory = QCheckBox("记录内存峰值（较慢）")
+        self.chk_trace_memory.toggled.connect(self.profiler.set_track_memory)
+        h_trace.addWidget(self.chk_trace_memory)
+        btn_export_trace = QPushButton("导出性能追踪")
+        btn_export_trace.clicked.connect(self.export_profile_trace)
+        h_trace.addWidget(btn_export_trace)
+        adv_layout.addLayout(h_trace)
+
+        # 抽样探索：在按 (变体, 开始月份) 分层抽取的部分 case 上交互，完成后再到完整日志上重放
+        h_sample = QHBoxLayout()
+        self.chk_sample = QCheckBox("抽样探索")
+        self.chk_sample.toggled.connect(self.toggle_sampling)
+        h_sample.addWidget(self.chk_sample)
+        self.spin_sample_pct = QSpinBox()
+        self.spin_sample_pct.setRange(1, 99)
+        self.spin_sample_pct.setValue(5)
+        self.spin_sample_pct.setSuffix(" %")
+        self.spin_sample_pct.editingFinished.connect(self.resample)
+        h_sample.addWidget(self.spin_sample_pct)
+        self.btn_full_replay = QPushButton("在完整日志上重放")
+        self.btn_full_replay.setEnabled(False)
+        self.btn_full_replay.clicked.connect(self.replay_on_full_log)
+        h_sample.addWidget(self.btn_full_replay)
+        adv_layout.addLayout(h_sample)
+        self._full_replay_timer = QTimer(self)
+        self._full_replay_timer.setInterval(200)
+        self._full_replay_timer.timeout.connect(self._poll_full_replay)
+
         adv_group.setLayout(adv_layout)
         control_layout.addWidget(adv_group)
         control_layout.addStretch()
@@ -384,7 +637,7 @@ class ProcessAnalysisWindow(QMainWindow):
             return
 
         try:
-            df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
+            df = self._current_dataframe()
 
             # ✅ 判断是否有活动频次低于阈值
             value_counts = df["concept:name"].value_counts()
@@ -395,13 +648,19 @@ class ProcessAnalysisWindow(QMainWindow):
                 return
 
             # ✅ 执行真正的过滤
-            df2 = filter_events_by_global_frequency(df, event_col="concept:name", min_freq=min_freq)
+            with self.profiler.phase("op:filter", rows_in=len(df)) as rec:
+                df2 = filter_events_by_global_frequency(df, event_col="concept:name", min_freq=min_freq)
+                rec["rows_out"] = len(df2)
 
             if df2.empty:
                 QMessageBox.warning(self, "无数据", "过滤后日志为空，请降低阈值。")
                 return
 
-            self.apply_dataframe_op(df2, f"过滤低频活动：{min_freq}")
+            # 抽样模式下阈值是样本中的频次：记下抽样倍数，重放到其它样本 / 完整日志时按比例换算
+            op = {"type": "filter", "threshold": min_freq}
+            if self._sample_scale:
+                op["scale"] = self._sample_scale
+            self.apply_dataframe_op(df2, f"过滤低频活动：{min_freq}", extra_op=op)
 
         except Exception as e:
             QMessageBox.critical(self, "过滤失败", str(e))
@@ -425,8 +684,91 @@ class ProcessAnalysisWindow(QMainWindow):
         act_percent = self.slider_act.value()
         edge_percent = self.slider_edge.value()
         self.graph_view.draw_from_event_log(self.current_log, act_percent=act_percent, edge_percent=edge_percent)
+        if self.chk_drift.isChecked():
+            self.refresh_drift()
 
-        self.update_summary()
+    # ────────────────────────────────────────────────────
+    # 时序漂移分析
+    # ────────────────────────────────────────────────────
+    def _temporal_dfg(self):
+        """
+        当前日志在所选窗口粒度下的逐窗口 DFG（按日志与粒度缓存）
+        """
+        freq = WINDOW_FREQS[self.cbo_drift_window.currentText()]
+        per_log = self._drift_cache.get(self.current_log)
+        if per_log is None:
+            per_log = {}
+            self._drift_cache.put(self.current_log, per_log)
+        if freq not in per_log:
+            preview = self._filter_preview()
+            df = preview.df if preview is not None and preview.df is not None else self._current_dataframe()
+            self.profiler.discard_pending()
+            per_log[freq] = TemporalDFG(df, freq)
+        return per_log[freq]
+
+    def toggle_drift_mode(self, checked):
+        if checked:
+            self.refresh_drift()
+        else:
+            self._drift_timer.stop()
+            self.btn_drift_play.setText("播放")
+            self.lst_drift_changes.clear()
+            self.lbl_drift_window.setText("窗口: -")
+            self.graph_view.clear_window()
+
+    def refresh_drift(self):
+        """日志或窗口粒度变化后重新定位窗口"""
+        if not self.chk_drift.isChecked() or self.current_log is None:
+            return
+        temporal = self._temporal_dfg()
+        last = max(len(temporal) - 1, 0)
+        self.slider_drift.blockSignals(True)
+        self.slider_drift.setRange(0, last)
+        self.slider_drift.setValue(min(self.slider_drift.value(), last))
+        self.slider_drift.blockSignals(False)
+        self.show_drift_window(self.slider_drift.value())
+
+    def show_drift_window(self, i):
+        if not self.chk_drift.isChecked():
+            return
+        temporal = self._temporal_dfg()
+        if len(temporal) == 0:
+            self.lbl_drift_window.setText("窗口: 无有效时间")
+            return
+        self.graph_view.show_window(temporal.dfg(i), temporal.activity_counts(i))
+        self.lbl_drift_window.setText(f"窗口: {temporal.label(i)}（{i + 1}/{len(temporal)}）")
+
+        self.lst_drift_changes.clear()
+        for src, tgt, before, after in temporal.edge_changes(i):
+            self.lst_drift_changes.addItem(f"{src} → {tgt}: {before} → {after}（{after - before:+d}）")
+
+    def step_drift(self, delta, wrap=False):
+        if not self.chk_drift.isChecked():
+            self.chk_drift.setChecked(True)
+        target = self.slider_drift.value() + delta
+        if wrap and target > self.slider_drift.maximum():
+            target = 0
+        self.slider_drift.setValue(max(0, min(target, self.slider_drift.maximum())))
+
+    def toggle_drift_play(self):
+        if self._drift_timer.isActive():
+            self._drift_timer.stop()
+            self.btn_drift_play.setText("播放")
+        else:
+            if not self.chk_drift.isChecked():
+                self.chk_drift.setChecked(True)
+            self._drift_timer.start()
+            self.btn_drift_play.setText("暂停")
+
+    def change_graph_mode(self):
+        """
+        在频次 / 性能模式间切换流程图标注
+        """
+        mode = self.cbo_graph_mode.currentData()
+        try:
+            self.graph_view.set_display_mode(mode)
+        except Exception as e:
+            QMessageBox.critical(self, "切换失败", str(e))
 
     def undo_last_change(self):
         if self.activity_ops_history and self.log_history:
@@ -458,17 +800,20 @@ class ProcessAnalysisWindow(QMainWindow):
         else:
             QMessageBox.information(self, "提示", "没有可以重做的操作。")
 
-    def update_dataset_preview(self):
+    def update_dataset_preview(self, df=None):
         """
         将 current_log 转回 DataFrame 并显示前 visible_rows 行，
         同时把内部列名(case:concept:name / concept:name / time:timestamp)
         还原成用户在预处理阶段看到的原列名。
+        df 为已在手的 current_log 对应 DataFrame 时（增量追加）不再转换。
         """
         if self.current_log is None:
             return
 
         # 拿到 PM4Py DataFrame
-        df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
+        if df is None:
+            df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
+        self.update_summary(df)
         if df.empty:
             self.dataset_table.clear()
             return
@@ -480,7 +825,6 @@ class ProcessAnalysisWindow(QMainWindow):
         self._dataset_df = df.reset_index(drop=True)
         self.visible_rows = 20
         self._refresh_dataset_table()
-        self.update_summary()
 
         # ✅ 更新组合删除功能的活动下拉框（带模糊搜索）
         if hasattr(self, "cbo_comb_start"):
@@ -536,6 +880,11 @@ class ProcessAnalysisWindow(QMainWindow):
             self.cbo_del_col.addItems(friendly_cols)
             self.cbo_del_col.addItems(df.columns.astype(str).tolist())
             self.cbo_del_col.blockSignals(False)
+        if hasattr(self, "cbo_session_entity"):
+            entity = self.cbo_session_entity.currentText()
+            self.cbo_session_entity.clear()
+            self.cbo_session_entity.addItems(df.columns.astype(str).tolist())
+            self.cbo_session_entity.setCurrentText(entity)
 
     def _refresh_dataset_table(self):
         df = getattr(self, "_dataset_df", None)
@@ -553,6 +902,9 @@ class ProcessAnalysisWindow(QMainWindow):
         df_display = df[final_cols]
 
         nrows = min(self.visible_rows, len(df_display))
+        df_display = df_display.iloc[:nrows]
+        if self._effective_case_labels() is not None:
+            df_display = df_display.assign(**{"case:concept:name": self.case_label(df_display["case:concept:name"])})
         self.dataset_table.setRowCount(nrows)
         self.dataset_table.setColumnCount(len(df_display.columns))
 
@@ -574,6 +926,25 @@ class ProcessAnalysisWindow(QMainWindow):
 
         self.dataset_table.resizeColumnsToContents()
 
+    def _effective_case_labels(self):
+        """
+        current_log 的 case id 对应的可读标签数组；单列 case 时为 None。
+        会话切分（最后一次重置之后）重新编号了 case，组合键标签不再适用，同样为 None
+        """
+        from incremental_log import active_ops
+
+        if self.case_labels is None or any(op["type"] == "sessionize" for op in active_ops(self.activity_ops)):
+            return None
+        return self.case_labels
+
+    def case_label(self, case_ids):
+        """case id（组合键）→ 可读标签；无可用标签时原样返回"""
+        labels = self._effective_case_labels()
+        if labels is None:
+            return case_ids
+        import numpy as np
+        return labels[np.asarray(case_ids, dtype=np.int64)]
+
     def load_more_rows(self):
         """滚动到底时动态加载更多行"""
         scroll_bar = self.dataset_table.verticalScrollBar()
@@ -771,6 +1142,8 @@ class ProcessAnalysisWindow(QMainWindow):
                     desc = f"聚合 {target}（保留 {strategy}）字段：{field_str}"
             elif op["type"] == "filter":
                 desc = f"过滤频次 < {op['threshold']}"
+                if op.get("scale"):
+                    desc += f"（样本频次，完整日志约 < {filter_threshold(op):.0f}）"
             elif op["type"] == "filter_start_end":
                 desc = f"起止事件筛选（起={op.get('start') or '-'}，终={op.get('end') or '-'})"
             elif op["type"] == "reset":
@@ -793,9 +1166,23 @@ class ProcessAnalysisWindow(QMainWindow):
             elif op["type"] == "remove_self_loops":
                 strat = op.get("strategy", "first")
                 desc = "清除自循环片段（保留首次）" if strat == "first" else "清除自循环片段（保留最后）"
+            elif op["type"] == "dedup":
+                desc = self._dedup_op_desc(op)
+            elif op["type"] == "sessionize":
+                desc = self._sessionize_op_desc(op)
             elif op["type"] == "delete_condition":
                 level = op.get("level", "事件级")
-                desc = f"删除{'事件' if level == '事件级' else '流程'}中满足 {op['col']} {op['op']} {op['val']} 的记录"
+                if op["op"] == "表达式":
+                    cond = op["val"]
+                elif op["op"] in UNARY_OPS:
+                    cond = f"{op['col']} {op['op']}"
+                else:
+                    cond = f"{op['col']} {op['op']} {op['val']}"
+                desc = f"删除{'事件' if level == '事件级' else '流程'}中满足 {cond} 的记录"
+            elif op["type"] == "filter_time_window":
+                desc = f"时间区间筛选[{op.get('start')}~{op.get('end')}]"
+            elif op["type"] in ("filter_variant_top", "filter_variant_prefix", "filter_variant_set"):
+                desc = self._variant_op_desc(op)
             elif op["type"] == "filter_contain_order":
                 desc = f"包含起止事件筛选（{op.get('start') or '-'} → {op.get('end') or '-'})"
 
@@ -806,87 +1193,321 @@ class ProcessAnalysisWindow(QMainWindow):
             item.setData(Qt.UserRole, op)  # ✅ 绑定原始操作对象
             self.activity_ops_list.addItem(item)
 
+        self._prune_profiler()
+        self._refresh_ops_timing()
+
+    def _prune_profiler(self):
+        """丢弃已不在操作列表（及重做栈）中的操作的耗时记录"""
+        live = list(self.activity_ops)
+        for ops, _ in self.redo_stack:
+            live.extend(ops)
+        self.profiler.prune(live)
+
+    def _refresh_ops_timing(self):
+        """
+        在操作列表中显示每个操作最近一次执行的耗时（tooltip 为分阶段明细）
+        """
+        for i in range(min(self.activity_ops_list.count(), len(self.activity_ops))):
+            item = self.activity_ops_list.item(i)
+            op = self.activity_ops[i]
+            desc = item.text().split("  ⏱", 1)[0]
+            if self.profiler.phases_for(op):
+                desc += f"  ⏱ {self.profiler.total_seconds(op):.2f}s"
+            item.setText(desc)
+            item.setToolTip(self.profiler.summary_text(op))
+
+    def _current_dataframe(self):
+        """
+        将 current_log 转为 DataFrame（记为 to_data_frame 阶段）
+        """
+        self.profiler.discard_pending()  # 上一次未提交（被中途取消）的阶段不再归属
+        with self.profiler.phase("to_data_frame") as rec:
+            df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
+            rec["rows_out"] = len(df)
+        return df
+
+    def _commit_op_profile(self, op, append=False):
+        self.profiler.commit(op, append=append)
+        self._refresh_ops_timing()
+
+    def export_profile_trace(self):
+        """
+        导出操作耗时记录为 Chrome Trace JSON（chrome://tracing / Perfetto 可打开）
+        """
+        save_path, _ = QFileDialog.getSaveFileName(self, "导出性能追踪", os.getcwd(), "Chrome Trace (*.json)")
+        if not save_path:
+            return
+        if not save_path.lower().endswith(".json"):
+            save_path += ".json"
+        try:
+            self.profiler.export_chrome_trace(save_path)
+            QMessageBox.information(self, "导出成功", f"已导出性能追踪：\n{save_path}")
+        except Exception as e:
+            QMessageBox.critical(self, "导出失败", str(e))
+
     def reapply_activity_ops(self):
         from pm4py.objects.conversion.log import converter as log_converter
 
-        df = log_converter.apply(self.original_log, variant=log_converter.Variants.TO_DATA_FRAME)
+        # 先丢弃之前未归属的阶段；原始日志的转换随后与第一个操作一起提交，计入其耗时
+        self.profiler.discard_pending()
+        with self.profiler.phase("to_data_frame") as rec:
+            df = log_converter.apply(self.original_log, variant=log_converter.Variants.TO_DATA_FRAME)
+            rec["rows_out"] = len(df)
 
         for op in self.activity_ops:
-            if op["type"] == "reset":
-                df = log_converter.apply(self.original_log, variant=log_converter.Variants.TO_DATA_FRAME)
-            elif op["type"] == "filter":
-                from cpa_utils import filter_events_by_global_frequency
-                df = filter_events_by_global_frequency(df, event_col="concept:name", min_freq=op["threshold"])
-            elif op["type"] == "merge":
-                df = df.copy()
-                from cpa_utils import merge_activities_in_dataframe
-                df = merge_activities_in_dataframe(df, op["activities"], op["target"])
-            elif op["type"] == "aggregate":
-                from cpa_utils import aggregate_activity_occurrences
-                df = aggregate_activity_occurrences(
-                    df,
-                    target_activity=op["activities"][0],
-                    keep=op["strategy"],
-                    timestamp_col="time:timestamp",
-                    agg_fields=op.get("fields"),
-                    new_col=op.get("new_col", None)  # ✅ 支持写入新列
-                )
-            elif op["type"] == "filter_start_end":
-                from cpa_utils import filter_incomplete_traces
-                df = filter_incomplete_traces(
-                    df,
-                    start_event=op.get("start"),
-                    end_event=op.get("end"),
-                    mode=op.get("mode", "不同时满足起止")
-                )
-            elif op["type"] == "filter_short_trace":
-                trace_counts = df['case:concept:name'].value_counts()
-                keep_cases = trace_counts[trace_counts >= op["min_len"]].index
-                df = df[df['case:concept:name'].isin(keep_cases)].copy()
-            elif op["type"] == "filter_duration":
-                dur = df.groupby('case:concept:name')['time:timestamp'].agg(
-                    lambda x: (x.max() - x.min()).total_seconds()
-                )
-                keep_cases = dur[(dur >= op["min_sec"]) & (dur <= op["max_sec"])].index
-                df = df[df['case:concept:name'].isin(keep_cases)].copy()
-            elif op["type"] == "remove_self_loops":
-                from cpa_utils import remove_consecutive_self_loops
-                df = remove_consecutive_self_loops(
-                    df,
-                    case_col="case:concept:name",
-                    act_col="concept:name",
-                    time_col="time:timestamp",
-                    keep=op.get("strategy", "first")
-                )
-            elif op["type"] == "delete_condition":
-                col = op["col"]
-                operator = op["op"]
-                val = op["val"]
-                level = op.get("level", "事件级")
+            with self.profiler.phase(f"op:{op['type']}", rows_in=len(df)) as rec:
+                df = self._apply_activity_op(df, op)
+                rec["rows_out"] = len(df)
+            self.profiler.commit(op)
 
-                try:
-                    val_eval = eval(val, {}, {})
-                except:
-                    val_eval = val.strip("'\"")
+        df["lifecycle:transition"] = "complete"
+        with self.profiler.phase("to_event_log", rows_in=len(df)):
+            new_log = log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
+        self._register_summary(new_log, df)
+        self.current_log = new_log
+        with self.profiler.phase("update_graph"):
+            self.update_graph_with_filter()
+        with self.profiler.phase("update_preview", rows_in=len(df)):
+            self.update_dataset_preview()
+        self._commit_op_profile(self.activity_ops[-1] if self.activity_ops else None, append=True)
 
-                expr = f"`{col}` {operator} @val_eval"
+    def _apply_activity_op(self, df, op, source_log=None, scale=None):
+        """
+        在 DataFrame 上执行单个操作记录，返回新的 DataFrame
+        source_log 为 “重置” 回到的日志，默认 original_log（后台完整重放时传入完整日志）
+        scale 为 df 所属日志的抽样倍数（完整日志为 1），默认取当前样本的倍数，用于换算频次阈值
+        """
+        from pm4py.objects.conversion.log import converter as log_converter
 
-                if level == "事件级":
-                    df = df.query(f"not ({expr})", local_dict={"val_eval": val_eval})
-                else:  # 流程级
-                    match_cases = df.query(expr, local_dict={"val_eval": val_eval})["case:concept:name"].unique()
-                    df = df[~df["case:concept:name"].isin(match_cases)]
+        if op["type"] == "reset":
+            df = log_converter.apply(source_log if source_log is not None else self.original_log,
+                                     variant=log_converter.Variants.TO_DATA_FRAME)
+        elif op["type"] == "filter":
+            from cpa_utils import filter_events_by_global_frequency
+            if scale is None:
+                scale = self._sample_scale or 1.0
+            df = filter_events_by_global_frequency(df, event_col="concept:name",
+                                                   min_freq=filter_threshold(op, scale))
+        elif op["type"] == "merge":
+            df = df.copy()
+            from cpa_utils import merge_activities_in_dataframe
+            df = merge_activities_in_dataframe(df, op["activities"], op["target"])
+        elif op["type"] == "aggregate":
+            from cpa_utils import aggregate_activity_occurrences
+            df = aggregate_activity_occurrences(
+                df,
+                target_activity=op["activities"][0],
+                keep=op["strategy"],
+                timestamp_col="time:timestamp",
+                agg_fields=op.get("fields"),
+                new_col=op.get("new_col", None)  # ✅ 支持写入新列
+            )
+        elif op["type"] == "filter_start_end":
+            from cpa_utils import filter_incomplete_traces
+            df = filter_incomplete_traces(
+                df,
+                start_event=op.get("start"),
+                end_event=op.get("end"),
+                mode=op.get("mode", "不同时满足起止")
+            )
+        elif op["type"] == "filter_short_trace":
+            trace_counts = df['case:concept:name'].value_counts()
+            keep_cases = trace_counts[trace_counts >= op["min_len"]].index
+            df = df[df['case:concept:name'].isin(keep_cases)].copy()
+        elif op["type"] == "filter_duration":
+            from cpa_utils import filter_traces_by_duration
+            df = filter_traces_by_duration(df, op["min_sec"], op["max_sec"])
+        elif op["type"] == "remove_self_loops":
+            from cpa_utils import remove_consecutive_self_loops
+            df = remove_consecutive_self_loops(
+                df,
+                case_col="case:concept:name",
+                act_col="concept:name",
+                time_col="time:timestamp",
+                keep=op.get("strategy", "first")
+            )
+        elif op["type"] == "dedup":
+            from cpa_utils import dedup_occurrences
+            df = dedup_occurrences(df, keep=op["keep"], activities=op.get("activities"),
+                                   agg_fields=op.get("agg_fields"))
+        elif op["type"] == "sessionize":
+            import cpa_pm_preprocessing as pp
+            df = pp.sessionize(df, op["entity_col"], op["gap_sec"],
+                               start_activities=op.get("start_activities"))
+        elif op["type"] == "delete_condition":
+            # 条件在第一次执行时编译并缓存在 op 上，重放只做一次掩码计算
+            df = apply_delete_condition(df, mask_for_op(op, df), op.get("level", "事件级"))
+
+        elif op["type"] in ("filter_variant_top", "filter_variant_prefix", "filter_variant_set"):
+            df = filter_by_variants(df, op)
+
+        elif op["type"] == "filter_time_window":
+            df = df[event_window_mask(df["time:timestamp"], op.get("start"), op.get("end"))]
+
+        elif op["type"] == "filter_contain_order":
+            from cpa_utils import filter_traces_containing_start_end
+            df = filter_traces_containing_start_end(df, start_event=op.get("start"), end_event=op.get("end"))
+        return df
 
-            elif op["type"] == "filter_contain_order":
-                from cpa_utils import filter_traces_containing_start_end
-                df = filter_traces_containing_start_end(df, start_event=op.get("start"), end_event=op.get("end"))
 
-        df["lifecycle:transition"] = "complete"
-        self.current_log = log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
-        self.update_graph_with_filter()
-        self.update_dataset_preview()
+    # ────────────────────────────────────────────────────
+    # 抽样模式
+    # ────────────────────────────────────────────────────
+    def toggle_sampling(self, checked):
+        if checked:
+            self.resample()
+        elif self._full_log is not None:
+            # 关闭抽样 = 在完整日志上重放当前操作，后台完成后再切换
+            self.replay_on_full_log()
+
+    def resample(self):
+        """
+        按当前比例从完整日志分层抽样（变体 × 开始月份），以样本作为 original_log 重放已有操作
+        """
+        from cpa_utils import stratified_case_sample
 
+        if not self.chk_sample.isChecked():
+            return
+        if self._full_replay_thread is not None:
+            QMessageBox.information(self, "提示", "正在后台重放完整日志，请稍候。")
+            return
+        fraction = self.spin_sample_pct.value() / 100
+        if self._full_log is not None and fraction == self._sample_fraction:
+            return
+        full_log = self._full_log if self._full_log is not None else self.original_log
+        try:
+            df = log_converter.apply(full_log, variant=log_converter.Variants.TO_DATA_FRAME)
+            sample = stratified_case_sample(df, fraction, seed=SAMPLE_SEED)
+            n_full = df["case:concept:name"].nunique()
+            n_sample = sample["case:concept:name"].nunique()
+            sample_log = log_converter.apply(sample, variant=log_converter.Variants.TO_EVENT_LOG)
+        except Exception as e:
+            if self._full_log is None:
+                self.chk_sample.blockSignals(True)
+                self.chk_sample.setChecked(False)
+                self.chk_sample.blockSignals(False)
+            QMessageBox.critical(self, "抽样失败", str(e))
+            return
+
+        self._full_log = full_log
+        self._sample_fraction = fraction
+        self._sample_scale = n_full / max(n_sample, 1)
+        self.original_log = sample_log
+        self._clear_history()
+        self._update_sample_label()
+        self.reapply_activity_ops()
+
+    def _clear_history(self):
+        """样本 / 完整日志切换后，撤销栈中的日志属于另一份数据，一并清空"""
+        self.log_history.clear()
+        self.activity_ops_history.clear()
+        self.redo_stack.clear()
+        self._prune_profiler()
+
+    def _update_sample_label(self):
+        sampling = self._full_log is not None
+        replaying = self._full_replay_thread is not None
+        self.btn_full_replay.setEnabled(sampling and not replaying)
+        self.setWindowTitle("流程图分析与交互控制（抽样估计）" if sampling else "流程图分析与交互控制")
+        if not sampling:
+            self.lbl_sample_mode.hide()
+            return
+        text = f"抽样 {self._sample_fraction:.0%} 的流程：流程图、概况与统计均为估计值"
+        if replaying:
+            text += "（完整日志重放中…）"
+        self.lbl_sample_mode.setText(text)
+        self.lbl_sample_mode.show()
+
+    def replay_on_full_log(self):
+        """在后台线程中把当前操作列表重放到完整日志上；完成后退出抽样模式"""
+        import threading
+
+        if self._full_log is None:
+            QMessageBox.information(self, "提示", "当前不是抽样模式，操作已作用于完整日志。")
+            return
+        if self._full_replay_thread is not None:
+            return
+        # 按样本排名保留前 k 个变体的操作无法换算：完整日志中同样保留 k 个，覆盖的流程比例可能不同
+        top_k = [op for op in self.activity_ops if op["type"] == "filter_variant_top" and op.get("coverage") is None]
+        if top_k and QMessageBox.question(
+                self, "按数量保留变体",
+                f"操作列表中有 {len(top_k)} 个“保留前 k 个变体”操作：k 是在样本上选定的，"
+                "完整日志的变体更多，保留的流程比例会与样本不同（按覆盖率保留则不受影响）。仍要重放吗？"
+        ) != QMessageBox.Yes:
+            self.chk_sample.blockSignals(True)
+            self.chk_sample.setChecked(True)
+            self.chk_sample.blockSignals(False)
+            return
+        self._full_replay_result = None
+        self._full_replay_thread = threading.Thread(
+            target=self._full_replay_worker, args=(self._full_log, list(self.activity_ops)),
+            name="cpa-pm-full-replay", daemon=True)
+        self._full_replay_thread.start()
+        self.btn_full_replay.setText("完整日志重放中…")
+        self._update_sample_label()
+        self._full_replay_timer.start()
+
+    def _full_replay_worker(self, full_log, ops):
+        """后台线程：只做数据计算，不访问任何界面控件；结果交给 _poll_full_replay 在主线程应用"""
+        try:
+            df = log_converter.apply(full_log, variant=log_converter.Variants.TO_DATA_FRAME)
+            for op in ops:
+                df = self._apply_activity_op(df, op, source_log=full_log, scale=1.0)
+            if df.empty:
+                # 结果为空时不转换，由 _poll_full_replay 拒绝应用
+                self._full_replay_result = (ops, df, None, None, None)
+                return
+            df["lifecycle:transition"] = "complete"
+            new_log = log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
+            summary = LogSummary.from_dataframe(df)
+            self._full_replay_result = (ops, df, new_log, summary, None)
+        except Exception as e:
+            self._full_replay_result = (ops, None, None, None, e)
+
+    def _poll_full_replay(self):
+        if self._full_replay_thread is None or self._full_replay_thread.is_alive():
+            return
+        self._full_replay_timer.stop()
+        self._full_replay_thread = None
+        ops, df, new_log, summary, error = self._full_replay_result
+        self._full_replay_result = None
+        self.btn_full_replay.setText("在完整日志上重放")
+
+        stale = [id(op) for op in ops] != [id(op) for op in self.activity_ops]
+        empty = error is None and df.empty
+        if error is not None or stale or empty:
+            # 仍停留在抽样模式
+            self.chk_sample.blockSignals(True)
+            self.chk_sample.setChecked(True)
+            self.chk_sample.blockSignals(False)
+            self._update_sample_label()
+            if error is not None:
+                QMessageBox.critical(self, "完整日志重放失败", str(error))
+            elif stale:
+                QMessageBox.warning(self, "结果已丢弃", "重放期间操作列表发生了变化，请再次在完整日志上重放。")
+            else:
+                QMessageBox.warning(self, "无数据", "在完整日志上重放后结果为空，仍保留抽样结果，请检查操作设置。")
+            return
 
+        self.original_log = self._full_log
+        self._full_log = None
+        self._sample_fraction = None
+        self._sample_scale = None
+        self.chk_sample.blockSignals(True)
+        self.chk_sample.setChecked(False)
+        self.chk_sample.blockSignals(False)
+        self._clear_history()
+
+        self.log_version += 1
+        summary.version = self.log_version
+        self._summary_cache.put(new_log, summary)
+        self.current_log = new_log
+        self._update_sample_label()
+        self.update_graph_with_filter()
+        self.update_dataset_preview()
+        note = "；低频过滤的阈值由样本频次按抽样倍数换算" if any(
+            op["type"] == "filter" and op.get("scale") for op in ops) else ""
+        QMessageBox.information(self, "重放完成", f"已在完整日志上重放 {len(ops)} 个操作，结果为精确值{note}。")
 
     def open_aggregate_activity_dialog(self):
         from aggregate_activity_dialog import AggregateActivityDialog
@@ -922,47 +1543,64 @@ class ProcessAnalysisWindow(QMainWindow):
     # ────────────────────────────────────────────────────
     # 顶部四个概况标签：记录数 / 流程数 / 活动数 / 变体数
     # ────────────────────────────────────────────────────
-    def update_summary(self):
+    def update_summary(self, df=None):
         """
         刷新概况显示
         records   : 当前 DataFrame 行数
         traces    : case:concept:name（流程）唯一值个数
         activities: concept:name 唯一值个数
         variants  : 排序后事件序列去重个数
-        """
-        df = log_converter.apply(
-            self.current_log,
-            variant=log_converter.Variants.TO_DATA_FRAME
-        )
-
-        # ① 记录数（rows）
-        num_records = len(df)
-
-        # ② 流程数（trace 数）
-        num_traces = df['case:concept:name'].nunique()
 
-        # ③ 活动数（事件类型）
-        num_activities = df['concept:name'].nunique()
-
-        # ④ 变体数（唯一的事件序列）
-        num_variants = (
-            df.sort_values(['case:concept:name', 'time:timestamp'])
-              .groupby('case:concept:name')['concept:name']
-              .apply(tuple)
-              .nunique()
-        )
+        概况按日志版本缓存：同一日志只计算一次，df 已在手时直接复用，避免再次转换
+        """
+        summary = self._summary_cache.get(self.current_log)
+        if summary is None:
+            if df is None:
+                df = log_converter.apply(
+                    self.current_log,
+                    variant=log_converter.Variants.TO_DATA_FRAME
+                )
+            self.log_version += 1
+            summary = LogSummary.from_dataframe(df, version=self.log_version)
+            self._summary_cache.put(self.current_log, summary)
+        if df is not None and self._preview_cache.get(self.current_log) is None:
+            self._preview_cache.put(self.current_log, FilterPreview(summary, df))
+
+        # 更新 4 个 QLabel；抽样模式下记录数 / 流程数按抽样比例换算为估计值，
+        # 活动数 / 变体数是去重计数，无法换算，只标明为样本中的值
+        scale = self._sample_scale
+        if scale:
+            self.lbl_summary_events.setText(f"记录数 ≈ {round(summary.num_records * scale)}（估计）")
+            self.lbl_summary_traces.setText(f"流程数 ≈ {round(summary.num_traces * scale)}（估计）")
+            self.lbl_summary_activities.setText(f"活动数（样本）: {summary.num_activities}")
+            self.lbl_summary_variants.setText(f"变体数（样本）: {summary.num_variants}")
+        else:
+            self.lbl_summary_events.setText(f"记录数: {summary.num_records}")
+            self.lbl_summary_traces.setText(f"流程数: {summary.num_traces}")
+            self.lbl_summary_activities.setText(f"活动数: {summary.num_activities}")
+            self.lbl_summary_variants.setText(f"变体数: {summary.num_variants}")
+        self._schedule_filter_preview()
 
-        # 更新 4 个 QLabel
-        self.lbl_summary_events.setText(f"记录数: {num_records}")
-        self.lbl_summary_traces.setText(f"流程数: {num_traces}")
-        self.lbl_summary_activities.setText(f"活动数: {num_activities}")
-        self.lbl_summary_variants.setText(f"变体数: {num_variants}")
+    def _register_summary(self, new_log, df, case_level=False):
+        """
+        为即将成为 current_log 的新日志登记概况：
+        case_level=True 表示 df 只是上一版本删除了若干整条 trace，直接减去被删 case 的贡献
+        """
+        prev = self._summary_cache.get(self.current_log)
+        self.log_version += 1
+        if case_level and prev is not None:
+            summary = prev.keep_cases(df["case:concept:name"].unique(), version=self.log_version)
+        else:
+            summary = LogSummary.from_dataframe(df, version=self.log_version)
+        self._summary_cache.put(new_log, summary)
 
-    def apply_dataframe_op(self, df, desc, extra_op=None):
+    def apply_dataframe_op(self, df, desc, extra_op=None, case_level=False):
         from pm4py.objects.conversion.log import converter as log_converter
 
         df['lifecycle:transition'] = 'complete'
-        new_log = log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
+        with self.profiler.phase("to_event_log", rows_in=len(df)):
+            new_log = log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
+        self._register_summary(new_log, df, case_level)
 
         self.log_history.append(self.current_log)
         self.activity_ops_history.append(self.activity_ops.copy())
@@ -976,8 +1614,11 @@ class ProcessAnalysisWindow(QMainWindow):
             self.activity_ops.append({'type': 'custom', 'desc': desc})
 
         self.update_activity_ops_list()
-        self.update_graph_with_filter()
-        self.update_dataset_preview()
+        with self.profiler.phase("update_graph"):
+            self.update_graph_with_filter()
+        with self.profiler.phase("update_preview", rows_in=len(df)):
+            self.update_dataset_preview()
+        self._commit_op_profile(self.activity_ops[-1])
 
     def delete_incomplete_traces(self):
         from cpa_utils import filter_incomplete_traces
@@ -991,30 +1632,94 @@ class ProcessAnalysisWindow(QMainWindow):
             QMessageBox.warning(self, "提示", "请至少选择起始或结束事件。")
             return
 
-        df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
-        df2 = filter_incomplete_traces(
-            df,
-            start_event=start_ev or None,
-            end_event=end_ev or None,
-            mode=mode
-        )
+        df = self._current_dataframe()
+        with self.profiler.phase("op:filter_start_end", rows_in=len(df)) as rec:
+            df2 = filter_incomplete_traces(
+                df,
+                start_event=start_ev or None,
+                end_event=end_ev or None,
+                mode=mode
+            )
+            rec["rows_out"] = len(df2)
 
         if df2.empty:
             QMessageBox.warning(self, "无数据", "过滤后为空，请检查起止事件。")
             return
 
         desc = f"删除不完整 trace（模式：{mode}，起始={start_ev}，结束={end_ev}）"
-        self.apply_dataframe_op(df2, desc)
+        self.apply_dataframe_op(df2, desc, case_level=True)
 
 
     def filter_by_time_interval(self):
+        """
+        只保留时间落在 [开始, 结束] 内的事件（通过时间索引二分定位，不做整列比较）
+        """
         start = self.dt_start.dateTime().toPyDateTime()
-        end   = self.dt_end.dateTime().toPyDateTime()
-        df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
-        df2 = df[(df['time:timestamp']>=start)&(df['time:timestamp']<=end)].copy()
-        self.apply_dataframe_op(df2, f"时间区间筛选[{start}~{end}]")
+        end = self.dt_end.dateTime().toPyDateTime()
+        if start > end:
+            QMessageBox.warning(self, "输入有误", "开始时间不能晚于结束时间")
+            return
+
+        df = self._current_dataframe()
+        with self.profiler.phase("op:filter_time_window", rows_in=len(df)) as rec:
+            rows = self._time_index(df).event_window_rows(start, end)
+            df2 = df.iloc[rows].copy()
+            rec["rows_out"] = len(df2)
 
+        if df2.empty:
+            QMessageBox.warning(self, "无数据", "该时间窗口内没有事件。")
+            return
 
+        fmt = "%Y-%m-%d %H:%M:%S"
+        self.apply_dataframe_op(df2, f"时间区间筛选[{start:{fmt}}~{end:{fmt}}]", extra_op={
+            "type": "filter_time_window",
+            "start": start.strftime(fmt),
+            "end": end.strftime(fmt)
+        })
+
+    def _time_index(self, df=None):
+        """
+        当前日志的时间索引（每个日志版本构建一次）；df 须为 current_log 的转换结果
+        """
+        index = self._time_index_cache.get(self.current_log)
+        if index is None:
+            if df is None:
+                preview = self._filter_preview()
+                df = preview.df if preview is not None and preview.df is not None else self._current_dataframe()
+                self.profiler.discard_pending()
+            index = TimeIndex(df)
+            self._time_index_cache.put(self.current_log, index)
+        return index
+
+    def scrub_time_window(self, pos):
+        """
+        滑块位置 → 窗口起点：保持当前窗口长度，在日志时间范围内平移
+        """
+        index = self._time_index()
+        if index.min_ns is None:
+            return
+        start = self.dt_start.dateTime().toPyDateTime()
+        end = self.dt_end.dateTime().toPyDateTime()
+        width = max(pd.Timedelta(end - start).value, 0)
+        span = max(index.max_ns - index.min_ns - width, 0)
+        new_start = from_ns(index.min_ns + span * pos // self.slider_time_window.maximum())
+        for dt_edit, value in ((self.dt_start, new_start), (self.dt_end, new_start + pd.Timedelta(width))):
+            dt_edit.blockSignals(True)
+            dt_edit.setDateTime(QDateTime(value.to_pydatetime()))
+            dt_edit.blockSignals(False)
+        self.update_time_window_label()
+
+    def update_time_window_label(self, *_):
+        if self.current_log is None:
+            return
+        index = self._time_index()
+        start = self.dt_start.dateTime().toPyDateTime()
+        end = self.dt_end.dateTime().toPyDateTime()
+        events = index.event_window_count(start, end)
+        traces = index.trace_window_count(start, end)
+        self.lbl_time_window.setText(
+            f"窗口内 {events:,}/{len(index.event_ns):,} 事件，完整流程 {traces:,}/{len(index.case_ids):,}"
+        )
 
     def filter_by_start_end_events(self):
         from cpa_utils import filter_incomplete_traces
@@ -1027,15 +1732,17 @@ class ProcessAnalysisWindow(QMainWindow):
             QMessageBox.warning(self, "提示", "请至少选择起始或结束事件。")
             return
 
-        df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
+        df = self._current_dataframe()
         mode = "不同时满足起止" if (start_ev and end_ev) else ("不以起始事件开头" if start_ev else "不以结束事件结尾")
 
-        df2 = filter_incomplete_traces(
-            df,
-            start_event=start_ev or None,
-            end_event=end_ev or None,
-            mode=mode
-        )
+        with self.profiler.phase("op:filter_start_end", rows_in=len(df)) as rec:
+            df2 = filter_incomplete_traces(
+                df,
+                start_event=start_ev or None,
+                end_event=end_ev or None,
+                mode=mode
+            )
+            rec["rows_out"] = len(df2)
 
         if df2.empty:
             QMessageBox.warning(self, "无数据", "筛选后为空，请检查设置。")
@@ -1053,7 +1760,7 @@ class ProcessAnalysisWindow(QMainWindow):
         self.update_activity_ops_list()
 
         # ✅ 应用 DataFrame（不添加新操作记录）
-        self.apply_dataframe_direct(df2)
+        self.apply_dataframe_direct(df2, case_level=True)
 
     def on_activity_ops_reordered(self):
         new_ops = []
@@ -1064,22 +1771,30 @@ class ProcessAnalysisWindow(QMainWindow):
         self.activity_ops = new_ops
         self.reapply_activity_ops()
 
-    def apply_dataframe_direct(self, df):
+    def apply_dataframe_direct(self, df, case_level=False):
         from pm4py.objects.conversion.log import converter as log_converter
         df['lifecycle:transition'] = 'complete'
-        self.current_log = log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
-        self.update_graph_with_filter()
-        self.update_dataset_preview()
+        with self.profiler.phase("to_event_log", rows_in=len(df)):
+            new_log = log_converter.apply(df, variant=log_converter.Variants.TO_EVENT_LOG)
+        self._register_summary(new_log, df, case_level)
+        self.current_log = new_log
+        with self.profiler.phase("update_graph"):
+            self.update_graph_with_filter()
+        with self.profiler.phase("update_preview", rows_in=len(df)):
+            self.update_dataset_preview()
+        self._commit_op_profile(self.activity_ops[-1] if self.activity_ops else None)
 
     def filter_short_traces(self):
         from pm4py.objects.conversion.log import converter as log_converter
 
         min_len = self.spin_trace_len.value()
-        df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
+        df = self._current_dataframe()
 
-        trace_lengths = df['case:concept:name'].value_counts()
-        keep_cases = trace_lengths[trace_lengths >= min_len].index
-        df2 = df[df['case:concept:name'].isin(keep_cases)].copy()
+        with self.profiler.phase("op:filter_short_trace", rows_in=len(df)) as rec:
+            trace_lengths = df['case:concept:name'].value_counts()
+            keep_cases = trace_lengths[trace_lengths >= min_len].index
+            df2 = df[df['case:concept:name'].isin(keep_cases)].copy()
+            rec["rows_out"] = len(df2)
 
         if df2.empty:
             QMessageBox.warning(self, "无结果", "筛选后数据为空，请降低阈值。")
@@ -1093,10 +1808,10 @@ class ProcessAnalysisWindow(QMainWindow):
             "min_len": min_len
         })
         self.update_activity_ops_list()
-        self.apply_dataframe_direct(df2)
+        self.apply_dataframe_direct(df2, case_level=True)
 
     def filter_by_trace_duration(self):
-        from pm4py.objects.conversion.log import converter as log_converter
+        from cpa_utils import filter_traces_by_duration
 
         min_sec = self.spin_min_dur.value()
         max_sec = self.spin_max_dur.value()
@@ -1105,18 +1820,13 @@ class ProcessAnalysisWindow(QMainWindow):
             QMessageBox.warning(self, "输入有误", "最小值不能大于最大值")
             return
 
-        df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
+        df = self._current_dataframe()
         df["time:timestamp"] = pd.to_datetime(df["time:timestamp"], errors="coerce")
 
-        # ✅ 将 max=0 解释为“不设上限”
-        max_sec_effective = float('inf') if max_sec == 0 else max_sec
-
-        durations = df.groupby("case:concept:name")["time:timestamp"].agg(
-            lambda x: (x.max() - x.min()).total_seconds() if not x.isnull().any() else 0
-        )
-
-        keep_cases = durations[(durations >= min_sec) & (durations <= max_sec_effective)].index
-        df2 = df[df["case:concept:name"].isin(keep_cases)].copy()
+        # ✅ max=0 表示“不设上限”（与重放共用 filter_traces_by_duration）
+        with self.profiler.phase("op:filter_duration", rows_in=len(df)) as rec:
+            df2 = filter_traces_by_duration(df, min_sec, max_sec)
+            rec["rows_out"] = len(df2)
 
         if df2.empty:
             QMessageBox.warning(self, "无数据", "筛选后为空，请检查设置。")
@@ -1128,7 +1838,7 @@ class ProcessAnalysisWindow(QMainWindow):
             "type": "filter_duration",
             "min_sec": min_sec,
             "max_sec": max_sec
-        })
+        }, case_level=True)
 
     def build_duration_filter_description(self, min_sec, max_sec):
         if min_sec > 0 and max_sec == 0:
@@ -1175,46 +1885,29 @@ class ProcessAnalysisWindow(QMainWindow):
         """
         from pm4py.objects.conversion.log import converter as log_converter
 
-        df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
-
-        # 确保时间列为 datetime 类型
-        if not pd.api.types.is_datetime64_any_dtype(df["time:timestamp"]):
-            try:
-                df["time:timestamp"] = pd.to_datetime(df["time:timestamp"])
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"时间格式错误：{str(e)}")
-                return
-
         # 获取用户设置的起止时间（允许为空）
-        start_dt = self.dt_trace_start.dateTime().toPyDateTime()
-        end_dt = self.dt_trace_end.dateTime().toPyDateTime()
-
-        # 获取每个 trace 的开始/结束时间
-        trace_times = df.groupby("case:concept:name")["time:timestamp"].agg(["min", "max"]).reset_index()
-        trace_times.columns = ["case_id", "start", "end"]
-        from datetime import datetime
-
-        # 默认时间为 2018-01-08 表示未修改
-        default_dt = datetime(2018, 1, 8, 0, 0)
-        use_start = start_dt != default_dt
-        use_end = end_dt != default_dt
+        start_dt, end_dt, use_start, use_end = self._trace_time_bounds()
 
         if not use_start and not use_end:
             QMessageBox.information(self, "提示", "请至少设置开始时间或结束时间。")
             return
 
-        keep_mask = pd.Series(True, index=trace_times.index)
-        if use_start:
-            keep_mask &= trace_times["start"] >= start_dt
-        if use_end:
-            keep_mask &= trace_times["end"] <= end_dt
+        df = self._current_dataframe()
 
-        keep_cases = trace_times.loc[keep_mask, "case_id"]
-        if keep_cases.empty:
+        # 每个 trace 的开始/结束时间来自时间索引：按开始时间二分，只检查候选 case
+        try:
+            index = self._time_index(df)
+        except (ValueError, TypeError) as e:
+            QMessageBox.critical(self, "错误", f"时间格式错误：{str(e)}")
+            return
+        keep_cases = index.trace_window_cases(start_dt if use_start else None, end_dt if use_end else None)
+        if len(keep_cases) == 0:
             QMessageBox.warning(self, "无匹配", "未找到满足条件的流程。")
             return
 
-        df2 = df[df["case:concept:name"].isin(keep_cases)].copy()
+        with self.profiler.phase("op:trace_time_range", rows_in=len(df)) as rec:
+            df2 = df[df["case:concept:name"].isin(keep_cases)].copy()
+            rec["rows_out"] = len(df2)
 
         # 构造记录描述
         if use_start and use_end:
@@ -1224,7 +1917,102 @@ class ProcessAnalysisWindow(QMainWindow):
         else:
             desc = f"筛选流程结束时间 ≤ {end_dt.strftime('%Y-%m-%d %H:%M:%S')}"
 
-        self.apply_dataframe_op(df2, desc)
+        self.apply_dataframe_op(df2, desc, case_level=True)
+
+    def _trace_time_bounds(self):
+        """
+        读取流程起止时间控件：返回 (start_dt, end_dt, use_start, use_end)
+        """
+        from datetime import datetime
+
+        start_dt = self.dt_trace_start.dateTime().toPyDateTime()
+        end_dt = self.dt_trace_end.dateTime().toPyDateTime()
+        # 默认时间为 2018-01-08 表示未修改
+        default_dt = datetime(2018, 1, 8, 0, 0)
+        return start_dt, end_dt, start_dt != default_dt, end_dt != default_dt
+
+    def _schedule_filter_preview(self, *_):
+        self._preview_timer.start()  # 重新计时：连续调整时只在停下后计算一次
+
+    def _filter_preview(self):
+        """当前日志的预估器；概况尚未计算时返回 None（由 update_dataset_preview 负责构建）"""
+        return self._preview_cache.get(self.current_log)
+
+    def update_filter_previews(self):
+        """
+        试运行：在各筛选控件旁显示“若现在应用将保留多少流程 / 事件”，不修改日志
+        """
+        preview = self._filter_preview()
+        labels = (self.lbl_preview_freq, self.lbl_preview_trace_len, self.lbl_preview_dur,
+                  self.lbl_preview_time, self.lbl_preview_del)
+        if preview is None:
+            for lbl in labels:
+                lbl.clear()
+            return
+
+        self.lbl_preview_freq.setText(preview.describe(preview.global_frequency(self.freq_spin.value())))
+        self.lbl_preview_trace_len.setText(preview.describe(preview.short_traces(self.spin_trace_len.value())))
+
+        min_sec, max_sec = self.spin_min_dur.value(), self.spin_max_dur.value()
+        if min_sec > 0 and max_sec > 0 and min_sec > max_sec:
+            self.lbl_preview_dur.setText("最小值不能大于最大值")
+        else:
+            self.lbl_preview_dur.setText(preview.describe(preview.duration(min_sec, max_sec)))
+
+        start_dt, end_dt, use_start, use_end = self._trace_time_bounds()
+        if use_start or use_end:
+            kept = preview.time_range(start_dt if use_start else None, end_dt if use_end else None)
+            self.lbl_preview_time.setText(preview.describe(kept))
+        else:
+            self.lbl_preview_time.clear()
+
+        self.lbl_preview_del.setText(self._condition_preview_text(preview))
+        self.update_time_window_label()
+        self._update_variant_previews()
+
+    def _attribute_index(self, df):
+        """
+        当前日志的属性索引（df 须为 current_log 的转换结果，行顺序一致）；日志变化即换新索引
+        """
+        index = self._attr_index_cache.get(self.current_log)
+        if index is None or index.n_rows != len(df):
+            index = AttributeIndex(len(df))
+            self._attr_index_cache.put(self.current_log, index)
+        return index
+
+    def _on_variant_controls_changed(self, *_):
+        self._variant_preview_wanted = True
+        self._schedule_filter_preview()
+
+    def _update_variant_previews(self):
+        """变体筛选预估：前缀树查找，只需在树上走若干步"""
+        if self._variant_trie_cache.get(self.current_log) is None and not self._variant_preview_wanted:
+            return
+        trie = self._variant_trie()
+        op = self._variant_top_op()
+        variants = trie.variants_for_op(op)
+        kept = int(trie.case_index.variant_case_counts[variants].sum())
+        self.lbl_preview_variant.setText(f"→ {len(variants):,} 个变体，{kept:,}/{trie.total_cases:,} 流程")
+
+        prefix = self._variant_prefix()
+        if prefix:
+            self.lbl_preview_prefix.setText(f"→ {trie.prefix_case_count(prefix):,}/{trie.total_cases:,} 流程")
+        else:
+            self.lbl_preview_prefix.clear()
+
+    def _condition_preview_text(self, preview):
+        display_col = self.cbo_del_col.currentText().strip()
+        op = self.cbo_del_op.currentText().strip()
+        val = self.edit_del_val.text().strip()
+        if preview.df is None or (op != "表达式" and not display_col) or (op not in UNARY_OPS and not val):
+            return ""
+        cond = {"col": self.reverse_display_column(display_col), "op": op, "val": val}
+        try:
+            match = mask_for_op(cond, preview.df, self._attribute_index(preview.df))
+        except PredicateError as e:
+            return str(e)
+        kept = preview.by_event_mask(match, case_level=self.cbo_del_level.currentText() == "流程级")
+        return preview.describe(kept)
 
     def remove_self_loops(self):
         if self.current_log is None:
@@ -1237,14 +2025,16 @@ class ProcessAnalysisWindow(QMainWindow):
 
         strategy = dialog.get_strategy()
 
-        df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
-        df2 = remove_consecutive_self_loops(
-            df,
-            case_col="case:concept:name",
-            act_col="concept:name",
-            time_col="time:timestamp",
-            keep=strategy
-        )
+        df = self._current_dataframe()
+        with self.profiler.phase("op:remove_self_loops", rows_in=len(df)) as rec:
+            df2 = remove_consecutive_self_loops(
+                df,
+                case_col="case:concept:name",
+                act_col="concept:name",
+                time_col="time:timestamp",
+                keep=strategy
+            )
+            rec["rows_out"] = len(df2)
 
         if df2.empty:
             QMessageBox.warning(self, "结果为空", "清除后日志为空，请检查数据。")
@@ -1256,6 +2046,72 @@ class ProcessAnalysisWindow(QMainWindow):
             "strategy": strategy
         })
 
+    @staticmethod
+    def _dedup_op_desc(op):
+        keep = op["keep"]
+        which = {"first": "第一次", "last": "最后一次"}.get(keep, f"第 {keep} 次")
+        scope = "、".join(op["activities"]) if op.get("activities") else "全部活动"
+        return f"活动去重（{scope}，保留{which}出现）"
+
+    def dedup_activity_occurrences(self):
+        from cpa_utils import dedup_occurrences
+
+        if self.current_log is None:
+            QMessageBox.warning(self, "无数据", "当前日志为空，无法去重。")
+            return
+
+        keep = {"第一次": "first", "最后一次": "last"}.get(
+            self.cbo_dedup_keep.currentText(), self.spin_dedup_nth.value())
+        text = self.edit_dedup_activities.text().replace("，", ",")
+        activities = [a.strip() for a in text.split(",") if a.strip()] or None
+        op = {"type": "dedup", "keep": keep, "activities": activities, "agg_fields": None}
+
+        df = self._current_dataframe()
+        with self.profiler.phase("op:dedup", rows_in=len(df)) as rec:
+            df2 = dedup_occurrences(df, keep=keep, activities=activities)
+            rec["rows_out"] = len(df2)
+
+        if df2.empty:
+            QMessageBox.warning(self, "结果为空", "去重后日志为空，请检查数据。")
+            return
+
+        self.apply_dataframe_op(df2, self._dedup_op_desc(op), extra_op=op)
+
+    @staticmethod
+    def _sessionize_op_desc(op):
+        desc = f"会话切分（{op['entity_col']}，间隔 > {op['gap_sec'] // 60} 分钟"
+        if op.get("start_activities"):
+            desc += f"，起始活动：{'、'.join(op['start_activities'])}"
+        return desc + "）"
+
+    def sessionize_cases(self):
+        import cpa_pm_preprocessing as pp
+
+        if self.current_log is None:
+            QMessageBox.warning(self, "无数据", "当前日志为空，无法切分会话。")
+            return
+
+        df = self._current_dataframe()
+        entity_col = self.cbo_session_entity.currentText().strip()
+        entity_col = self.reverse_display_column(entity_col) if entity_col not in df.columns else entity_col
+        if entity_col not in df.columns:
+            QMessageBox.warning(self, "列不存在", f"找不到实体列：{entity_col}")
+            return
+        text = self.edit_session_start.text().replace("，", ",")
+        starts = [a.strip() for a in text.split(",") if a.strip()] or None
+        op = {"type": "sessionize", "entity_col": entity_col,
+              "gap_sec": self.spin_session_gap.value() * 60, "start_activities": starts}
+
+        with self.profiler.phase("op:sessionize", rows_in=len(df)) as rec:
+            df2 = pp.sessionize(df, entity_col, op["gap_sec"], start_activities=starts)
+            rec["rows_out"] = len(df2)
+
+        if df2.empty:
+            QMessageBox.warning(self, "结果为空", "切分后日志为空，请检查数据。")
+            return
+
+        self.apply_dataframe_op(df2, self._sessionize_op_desc(op), extra_op=op)
+
     # 移动进类内部（不需要加 @staticmethod）
     def reverse_display_column(self, display_col: str) -> str:
         DISPLAY_TO_INTERNAL_COLS = {
@@ -1288,66 +2144,129 @@ class ProcessAnalysisWindow(QMainWindow):
         return result
 
     def delete_records_by_condition(self):
-        from pm4py.objects.conversion.log import converter as log_converter
-        import pandas as pd
-
         # 获取界面输入项
         display_col = self.cbo_del_col.currentText().strip()
         op = self.cbo_del_op.currentText().strip()
         val = self.edit_del_val.text().strip()
         level = self.cbo_del_level.currentText().strip()
 
-        if not display_col or not op or not val:
+        if not op or (op != "表达式" and not display_col) or (op not in UNARY_OPS and not val):
             QMessageBox.warning(self, "输入不完整", "请填写完整的列名、操作符和值。")
             return
 
+        if level not in ("事件级", "流程级"):
+            QMessageBox.warning(self, "未知操作", "未知的删除级别。")
+            return
+
         # 将用户选择的列名（如 "event"）映射回标准字段名（如 "concept:name"）
         col = self.reverse_display_column(display_col)
-
+        new_op = {
+            "type": "delete_condition",
+            "col": col,
+            "op": op,
+            "val": val,
+            "level": level
+        }
 
         try:
-            df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
-
-            # 尝试将值转换为数字/布尔/时间；如果失败就当作字符串
-            try:
-                val_eval = eval(val, {}, {})
-            except:
-                val_eval = val.strip("'\"")
+            df = self._current_dataframe()
 
-            expr = f"`{col}` {op} @val_eval"
-
-            if level == "事件级":
-                df2 = df.query(f"not ({expr})", local_dict={"val_eval": val_eval})
-            elif level == "流程级":
-                match_cases = df.query(expr, local_dict={"val_eval": val_eval})["case:concept:name"].unique()
-                df2 = df[~df["case:concept:name"].isin(match_cases)]
-            else:
-                QMessageBox.warning(self, "未知操作", "未知的删除级别。")
-                return
+            # 条件只解析 / 编译一次，结果缓存在操作记录上供重放使用
+            with self.profiler.phase("op:delete_condition", rows_in=len(df)) as rec:
+                df2 = apply_delete_condition(df, mask_for_op(new_op, df, self._attribute_index(df)), level)
+                rec["rows_out"] = len(df2)
 
             if df2.empty:
                 QMessageBox.warning(self, "无结果", "删除后数据为空，请检查条件。")
                 return
 
             # 显示用户友好的列名描述
-            desc = f"删除{'事件' if level == '事件级' else '流程'}中满足：{display_col} {op} {val} 的记录"
+            if op == "表达式":
+                cond = val
+            elif op in UNARY_OPS:
+                cond = f"{display_col} {op}"
+            else:
+                cond = f"{display_col} {op} {val}"
+            desc = f"删除{'事件' if level == '事件级' else '流程'}中满足：{cond} 的记录"
 
             # 添加操作记录，执行变更
-            self.apply_dataframe_op(df2, desc, extra_op={
-                "type": "delete_condition",
-                "col": col,
-                "op": op,
-                "val": val,
-                "level": level
-            })
+            self.apply_dataframe_op(df2, desc, extra_op=new_op, case_level=(level == "流程级"))
 
+        except PredicateError as e:
+            QMessageBox.warning(self, "条件无效", str(e))
         except Exception as e:
             QMessageBox.critical(self, "删除失败", str(e))
 
+    # ────────────────────────────────────────────────────
+    # 变体筛选（前缀树）
+    # ────────────────────────────────────────────────────
+    def _variant_trie(self, df=None):
+        """
+        当前日志的变体前缀树（每个日志版本构建一次）；df 须为 current_log 的转换结果
+        """
+        trie = self._variant_trie_cache.get(self.current_log)
+        if trie is None:
+            if df is None:
+                preview = self._filter_preview()
+                df = preview.df if preview is not None and preview.df is not None else self._current_dataframe()
+                self.profiler.discard_pending()
+            trie = VariantTrie(CaseIndex(df, "case:concept:name", "concept:name", "time:timestamp"))
+            self._variant_trie_cache.put(self.current_log, trie)
+        return trie
+
+    def _variant_top_op(self):
+        value = self.spin_variant_value.value()
+        if self.cbo_variant_mode.currentIndex() == 1:
+            return {"type": "filter_variant_top", "k": None, "coverage": min(value, 100) / 100}
+        return {"type": "filter_variant_top", "k": value, "coverage": None}
+
+    def _variant_prefix(self):
+        text = self.edit_variant_prefix.text().replace("→", ",")
+        return [part.strip() for part in text.split(",") if part.strip()]
+
+    def _variant_op_desc(self, op):
+        if op["type"] == "filter_variant_top":
+            if op.get("coverage") is not None:
+                return f"保留覆盖 {op['coverage']:.0%} 流程的高频变体"
+            return f"保留前 {op['k']} 个变体"
+        if op["type"] == "filter_variant_prefix":
+            return f"保留以 {' → '.join(op['prefix'])} 开头的流程"
+        return f"保留选中的 {len(op['variants'])} 个变体"
+
+    def _apply_variant_op(self, op):
+        df = self._current_dataframe()
+        trie = self._variant_trie(df)
+        with self.profiler.phase(f"op:{op['type']}", rows_in=len(df)) as rec:
+            df2 = filter_by_variants(df, op, trie).copy()
+            rec["rows_out"] = len(df2)
+
+        if df2.empty:
+            QMessageBox.warning(self, "无数据", "没有满足条件的流程。")
+            return
+        self.apply_dataframe_op(df2, self._variant_op_desc(op), extra_op=op, case_level=True)
+
+    def filter_variants_top(self):
+        self._apply_variant_op(self._variant_top_op())
+
+    def filter_variant_prefix(self):
+        prefix = self._variant_prefix()
+        if not prefix:
+            QMessageBox.warning(self, "提示", "请输入至少一个活动作为前缀。")
+            return
+        self._apply_variant_op({"type": "filter_variant_prefix", "prefix": prefix})
+
+    def keep_selected_variants(self, variants):
+        """CasesWindow 中选中若干变体后，只保留这些变体的流程"""
+        if variants:
+            self._apply_variant_op({"type": "filter_variant_set", "variants": variants})
+
     def open_cases_window(self):
         from cases_window import CasesWindow
         df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
-        self.cases_win = CasesWindow(df, self.col_mapping)
+        trie = self._variant_trie_cache.get(self.current_log)
+        self.cases_win = CasesWindow(df, self.col_mapping, case_index=trie.case_index if trie else None,
+                                     case_labels=self._effective_case_labels())
+        self.cases_win.keep_variants_requested.connect(self.keep_selected_variants)
         self.cases_win.show()
 
     def export_xes_file(self):
@@ -1361,6 +2280,9 @@ class ProcessAnalysisWindow(QMainWindow):
         if self.current_log is None:
             QMessageBox.warning(self, "无数据", "当前日志为空，无法导出 XES 文件。")
             return
+        if self._full_log is not None and QMessageBox.question(
+                self, "抽样日志", "当前为抽样日志，导出的只是样本中的流程。仍要导出吗？") != QMessageBox.Yes:
+            return
 
         save_path, _ = QFileDialog.getSaveFileName(self, "保存 XES 文件", os.getcwd(), "XES 文件 (*.xes)")
         if not save_path:
@@ -1369,12 +2291,129 @@ class ProcessAnalysisWindow(QMainWindow):
             save_path += ".xes"
 
         try:
-            # 转换为 XES 格式
-            xes_exporter.apply(self.current_log, save_path)
+            # 转换为 XES 格式；组合 case 键在写出期间临时换成可读标签
+            keys = [trace.attributes.get("concept:name") for trace in self.current_log] \
+                if self._effective_case_labels() is not None else None
+            try:
+                if keys is not None:
+                    for trace, label in zip(self.current_log, self.case_label(keys)):
+                        trace.attributes["concept:name"] = label
+                xes_exporter.apply(self.current_log, save_path)
+            finally:
+                if keys is not None:
+                    for trace, key in zip(self.current_log, keys):
+                        trace.attributes["concept:name"] = key
             QMessageBox.information(self, "导出成功", f"已成功导出为 XES 文件：\n{save_path}")
         except Exception as e:
             QMessageBox.critical(self, "导出失败", f"导出 XES 文件时发生错误：\n{str(e)}")
 
+    # ────────────────────────────────────────────────────
+    # 增量追加
+    # ────────────────────────────────────────────────────
+    def append_new_data(self):
+        """读取新一批事件（CSV 或 XES），并入原始日志并增量更新清洗结果"""
+        import os
+        import pm4py
+
+        if self.current_log is None:
+            QMessageBox.warning(self, "无数据", "当前日志为空，无法追加。")
+            return
+        if self._full_log is not None:
+            QMessageBox.warning(self, "抽样模式", "请先在完整日志上重放、退出抽样模式后再追加新数据。")
+            return
+        if self.case_labels is not None:
+            QMessageBox.warning(self, "暂不支持", "组合 case 标识的日志请在预处理窗口中重新导入全部数据。")
+            return
+
+        path, _ = QFileDialog.getOpenFileName(self, "追加新数据", os.getcwd(), "事件日志 (*.csv *.xes)")
+        if not path:
+            return
+        try:
+            if path.lower().endswith(".xes"):
+                rows = pm4py.read_xes(path)
+                if not isinstance(rows, pd.DataFrame):
+                    rows = log_converter.apply(rows, variant=log_converter.Variants.TO_DATA_FRAME)
+            else:
+                # CSV 使用预处理阶段的原列名，换回标准列名
+                rows = pd.read_csv(path)
+                rows = rows.rename(columns={raw: std for std, raw in self.col_mapping.items()})
+        except Exception as e:
+            QMessageBox.critical(self, "读取失败", str(e))
+            return
+
+        missing = [c for c in ("case:concept:name", "concept:name", "time:timestamp") if c not in rows.columns]
+        if missing:
+            QMessageBox.warning(self, "缺少列", f"新数据缺少列：{', '.join(missing)}")
+            return
+        if rows.empty:
+            QMessageBox.information(self, "提示", "新数据为空。")
+            return
+        try:
+            changed, affected = self.ingest_new_rows(rows)
+        except Exception as e:
+            QMessageBox.critical(self, "追加失败", str(e))
+            return
+        replayed = "操作链含非 case 内操作，已整体重放" if affected is None else f"重放了 {affected} 个流程"
+        QMessageBox.information(self, "追加完成", f"新增 {len(rows)} 条事件，涉及 {changed} 个流程；{replayed}。")
+
+    def _incremental_state(self, ops):
+        """当前原始日志与操作链对应的 IncrementalLog；首次追加或操作链被改写后整体构建一次"""
+        from incremental_log import IncrementalLog
+
+        cached = self._append_state
+        if cached is not None and cached[0] is self.original_log and cached[1].matches(ops):
+            state = cached[1]
+            if len(ops) > len(state.ops):
+                state.extend(ops)
+            return state
+        raw = log_converter.apply(self.original_log, variant=log_converter.Variants.TO_DATA_FRAME)
+        return IncrementalLog(raw, ops, self._apply_activity_op)
+
+    def ingest_new_rows(self, rows):
+        """
+        把新事件并入 original_log，并把操作链增量作用到 current_log：
+        只有新事件所属的 case（以及因全局频次阈值变化而牵连的 case）被重放，
+        概况与 DFG 只替换这些 case 的贡献。
+        返回 (有新事件的 case 数, 重放的 case 数)；整体重放时后者为 None
+        """
+        from incremental_log import IncrementalLog, active_ops, normalize_rows, splice_log
+
+        ops = active_ops(self.activity_ops)
+        if not IncrementalLog.supports(ops):
+            # 操作链含非 case 内操作：原始日志并入新事件后整体重放
+            raw = log_converter.apply(self.original_log, variant=log_converter.Variants.TO_DATA_FRAME)
+            raw = pd.concat([raw, normalize_rows(rows, raw)], ignore_index=True)
+            self.original_log = log_converter.apply(raw, variant=log_converter.Variants.TO_EVENT_LOG)
+            self._append_state = None
+            self._clear_history()
+            self.reapply_activity_ops()
+            return rows["case:concept:name"].nunique(), None
+
+        state = self._incremental_state(ops)
+        changed, affected, raw_part, part = state.append(rows)
+        part["lifecycle:transition"] = "complete"
+        self.original_log = splice_log(self.original_log, changed, raw_part)
+        new_log = splice_log(self.current_log, affected, part)
+        self._append_state = (self.original_log, state)
+
+        prev = self._summary_cache.get(self.current_log)
+        self.log_version += 1
+        if prev is not None:
+            summary = prev.without_cases(affected).with_cases(part, version=self.log_version)
+        else:
+            summary = LogSummary.from_dataframe(state.cleaned, version=self.log_version)
+        self._summary_cache.put(new_log, summary)
+
+        # 追加前的日志不含新事件，撤销 / 重做栈一并清空
+        self._clear_history()
+        self.current_log = new_log
+        self.graph_view.set_statistics(
+            new_log, {edge: int(n) for edge, n in state.edges.items()},
+            {act: int(n) for act, n in summary.activity_counts.items()})
+        self.update_graph_with_filter()
+        self.update_dataset_preview(state.cleaned)
+        return len(changed), len(affected)
+
     def filter_by_contain_start_end(self):
         from cpa_utils import filter_traces_containing_start_end
         from pm4py.objects.conversion.log import converter as log_converter
@@ -1386,8 +2425,10 @@ class ProcessAnalysisWindow(QMainWindow):
             QMessageBox.warning(self, "提示", "请至少选择起始或结束事件。")
             return
 
-        df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
-        df2 = filter_traces_containing_start_end(df, start_event=start or None, end_event=end or None)
+        df = self._current_dataframe()
+        with self.profiler.phase("op:filter_contain_order", rows_in=len(df)) as rec:
+            df2 = filter_traces_containing_start_end(df, start_event=start or None, end_event=end or None)
+            rec["rows_out"] = len(df2)
 
         if df2.empty:
             QMessageBox.warning(self, "无数据", "筛选结果为空，请检查条件。")
@@ -1398,24 +2439,10 @@ class ProcessAnalysisWindow(QMainWindow):
             "type": "filter_contain_order",
             "start": start,
             "end": end
-        })
-
-    def generate_summary_statistics(self):
-        from StatisticWindow import StatisticWindow
-        from pm4py.objects.conversion.log import converter as log_converter
-
-        df = log_converter.apply(self.current_log, variant=log_converter.Variants.TO_DATA_FRAME)
-
-        value1 = self.spin_time_value_1.value()
-        unit1 = self.cbo_time_unit_1.currentText()
-
-        value2 = self.spin_time_value_2.value()
-        unit2 = self.cbo_time_unit_2.currentText()
-
-        if value1 <= 0 and value2 <= 0:
-            QMessageBox.warning(self, "输入无效", "请输入至少一个时间阈值（第一个或第二个）")
-            return
+        }, case_level=True)
 
+    def _threshold_minutes(self):
+        """两个时间阈值换算为分钟（0 视为未设置，返回 None）"""
         def to_minutes(val, unit):
             if unit == "分钟":
                 return val
@@ -1424,14 +2451,53 @@ class ProcessAnalysisWindow(QMainWindow):
             elif unit == "天":
                 return val * 24 * 60
 
+        value1 = self.spin_time_value_1.value()
+        unit1 = self.cbo_time_unit_1.currentText()
+
+        value2 = self.spin_time_value_2.value()
+        unit2 = self.cbo_time_unit_2.currentText()
+
         min1 = to_minutes(value1, unit1) if value1 > 0 else None
         min2 = to_minutes(value2, unit2) if value2 > 0 else None
+        return min1, min2
+
+    def _statistics_engine(self):
+        """当前日志的统计缓存：每个日志版本只扫描一次"""
+        from StatisticWindow import StatisticsEngine
+
+        engine = self._stats_cache.get(self.current_log)
+        if engine is None:
+            df = self._current_dataframe()
+            self.profiler.discard_pending()  # 统计不属于任何操作
+            engine = StatisticsEngine(df, summary=self._summary_cache.get(self.current_log))
+            self._stats_cache.put(self.current_log, engine)
+        return engine
 
-        self.stats_win = StatisticWindow(df, threshold_min1=min1, threshold_min2=min2)
+    def generate_summary_statistics(self):
+        from StatisticWindow import StatisticWindow
+
+        min1, min2 = self._threshold_minutes()
+        if min1 is None and min2 is None:
+            QMessageBox.warning(self, "输入无效", "请输入至少一个时间阈值（第一个或第二个）")
+            return
+
+        self.stats_win = StatisticWindow(
+            None, threshold_min1=min1, threshold_min2=min2, engine=self._statistics_engine()
+        )
+        if self._full_log is not None:
+            self.stats_win.setWindowTitle(
+                f"{self.stats_win.windowTitle()}（抽样 {self.spin_sample_pct.value()}% 估计）")
         self.stats_win.show()
 
+    def refresh_statistic_thresholds(self):
+        stats_win = getattr(self, "stats_win", None)
+        if stats_win is None or not stats_win.isVisible():
+            return
+        min1, min2 = self._threshold_minutes()
+        stats_win.set_thresholds(min1, min2)
+
 
-def launch_analysis_window(event_log, col_mapping=None):
+def launch_analysis_window(event_log, col_mapping=None, case_labels=None):
 
     """
     供外部程序调用入口，默认全屏显示并返回窗口对象
@@ -1440,7 +2506,7 @@ def launch_analysis_window(event_log, col_mapping=None):
     app = QApplication.instance()
     if app is None:
         app = QApplication(sys.argv)
-    _analysis_window = ProcessAnalysisWindow(event_log)
+    _analysis_window = ProcessAnalysisWindow(event_log, case_labels=case_labels)
     _analysis_window.showMaximized()  # ✅ 默认最大化显示
     return _analysis_window           # ✅ 返回窗口对象
 
@@ -1,4 +1,3 @@
-import networkx as nx
 from PyQt5.QtWidgets import (
     QGraphicsView, QGraphicsScene, QGraphicsPathItem, QGraphicsItem,
     QGraphicsTextItem, QDialog, QLabel, QVBoxLayout, QPushButton
@@ -8,11 +7,7 @@ from PyQt5.QtGui import (
 )
 from PyQt5.QtCore import Qt, QPointF, QTimer
 
-from pm4py.algo.discovery.dfg import algorithm as dfg_discovery
-from networkx.drawing.nx_pydot import graphviz_layout
-from remove_self_loop_dialog import RemoveSelfLoopDialog
-from cpa_utils import remove_consecutive_self_loops
-
+# networkx / pydot / PM4Py 的 DFG 算法在首次绘图时才导入（见 _build_graph_cache）
 import re
 from collections import Counter
 import math
@@ -22,6 +17,19 @@ def sanitize_label(label):
     return re.sub(r'[^a-zA-Z0-9_]', '_', str(label))
 
 
+def format_duration(seconds):
+    """将秒数格式化为简短的人类可读时长，如 45s / 12m / 3.5h / 2.1d"""
+    if seconds is None or seconds != seconds:  # NaN
+        return "-"
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f}m"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 86400:.1f}d"
+
+
 class ProcessGraphView(QGraphicsView):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -33,6 +41,15 @@ class ProcessGraphView(QGraphicsView):
         self._current_scale = 1.0
         self.scale(self._current_scale, self._current_scale)
 
+        # 显示模式："frequency"（频次）或 "performance"（等待时间）
+        self.display_mode = "frequency"
+        # 与当前日志绑定的 DFG / 布局 / 性能统计缓存，切换模式或比例时不重新布局
+        self._graph_cache = None
+        self._act_percent = 100
+        self._edge_percent = 100
+        # 时序漂移模式：(dfg, activity_counts) 替换整体统计，沿用整体日志的布局
+        self._window_override = None
+
         # ===== 缩放控制按钮（右下角） =====
         self.zoom_label = QLabel("100%", self)
         self.zoom_label.setStyleSheet("""
@@ -93,19 +110,65 @@ class ProcessGraphView(QGraphicsView):
         self._update_zoom_label()
 
     def draw_from_event_log(self, event_log, act_percent=100, edge_percent=100):
-        self.scene.clear()
-        self._current_scale = 1.0
-        self.resetTransform()
+        self._act_percent = act_percent
+        self._edge_percent = edge_percent
 
         if not event_log:
+            self._graph_cache = None
+            self.scene.clear()
             return
 
-        dfg = dfg_discovery.apply(event_log)
-        activity_counts = {}
-        for trace in event_log:
-            for event in trace:
-                act = event.get("concept:name", "undefined")
-                activity_counts[act] = activity_counts.get(act, 0) + 1
+        if self._graph_cache is None or self._graph_cache["log"] is not event_log:
+            self._graph_cache = self._build_graph_cache(event_log)
+            self._window_override = None  # 窗口统计属于旧日志
+        self._render()
+
+    def set_display_mode(self, mode):
+        """
+        切换 "frequency" / "performance" 模式，复用已缓存的布局重新绘制
+        """
+        if mode == self.display_mode:
+            return
+        self.display_mode = mode
+        if self._graph_cache is not None:
+            self._render()
+
+    def set_statistics(self, event_log, dfg, activity_counts):
+        """
+        为 event_log 预先登记已算好的 DFG 与活动频次（增量追加时由调用方维护），
+        之后 draw_from_event_log(event_log) 只做布局与绘制，不再遍历日志
+        """
+        self._graph_cache = self._build_graph_cache(event_log, dfg, activity_counts)
+        self._window_override = None
+
+    def show_window(self, dfg, activity_counts):
+        """
+        显示某个时间窗口的 DFG：节点位置固定为整体日志的布局，只替换频次
+        """
+        self._window_override = (dfg, activity_counts)
+        if self._graph_cache is not None:
+            self._render()
+
+    def clear_window(self):
+        if self._window_override is None:
+            return
+        self._window_override = None
+        if self._graph_cache is not None:
+            self._render()
+
+    def _build_graph_cache(self, event_log, dfg=None, activity_counts=None):
+        import networkx as nx
+        from networkx.drawing.nx_pydot import graphviz_layout
+        from pm4py.algo.discovery.dfg import algorithm as dfg_discovery
+
+        if dfg is None:
+            dfg = dfg_discovery.apply(event_log)
+        if activity_counts is None:
+            activity_counts = {}
+            for trace in event_log:
+                for event in trace:
+                    act = event.get("concept:name", "undefined")
+                    activity_counts[act] = activity_counts.get(act, 0) + 1
 
         G = nx.DiGraph()
         label_map = {}
@@ -124,13 +187,6 @@ class ProcessGraphView(QGraphicsView):
             G.nodes[act_clean]["count"] = freq
             label_map[act_clean] = act
 
-        act_freqs = sorted(activity_counts.items(), key=lambda x: x[1], reverse=True)
-        keep_acts = set(sanitize_label(act) for act, _ in act_freqs[:max(1, len(act_freqs) * act_percent // 100)])
-
-        edge_freqs = sorted(dfg.items(), key=lambda x: x[1], reverse=True)
-        keep_edges = set((sanitize_label(src), sanitize_label(tgt)) for (src, tgt), _ in
-                         edge_freqs[:max(1, len(edge_freqs) * edge_percent // 100)])
-
         try:
             start_acts = [trace[0]['concept:name'] for trace in event_log if trace]
             most_common_start, _ = Counter(start_acts).most_common(1)[0]
@@ -153,7 +209,84 @@ class ProcessGraphView(QGraphicsView):
             pos = nx.spring_layout(G, scale=800, k=300)
             pos = {n: (x, -y) for n, (x, y) in pos.items()}
 
-        max_edge_weight = max([freq for (_, _), freq in dfg.items()] or [1])
+        return {
+            "log": event_log,
+            "dfg": dfg,
+            "activity_counts": activity_counts,
+            "label_map": label_map,
+            "pos": pos,
+            "performance": None,  # 首次进入性能模式时再计算
+        }
+
+    def _ensure_performance(self):
+        """
+        懒计算并缓存每条边 / 每个活动的等待时间统计（mean / median / p95，秒）
+        """
+        cache = self._graph_cache
+        if cache["performance"] is None:
+            from pm4py.objects.conversion.log import converter as log_converter
+            from cpa_utils import compute_transition_performance
+
+            df = log_converter.apply(cache["log"], variant=log_converter.Variants.TO_DATA_FRAME)
+            edge_stats, act_stats = compute_transition_performance(df)
+            cache["performance"] = {
+                "edges": edge_stats.to_dict("index"),
+                "activities": act_stats.to_dict("index"),
+            }
+        return cache["performance"]
+
+    def _render(self):
+        self.scene.clear()
+        self._current_scale = 1.0
+        self.resetTransform()
+
+        cache = self._graph_cache
+        dfg = cache["dfg"]
+        activity_counts = cache["activity_counts"]
+        if self._window_override is not None:
+            dfg, activity_counts = self._window_override
+        label_map = cache["label_map"]
+        pos = cache["pos"]
+        act_percent = self._act_percent
+        edge_percent = self._edge_percent
+
+        # 性能统计针对整体日志，时间窗口下只显示频次
+        perf_mode = self.display_mode == "performance" and self._window_override is None
+        perf = self._ensure_performance() if perf_mode else None
+        empty_stat = {"count": 0, "mean": 0.0, "median": 0.0, "p95": 0.0}
+
+        act_freqs = sorted(activity_counts.items(), key=lambda x: x[1], reverse=True)
+        keep_acts = set(sanitize_label(act) for act, _ in act_freqs[:max(1, len(act_freqs) * act_percent // 100)])
+
+        edge_freqs = sorted(dfg.items(), key=lambda x: x[1], reverse=True)
+        keep_edges = set((sanitize_label(src), sanitize_label(tgt)) for (src, tgt), _ in
+                         edge_freqs[:max(1, len(edge_freqs) * edge_percent // 100)])
+
+        def node_label(act_name):
+            if perf_mode:
+                stat = perf["activities"].get(act_name, empty_stat)
+                return f"{act_name}\n({format_duration(stat['mean'])})"
+            return f"{act_name}\n({activity_counts.get(act_name, 1)})"
+
+        def edge_text(src, tgt, weight):
+            if perf_mode:
+                stat = perf["edges"].get((src, tgt), empty_stat)
+                return (format_duration(stat["mean"]),
+                        f"{src} → {tgt}\n频次: {weight}\n"
+                        f"平均等待: {format_duration(stat['mean'])}\n"
+                        f"中位等待: {format_duration(stat['median'])}\n"
+                        f"P95 等待: {format_duration(stat['p95'])}")
+            return str(weight), f"{src} → {tgt}\n频次: {weight}"
+
+        if perf_mode:
+            # 性能模式下边的粗细 / 颜色按平均等待时间映射
+            edge_weights = {}
+            for edge in dfg:
+                mean_wait = perf["edges"].get(edge, empty_stat)["mean"]
+                edge_weights[edge] = mean_wait if mean_wait == mean_wait else 0  # NaN → 0
+        else:
+            edge_weights = dict(dfg)
+        max_edge_weight = max(list(edge_weights.values()) + [0]) or 1
         max_node_count = max(activity_counts.values() or [1])
 
         # ===== 统一节点宽度：找出最长 label 的宽度并存入 self =====
@@ -162,8 +295,7 @@ class ProcessGraphView(QGraphicsView):
         fm = QFontMetrics(font)
         for act_clean in keep_acts:
             act_name = label_map.get(act_clean, act_clean)
-            freq_count = activity_counts.get(act_name, 1)
-            node_text = f"{act_name}\n({freq_count})"
+            node_text = node_label(act_name)
             lines = node_text.split('\n')
             text_width = max(fm.horizontalAdvance(line) for line in lines)
             max_text_width = max(max_text_width, text_width)
@@ -192,9 +324,14 @@ class ProcessGraphView(QGraphicsView):
             (x1, y1) = pos[src_clean]
             (x2, y2) = pos[tgt_clean]
 
-            pen_width = 1 + 3 * (weight / max_edge_weight)
-            pen_color = QColor(80, 80, 80 + int(175 * (weight / max_edge_weight)))
+            ratio = edge_weights.get((src, tgt), 0) / max_edge_weight
+            pen_width = 1 + 3 * ratio
+            if perf_mode:
+                pen_color = QColor(80 + int(175 * ratio), 80, 80)
+            else:
+                pen_color = QColor(80, 80, 80 + int(175 * ratio))
             pen = QPen(pen_color, pen_width)
+            label_text, tooltip = edge_text(src, tgt, weight)
 
             if src_clean == tgt_clean:
                 loop_width = 50
@@ -212,10 +349,10 @@ class ProcessGraphView(QGraphicsView):
                 loop_item = QGraphicsPathItem(arc_path)
                 loop_item.setPen(pen)
                 loop_item.setZValue(0)
-                loop_item.setToolTip(f"{src} → {tgt}\n频次: {weight}")
+                loop_item.setToolTip(tooltip)
                 self.scene.addItem(loop_item)
 
-                freq_text = QGraphicsTextItem(str(weight))
+                freq_text = QGraphicsTextItem(label_text)
                 freq_text.setFont(QFont("Arial", 12))
                 freq_text.setDefaultTextColor(Qt.darkGray)
                 freq_text.setPos(loop_center_x + loop_width / 2 + 4, loop_center_y - loop_height / 2)
@@ -230,7 +367,7 @@ class ProcessGraphView(QGraphicsView):
                 line.setPath(path)
                 line.setPen(pen)
                 line.setZValue(0)
-                line.setToolTip(f"{src} → {tgt}\n频次: {weight}")
+                line.setToolTip(tooltip)
                 self.scene.addItem(line)
 
                 dx = x2 - x1
@@ -240,7 +377,7 @@ class ProcessGraphView(QGraphicsView):
                 fx = x1 + dx * 0.33
                 fy = y1 + dy * 0.33
 
-                freq_text = QGraphicsTextItem(str(weight))
+                freq_text = QGraphicsTextItem(label_text)
                 freq_text.setFont(QFont("Arial", 12))
                 freq_text.setDefaultTextColor(Qt.darkGray)
                 if is_vertical:
@@ -261,7 +398,7 @@ class ProcessGraphView(QGraphicsView):
             x, y = pos[act_clean]
             act_name = label_map.get(act_clean, act_clean)
             freq_count = activity_counts.get(act_name, 1)
-            node_text = f"{act_name}\n({freq_count})"
+            node_text = node_label(act_name)
 
             font = QFont("Arial", 10)
             fm = QFontMetrics(font)
@@ -282,7 +419,16 @@ class ProcessGraphView(QGraphicsView):
             node_item = QGraphicsPathItem(path)
             node_item.setBrush(QBrush(QColor(255 - int(200 * (freq_count / max_node_count)), 255, 200)))
             node_item.setPen(QPen(Qt.gray, 2))
-            node_item.setToolTip(f"{act_name}\n出现次数: {freq_count}")
+            if perf_mode:
+                stat = perf["activities"].get(act_name, empty_stat)
+                node_item.setToolTip(
+                    f"{act_name}\n出现次数: {freq_count}\n"
+                    f"平均等待: {format_duration(stat['mean'])}\n"
+                    f"中位等待: {format_duration(stat['median'])}\n"
+                    f"P95 等待: {format_duration(stat['p95'])}"
+                )
+            else:
+                node_item.setToolTip(f"{act_name}\n出现次数: {freq_count}")
             node_item.setZValue(1)
             self.scene.addItem(node_item)
 
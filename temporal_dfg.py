@@ -0,0 +1,59 @@
+# temporal_dfg.py
+"""
+时序漂移分析：按日 / 周 / 月窗口切分日志后的逐窗口 DFG。
+
+窗口聚合由 cpa_utils.compute_windowed_dfg 一次排序得到；每个窗口的 dict 以及
+与上一窗口的差异在第一次访问时生成并缓存，前后切换窗口或播放动画时不再计算。
+"""
+
+WINDOW_FREQS = {"日": "D", "周": "W", "月": "M"}
+
+
+class TemporalDFG:
+    def __init__(self, df, freq="M"):
+        from cpa_utils import compute_windowed_dfg
+
+        self.freq = freq
+        self.windows, self._edges, self._acts = compute_windowed_dfg(df, freq=freq)
+        self._dfg_cache = {}
+        self._act_cache = {}
+        self._change_cache = {}
+
+    def __len__(self):
+        return len(self.windows)
+
+    def label(self, i):
+        return str(self.windows[i])
+
+    def dfg(self, i):
+        """第 i 个窗口的 {(source, target): 频次}"""
+        if i not in self._dfg_cache:
+            try:
+                part = self._edges.xs(i, level="window")
+            except KeyError:
+                part = self._edges.iloc[:0].droplevel(0)
+            self._dfg_cache[i] = dict(part.items())
+        return self._dfg_cache[i]
+
+    def activity_counts(self, i):
+        if i not in self._act_cache:
+            try:
+                part = self._acts.xs(i, level="window")
+            except KeyError:
+                part = self._acts.iloc[:0].droplevel(0)
+            self._act_cache[i] = dict(part.items())
+        return self._act_cache[i]
+
+    def edge_changes(self, i, top_k=15):
+        """
+        与上一窗口相比频次变化最大的边：[(source, target, 上一窗口频次, 本窗口频次), ...]
+        第一个窗口与空图比较
+        """
+        if i not in self._change_cache:
+            cur = self.dfg(i)
+            prev = self.dfg(i - 1) if i > 0 else {}
+            rows = [(src, tgt, prev.get((src, tgt), 0), cur.get((src, tgt), 0))
+                    for (src, tgt) in set(cur) | set(prev)]
+            rows.sort(key=lambda r: abs(r[3] - r[2]), reverse=True)
+            self._change_cache[i] = rows
+        return self._change_cache[i][:top_k]
@@ -0,0 +1,78 @@
+# tests/test_attribute_index.py
+"""属性索引与整列扫描求出的掩码必须一致（含空值行）"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from attribute_index import INDEX_MIN_ROWS, AttributeIndex
+from predicate_engine import Condition
+
+N_ROWS = INDEX_MIN_ROWS + 500
+
+
+def _with_nulls(values, null):
+    values = pd.Series(values)
+    values[::7] = null
+    return values
+
+
+def _frame():
+    rng = np.random.default_rng(0)
+    nums = rng.integers(0, 50, N_ROWS)
+    times = pd.Timestamp("2024-01-01") + pd.to_timedelta(nums, unit="D")
+    acts = np.array(["A", "B", "C", "D"])[nums % 4]
+    return pd.DataFrame({
+        "float": _with_nulls(nums.astype(float), np.nan),
+        "int": pd.array(_with_nulls(nums.astype(float), np.nan), dtype="Int64"),
+        "time": _with_nulls(times, pd.NaT),
+        "time_tz": _with_nulls(times, pd.NaT).dt.tz_localize("UTC"),
+        "object": _with_nulls(acts.astype(object), None),
+        "string": pd.array(_with_nulls(acts.astype(object), None), dtype="string"),
+        "category": _with_nulls(acts.astype(object), None).astype("category"),
+        "boolean": pd.array(_with_nulls((nums % 2 == 0).astype(object), None), dtype="boolean"),
+    })
+
+
+# 列 → (单值, 列表值)
+CASES = {
+    "float": ("10", "[10, 20, 30]"),
+    "int": ("10", "[10, 20, 30]"),
+    "time": ("'2024-01-11'", "['2024-01-11', '2024-02-01']"),
+    "time_tz": ("'2024-01-11'", "['2024-01-11', '2024-02-01']"),
+    "object": ("'B'", "['B', 'C']"),
+    "string": ("'B'", "['B', 'C']"),
+    "category": ("'B'", "['B', 'C']"),
+    "boolean": ("True", "[True]"),
+}
+OPS = ("==", "!=", ">", "<", ">=", "<=", "in", "not in", "between")
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return _frame()
+
+
+@pytest.mark.parametrize("col", list(CASES))
+@pytest.mark.parametrize("op", OPS)
+def test_index_matches_scan(frame, col, op):
+    single, listed = CASES[col]
+    if op == "between":
+        raw = listed if col.startswith("time") else "10, 30"
+        if col not in ("float", "int", "time", "time_tz"):
+            pytest.skip("between 只用于数值 / 时间列")
+    else:
+        raw = listed if op in ("in", "not in") else single
+    if op in (">", "<", ">=", "<=") and col in ("boolean", "category"):
+        pytest.skip("布尔 / 无序分类列不做大小比较")
+    fn = Condition(col, op, raw).compile()
+    scanned = fn(frame)
+    indexed = fn(frame, AttributeIndex(len(frame)))
+    np.testing.assert_array_equal(indexed, scanned)
+
+
+@pytest.mark.parametrize("col", list(CASES))
+def test_not_equal_keeps_nulls(frame, col):
+    nulls = frame[col].isna().to_numpy()
+    fn = Condition(col, "!=", CASES[col][0]).compile()
+    for index in (None, AttributeIndex(len(frame))):
+        assert fn(frame, index)[nulls].all()
@@ -0,0 +1,108 @@
+# time_index.py
+"""
+时间索引：事件时间戳排序后的 int64 纳秒数组 + 行位置排列，以及每个 case 的起止时间。
+
+- 事件时间窗口 [start, end]：两次 searchsorted 得到区间，O(log n + k)
+- 流程时间窗口（开始 ≥ X 且结束 ≤ Y）：case 按开始时间排序，searchsorted 后只检查候选区间
+- 事件数量统计为 O(log n)，适合拖动时间滑块实时显示
+
+带时区的时间统一换算为 UTC 的无时区时间；传入的无时区时间按同一基准解释。
+"""
+import numpy as np
+import pandas as pd
+
+
+def to_ns(value):
+    """datetime / 字符串 / Timestamp → int64 纳秒（UTC 无时区基准）"""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(None)
+    return ts.value
+
+
+def from_ns(ns):
+    return pd.Timestamp(int(ns))
+
+
+def event_window_mask(times, start=None, end=None):
+    """
+    不建索引的一次性判断（重放操作链时使用）：times 落在 [start, end] 内的布尔掩码
+    """
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times, errors="coerce")
+    if getattr(times.dtype, "tz", None) is not None:
+        times = times.dt.tz_convert(None)
+    mask = times.notna()
+    if start is not None:
+        mask &= times >= from_ns(to_ns(start))
+    if end is not None:
+        mask &= times <= from_ns(to_ns(end))
+    return mask.to_numpy(dtype=bool)
+
+
+class TimeIndex:
+    def __init__(self, df, case_col="case:concept:name", time_col="time:timestamp"):
+        times = df[time_col]
+        if not pd.api.types.is_datetime64_any_dtype(times):
+            times = pd.to_datetime(times, errors="coerce")
+        if getattr(times.dtype, "tz", None) is not None:
+            times = times.dt.tz_convert(None)
+        keys = times.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        valid = times.notna().to_numpy()
+        self.n_rows = len(df)
+
+        # ① 事件级：非空时间升序 + 行位置
+        rows = np.flatnonzero(valid)
+        order = np.argsort(keys[rows], kind="stable")
+        self.perm = rows[order]
+        self.event_ns = keys[rows][order]
+
+        # ② 流程级：每个 case 的起止时间，按开始时间升序
+        case_codes, case_ids = pd.factorize(df[case_col].to_numpy()[valid])
+        spans = pd.Series(keys[valid]).groupby(case_codes).agg(["min", "max"])
+        case_order = np.argsort(spans["min"].to_numpy(), kind="stable")
+        self.case_ids = np.asarray(case_ids)[spans.index.to_numpy()[case_order]]
+        self.case_start_ns = spans["min"].to_numpy()[case_order]
+        self.case_end_ns = spans["max"].to_numpy()[case_order]
+
+    # ---- 范围 ----
+    @property
+    def min_ns(self):
+        return int(self.event_ns[0]) if len(self.event_ns) else None
+
+    @property
+    def max_ns(self):
+        return int(self.event_ns[-1]) if len(self.event_ns) else None
+
+    # ---- 事件时间窗口 ----
+    def _event_bounds(self, start=None, end=None):
+        lo = 0 if start is None else np.searchsorted(self.event_ns, to_ns(start), side="left")
+        hi = len(self.event_ns) if end is None else np.searchsorted(self.event_ns, to_ns(end), side="right")
+        return lo, max(lo, hi)
+
+    def event_window_count(self, start=None, end=None):
+        lo, hi = self._event_bounds(start, end)
+        return int(hi - lo)
+
+    def event_window_rows(self, start=None, end=None):
+        """落在 [start, end] 内的事件行位置（升序，保持原行顺序）"""
+        lo, hi = self._event_bounds(start, end)
+        return np.sort(self.perm[lo:hi])
+
+    # ---- 流程时间窗口 ----
+    def _trace_candidates(self, start=None, end=None):
+        lo = 0 if start is None else np.searchsorted(self.case_start_ns, to_ns(start), side="left")
+        # 开始时间晚于 end 的 case 必然不满足 “结束 ≤ end”
+        hi = len(self.case_start_ns) if end is None else np.searchsorted(
+            self.case_start_ns, to_ns(end), side="right")
+        hi = max(lo, hi)
+        if end is None:
+            return np.arange(lo, hi)
+        return lo + np.flatnonzero(self.case_end_ns[lo:hi] <= to_ns(end))
+
+    def trace_window_cases(self, start=None, end=None):
+        """开始时间 ≥ start 且结束时间 ≤ end 的 case id"""
+        return self.case_ids[self._trace_candidates(start, end)]
+
+    def trace_window_count(self, start=None, end=None):
+        return len(self._trace_candidates(start, end))